@@ -0,0 +1,118 @@
+"""
+End-to-end benchmark of the import, export and delete commands, run against the fake BGG server
+of the tests. Games are imported, exported then deleted with the HTTP engine, so no web browser
+is needed. The network is simulated by the latency added to each response.
+
+Usage: bench_commands.py [--games <count>] [--latency <ms>] [--queued <count>]
+                         [--workers <count>] [--rate-limit <requests/s>]
+
+Options:
+    --games <count>             Number of games of the collection [default: 1000]
+    --latency <ms>              Delay added to each response of the server [default: 0]
+    --queued <count>            Number of HTTP 202 responses before an export is available
+                                [default: 1]
+    --workers <count>           Number of concurrent requests of the deletion [default: 4]
+    --rate-limit <requests/s>   Rate limit of bggcli, 0 to disable it [default: 0]
+"""
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from docopt import docopt
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'tests'))
+
+from fakebgg import FakeBgg
+
+LOGIN = 'bggcli'
+PASSWORD = 'secret'
+
+
+def write_games(path, objectids):
+    with open(path, 'w') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['objectid', 'objectname', 'own', 'rating', 'comment'])
+        for index, objectid in enumerate(objectids):
+            writer.writerow([objectid, 'Game %s' % objectid, '1', str(index % 10 + 1),
+                             'Comment of game %s' % objectid])
+
+
+def run(argv):
+    """
+    Runs a command, its output being discarded. Returns the duration in seconds
+    """
+    # Imported once the base URL of the fake server is set
+    from bggcli.main import _main
+
+    stdout = sys.stdout
+    start = time.time()
+    with open(os.devnull, 'w') as devnull:
+        sys.stdout = devnull
+        try:
+            _main(argv)
+        except SystemExit:
+            pass
+        finally:
+            sys.stdout = stdout
+    return time.time() - start
+
+
+def count_rows(path):
+    with open(path) as csv_file:
+        return sum(1 for _ in csv.DictReader(csv_file))
+
+
+def main():
+    args = docopt(__doc__)
+    game_count = int(args['--games'])
+
+    bgg = FakeBgg({LOGIN: PASSWORD}, int(args['--queued']),
+                  float(args['--latency']) / 1000).start()
+    os.environ['BGGCLI_BASE_URL'] = bgg.url
+    work_dir = tempfile.mkdtemp(prefix='bggcli-bench-')
+    try:
+        from bggcli.util.sessioncache import SessionCache
+
+        # Commands reuse this session instead of logging in through the web browser
+        session_dir = os.path.join(work_dir, 'sessions')
+        SessionCache(LOGIN, session_dir).save([{'name': 'SessionID',
+                                                'value': bgg.login(LOGIN, PASSWORD)}])
+        options = ['-c', 'session-cache=true', '-c', 'session-cache-dir=%s' % session_dir,
+                   '-c', 'rate-limit=%s' % args['--rate-limit'],
+                   '-c', 'export-poll-interval=0.1']
+        csv_path = os.path.join(work_dir, 'games.csv')
+        write_games(csv_path, bgg.add_games(game_count))
+        export_path = os.path.join(work_dir, 'export.csv')
+
+        benchmarks = [
+            ('import', options + ['-c', 'engine=http', 'collection-import', csv_path],
+             lambda: len(bgg.items)),
+            ('export', options + ['collection-export', export_path],
+             lambda: count_rows(export_path)),
+            ('delete', options + ['-c', 'engine=http', '-c', 'workers=%s' % args['--workers'],
+                                  'collection-delete', '--force', csv_path],
+             lambda: game_count - len(bgg.items)),
+        ]
+
+        print('%-8s %8s %10s %10s %10s' % ('command', 'rows', 'seconds', 'rows/s', 'requests'))
+        for name, argv, processed in benchmarks:
+            requests = sum(bgg.hits.values())
+            duration = run(['-l', LOGIN, '-p', PASSWORD] + argv)
+            rows = processed()
+            print('%-8s %8s %10.2f %10.0f %10s'
+                  % (name, rows, duration, rows / max(duration, 1e-9),
+                     sum(bgg.hits.values()) - requests))
+            if rows != game_count:
+                print('%-8s failed, %s rows processed out of %s' % (name, rows, game_count))
+    finally:
+        bgg.stop()
+        shutil.rmtree(work_dir)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark of the XML to CSV conversion of a collection export, for each available XML backend.
+
+Each backend runs in its own process, so that peak memory usage is measured independently.
+
+Usage: bench_xmltocsv.py [--items <count>] [--file <path>]
+       bench_xmltocsv.py --run <backend> <path>
+
+Options:
+    --items <count>     Number of items of the generated export [default: 100000]
+    --file <path>       Use an existing XML export instead of a generated one
+    --run <backend>     Convert the given export with a backend, and print results as JSON
+"""
+import csv
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from docopt import docopt
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from bggcli.commands.collection_export import CSV_EXPORT_FIELDS
+from bggcli.util.xmltocsv import XML_BACKENDS, XmlToCsv, lxml_etree
+
+FIXTURE_PATH = os.path.join(os.path.dirname(__file__), '..', 'tests', 'resources',
+                            'collection.xml')
+
+
+def generate_export(path, count):
+    """
+    Writes an export of the given number of items, duplicating the items of the test fixture
+    """
+    with open(FIXTURE_PATH) as fixture:
+        content = fixture.read()
+    start = content.index('<item ')
+    end = content.rindex('</items>')
+    items = content[start:end]
+    with open(path, 'w') as dest_file:
+        dest_file.write(content[:start])
+        for index in range(count // 2):
+            dest_file.write(items.replace('objectid="', 'objectid="%s' % index))
+        dest_file.write(content[end:])
+
+
+def run(backend, path):
+    with tempfile.TemporaryFile(mode='w') as dest_file:
+        csv_writer = csv.writer(dest_file, quoting=csv.QUOTE_ALL)
+        start = time.time()
+        count = 0
+        for values in XmlToCsv.iterate_tuples(path, CSV_EXPORT_FIELDS, 'boardgame', backend):
+            csv_writer.writerow(values)
+            count += 1
+        duration = time.time() - start
+
+    # Kilobytes on Linux, bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        peak_rss //= 1024
+    print(json.dumps({'backend': backend, 'rows': count, 'duration': duration,
+                      'peak_rss_kb': peak_rss}))
+
+
+def main():
+    args = docopt(__doc__)
+    if args['--run']:
+        run(args['--run'], args['<path>'])
+        return
+
+    path = args['--file']
+    generated = path is None
+    if generated:
+        path = tempfile.NamedTemporaryFile(suffix='.xml', delete=False).name
+        generate_export(path, int(args['--items']))
+    try:
+        print('%-8s %10s %10s %12s %14s' % ('backend', 'rows', 'seconds', 'rows/s',
+                                            'peak RSS (MB)'))
+        for backend in XML_BACKENDS:
+            if backend == 'lxml' and lxml_etree is None:
+                print('%-8s (not installed)' % backend)
+                continue
+            output = subprocess.check_output([sys.executable, __file__, '--run', backend, path])
+            result = json.loads(output.decode('utf-8'))
+            print('%-8s %10s %10.2f %12.0f %14.1f'
+                  % (backend, result['rows'], result['duration'],
+                     result['rows'] / max(result['duration'], 1e-9),
+                     result['peak_rss_kb'] / 1024.0))
+    finally:
+        if generated:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,7 +3,10 @@
 
 import os
 
-if os.environ.get('CI') == 'true':
+if os.environ.get('BGGCLI_BASE_URL'):
+    # Another server standing for BGG, e.g. the fake server of the tests and benchmarks
+    BGG_BASE_URL = os.environ['BGGCLI_BASE_URL'].rstrip('/')
+elif os.environ.get('CI') == 'true':
     # Issues with Sauce Labs and HTTPS
     BGG_BASE_URL = "http://www.boardgamegeek.com"
 else:
@@ -37,6 +40,32 @@ BGG_SUPPORTED_FIELDS = ['own',
                         'objectid', '_versionid', 'invlocation'
                        ]
 
+# Columns of the exported CSV file
+BGG_CSV_EXPORT_FIELDS = BGG_SUPPORTED_FIELDS + ['pp_currency', 'cv_currency']
+
+# A field is only updated when the fields it depends on have the given values.
+# For example, 'wishlistpriority': {'wishlist': 1} means that to set wishlistpriority,
+# wishlist must equal 1.
+BGG_FIELD_DEPENDENCIES = {
+    'wishlist': {'wishlist': 1},
+    'wishlistpriority': {'wishlist': 1},
+    'wishlistcomment': {'wishlist': 1},
+    'conditiontext': {'fortrade': 1},
+    'wanttoplay': {'wanttoplay': 1},
+    'wanttobuy': {'wanttobuy': 1},
+    'own': {'own': 1},
+}
+
+
+def is_field_applicable(game_attrs, key):
+    """
+    Returns True if the fields the given one depends on have the expected values
+    """
+    for dep_key, dep_value in BGG_FIELD_DEPENDENCIES.get(key, {}).items():
+        if str(game_attrs.get(dep_key)) != str(dep_value):
+            return False
+    return True
+
 # More fields in the add/edit collection dialog:
 # Inventory Date
 # Inventory Location
@@ -1,6 +1,14 @@
 import os
+import sys
+from contextlib import contextmanager
 
+from bggcli.ui.gamepage import GamePage
+from bggcli.ui.loginpage import LoginPage
+from bggcli.util.httpclient import HttpClient
 from bggcli.util.logger import Logger
+from bggcli.util.sessioncache import SessionCache
+from bggcli.util.tracer import span
+from bggcli.util.webdriver import WebDriver
 
 
 def check_file(args):
@@ -10,3 +18,55 @@ def check_file(args):
         return file_path
 
     Logger.error("File does not exist: %s" % file_path, sysexit=True)
+
+
+def authenticate(name, args, options):
+    """
+    Authenticates through the web browser and returns the session cookies, to be reused by
+    HTTP calls. The web browser is not even started when a cached session is still valid
+
+    :param name: Name of the web driver, for logging purpose
+    :param args: Command arguments
+    :param options: Advanced options
+    """
+    login = args['--login']
+    session_cache = SessionCache.from_options(login, options)
+    if session_cache is not None:
+        cookies = session_cache.load_values()
+        if cookies and HttpClient(cookies).is_authenticated(login):
+            Logger.info("Authenticating... (session restored) [done]")
+            return cookies
+
+    with WebDriver(name, args, options) as web_driver:
+        if not LoginPage(web_driver.driver).authenticate(login, args['--password'],
+                                                         session_cache):
+            sys.exit(1)
+        return HttpClient.cookies_from_driver(web_driver.driver)
+
+
+def get_worker_count(options, default=1):
+    try:
+        return max(1, int(options.get('workers', default)))
+    except ValueError:
+        Logger.error("Invalid value for 'workers' option, should be a number: %s"
+                     % options.get('workers'), sysexit=True)
+
+
+@contextmanager
+def game_page_session(name, args, options, membership=None):
+    """
+    Opens an authenticated web browser and provides a GamePage bound to it
+
+    :param name: Name of the web driver, for logging purpose
+    :param args: Command arguments
+    :param options: Advanced options
+    :param membership: CollectionMembership given to the GamePage, if known
+    """
+    with WebDriver(name, args, options) as web_driver:
+        with span('login'):
+            authenticated = LoginPage(web_driver.driver).authenticate(
+                args['--login'], args['--password'],
+                SessionCache.from_options(args['--login'], options))
+        if not authenticated:
+            sys.exit(1)
+        yield GamePage(web_driver.driver, options.get('fill-mode') == 'script', membership)
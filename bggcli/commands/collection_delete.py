@@ -16,18 +16,46 @@ Advanced options:
     browser-keep=<true|false>       If you want to keep your web browser opened at the end of the
                                     operation
     browser-profile-dir=<dir>       Path or your browser profile if you want to use an existing
+    browser-headless=<true|false>   To run the web browser without any window, e.g. on a server
+                                    without display
+    browser-lean=<true|false>       Lighter web browser: no images, no web fonts, no ads or
+                                    trackers, and pages are used as soon as their content is
+                                    loaded. The average page load time is logged at the end
+    session-cache=<true|false>      To reuse the session of a previous command instead of logging in
+                                    again. Session cookies are stored in ~/.bggcli/sessions,
+                                    only readable by you
+    session-cache-dir=<dir>         Directory of the session cache
+    workers=<count>                 Number of web browsers deleting games in parallel (default: 1),
+                                    or of concurrent requests with the HTTP engine (default: 4)
+    engine=<browser|http>           'http' deletes the collection items with direct requests to
+                                    BGG instead of the game pages in the web browser, which is
+                                    much faster. The current collection is fetched first, to find
+                                    the items: games not in the collection are skipped
+                                    (default: browser)
 
 Arguments:
     <file> The CSV file with games to delete
 """
 import sys
+from contextlib import contextmanager
 
-from bggcli.commands import check_file
-from bggcli.util.csvreader import CsvReader
+from bggcli.commands import authenticate, check_file, game_page_session, get_worker_count
 from bggcli.ui.gamepage import GamePage
-from bggcli.ui.loginpage import LoginPage
+from bggcli.util.collectionclient import CollectionClient
+from bggcli.util.collectionmembership import MembershipLoader
+from bggcli.util.collectionsnapshot import CollectionSnapshot
+from bggcli.util.csvreader import CsvReader
+from bggcli.util.httpclient import HttpClient
 from bggcli.util.logger import Logger
-from bggcli.util.webdriver import WebDriver
+from bggcli.util.workerpool import WorkerPool
+
+try:
+    input = raw_input
+except NameError:
+    pass
+
+# Default number of concurrent requests of the HTTP engine
+HTTP_WORKERS = 4
 
 
 def execute(args, options):
@@ -46,18 +74,79 @@ def execute(args, options):
             "please enter the number of games displayed here to confirm you want to continue: "
             % (game_count, login))
 
-        if raw_input() != game_count.__str__():
+        if input() != game_count.__str__():
             Logger.error('Operation canceled, number does not match (should be %s).' % game_count,
                          sysexit=True)
             return
 
     Logger.info("Deleting games for '%s' account..." % login)
 
-    with WebDriver('collection-delete', args, options) as web_driver:
-        if not LoginPage(web_driver.driver).authenticate(login, args['--password']):
-            sys.exit(1)
+    if options.get('engine') == 'http':
+        cookies = authenticate('collection-delete', args, options)
+        Logger.info("Fetching current collection of '%s'..." % login)
+        snapshot = CollectionSnapshot.fetch(cookies, login)
+        worker_count = get_worker_count(options, HTTP_WORKERS)
+        Logger.info("Deleting %s games with %s concurrent requests..." % (game_count,
+                                                                         worker_count))
+        report = http_delete(csv_reader.rows(), snapshot, CollectionClient(HttpClient(cookies)),
+                             worker_count)
+        Logger.info("Deletion has finished (%s)." % report)
+        return
+
+    # Games known to be in the collection are deleted without looking for the 'Add to
+    # Collection' button first. The membership only holds board games and expansions: other
+    # games are still checked on their page
+    loader = MembershipLoader(login, options=options)
+
+    worker_count = get_worker_count(options)
+    Logger.info("Deleting %s games with %s web browser(s)..." % (game_count, worker_count))
+    report = WorkerPool(worker_count).run(
+        loader.rows(csv_reader.rows()),
+        lambda index: game_page_session('collection-delete-%s' % index, args, options,
+                                        loader.membership),
+        delete_game, game_count)
+    Logger.info("Deletion has finished (%s)." % report)
+    if GamePage.page_load_summary():
+        Logger.info(GamePage.page_load_summary())
+
+
+def delete_game(game_page, row):
+    game_page.delete(row)
+    return True
+
+
+@contextmanager
+def http_session(client):
+    yield client
+
+
+def collection_items(rows, snapshot):
+    """
+    Yields the rows with the identifier of their collection item (collid), skipping games
+    which are not in the collection
+    """
+    for row in rows:
+        if row.get('collid'):
+            yield row
+            continue
+        item = snapshot.pop(row)
+        if item is None:
+            Logger.info('(BGGID %s) %s (not in collection) [skipped]' % (row.get('objectid'),
+                                                                         row.get('objectname')))
+            continue
+        row = dict(row)
+        row['collid'] = item['collid']
+        yield row
+
+
+def http_delete(rows, snapshot, client, worker_count=HTTP_WORKERS):
+    """
+    Deletes the collection items of the rows over HTTP, with several concurrent requests.
+    Returns a PoolReport
 
-        Logger.info("Deleting %s games..." % game_count)
-        game_page = GamePage(web_driver.driver)
-        csv_reader.iterate(lambda row: game_page.delete(row))
-        Logger.info("Deletion has finished.")
+    :param snapshot: CollectionSnapshot of the current collection
+    :param client: CollectionClient of an authenticated session
+    """
+    return WorkerPool(worker_count).run(collection_items(rows, snapshot),
+                                        lambda index: http_session(client),
+                                        lambda session, row: session.delete(row['collid']))
@@ -0,0 +1,86 @@
+"""
+Add the details of the games (ratings, weight, rank, players...) to a CSV file of a collection,
+e.g. a previous export. Details are fetched from BGG by batches of games, and cached.
+
+Usage: bggcli [-v] [-c <name>=<value>]...
+              collection-enrich <file> <dest>
+
+Options:
+    -v                              Activate verbose logging
+    -c <name=value>                 To specify advanced options, see below
+
+Advanced options:
+    thing-batch-size=<count>        Number of games fetched per request (default: 20)
+    thing-cache=<true|false>        To cache the details of the games in ~/.bggcli/cache
+                                    (default: true)
+    thing-cache-dir=<dir>           Directory of the cache
+    thing-cache-ttl=<days>          Time to live of the cached details (default: 7)
+    thing-cache-size=<count>        Maximum number of cached games, the least recently used ones
+                                    are evicted (default: 50000)
+    export-format=<format>          Format of the generated file: csv, jsonl, sqlite or parquet.
+                                    Guessed from the file extension by default
+
+Arguments:
+    <file> The CSV file with games, an 'objectid' column is required
+    <dest> The file to generate, '-' to write it to the standard output. Columns of the
+           details are added, or updated when the CSV file already has them
+"""
+from bggcli.commands import check_file
+from bggcli.util.csvreader import CsvReader
+from bggcli.util.exportwriter import STDOUT_PATH, get_export_format, open_export_writer
+from bggcli.util.logger import Logger
+from bggcli.util.thingcache import ThingCache
+from bggcli.util.thingenricher import THING_FIELDS, ThingEnricher
+
+
+def execute(args, options):
+    file_path = check_file(args)
+    dest_path = args['<dest>']
+    export_format = get_export_format(dest_path, options.get('export-format'))
+    if dest_path == STDOUT_PATH:
+        # Standard output only receives the generated data
+        Logger.toStderr = True
+
+    csv_reader = CsvReader(file_path)
+    csv_reader.open()
+    Logger.info('Adding details of %s games...' % csv_reader.rowCount)
+
+    cache = ThingCache.from_options(options)
+    enricher = ThingEnricher.from_options(options, cache.open() if cache else None)
+    try:
+        columns = enriched_columns(csv_reader.fieldnames)
+        with open_export_writer(dest_path, columns, export_format) as writer:
+            writer.write_rows(enriched_rows(csv_reader, enricher))
+    except Exception as e:
+        Logger.error('Error while adding details of games!', e, sysexit=True)
+        return
+    finally:
+        enricher.close()
+        csv_reader.close()
+
+    Logger.info('Games with details have been written as %s' % dest_path)
+
+
+def enriched_columns(fieldnames):
+    """
+    Returns the columns of the CSV file, followed by the ones of the details it does not have
+    """
+    return list(fieldnames) + [field for field in THING_FIELDS if field not in fieldnames]
+
+
+def enriched_rows(csv_reader, enricher):
+    """
+    Yields the rows of the CSV file as tuples, in the order of enriched_columns(). Details of
+    games unknown to BGG keep the values of the CSV file
+    """
+    fieldnames = csv_reader.fieldnames
+    columns = enriched_columns(fieldnames)
+    positions = [columns.index(field) for field in THING_FIELDS]
+    padding = [''] * (len(columns) - len(fieldnames))
+    rows = (tuple(row.get(field) or '' for field in fieldnames) for row in csv_reader.rows())
+    for values in enricher.enrich(rows, fieldnames.index('objectid')):
+        row = list(values[:len(fieldnames)]) + padding
+        for position, value in zip(positions, values[len(fieldnames):]):
+            if value != '':
+                row[position] = value
+        yield tuple(row)
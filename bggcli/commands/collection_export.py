@@ -1,5 +1,5 @@
 """
-Export a game collection as a CSV file.
+Export a game collection as a CSV file, or as JSON Lines, SQLite or Parquet file.
 
 Usage: bggcli [-v] -l <login> -p <password>
               [-c <name>=<value>]...
@@ -12,137 +12,317 @@ Options:
     -c <name=value>                 To specify advanced options, see below
 
 Advanced options:
-    save-xml-file=<true|false>      To store the exported raw XML file in addition (will be
-                                    save aside the CSV file, with '.xml' extension
+    save-xml-file=<true|false|gzip> To store the exported raw XML file in addition (will be
+                                    save aside the CSV file, with '.xml' extension). 'gzip'
+                                    compresses it ('.xml.gz' extension)
     browser-keep=<true|false>       If you want to keep your web browser opened at the end of the
                                     operation
     browser-profile-dir=<dir>       Path or your browser profile if you want to use an existing
+    browser-headless=<true|false>   To run the web browser without any window, e.g. on a server
+                                    without display
+    session-cache=<true|false>      To reuse the session of a previous command instead of logging in
+                                    again. Session cookies are stored in ~/.bggcli/sessions,
+                                    only readable by you
+    session-cache-dir=<dir>         Directory of the session cache
+    export-poll-interval=<seconds>  Delay before asking again for an export queued by BGG,
+                                    doubled after each request (default: 2)
+    export-poll-max=<seconds>       Maximum delay between two requests (default: 30). A delay
+                                    requested by BGG (Retry-After) is always honored
+    export-timeout=<seconds>        Maximum time waiting for a queued export (default: 600)
+    export-format=<format>          Format of the exported file: csv, jsonl (JSON Lines), sqlite
+                                    (table 'collection') or parquet (pyarrow must be installed).
+                                    Values are typed in all formats but CSV. Guessed from the
+                                    file extension by default (.jsonl, .sqlite, .db, .parquet),
+                                    CSV otherwise
+    export-subtypes=<list>          Comma separated list of subtypes to export among: boardgame,
+                                    boardgameexpansion, boardgameaccessory, rpgitem, rpgissue,
+                                    videogame. Subtypes are fetched concurrently and merged in
+                                    the CSV file, with an additional 'subtype' column. XML files
+                                    are saved per subtype (default: boardgame)
+    enrich=<true|false>             To add the details of the games (ratings, weight, rank,
+                                    players...), fetched from BGG by batches of games and
+                                    cached in ~/.bggcli/cache
+    thing-batch-size=<count>        Number of games fetched per request (default: 20)
+    thing-cache=<true|false>        To cache the details of the games (default: true)
+    thing-cache-dir=<dir>           Directory of the cache
+    thing-cache-ttl=<days>          Time to live of the cached details (default: 7)
+    thing-cache-size=<count>        Maximum number of cached games, the least recently used ones
+                                    are evicted (default: 50000)
 
 Arguments:
-    <file> The CSV file to generate
+    <file> The file to generate, '-' to write it to the standard output (logs are then written
+           to the standard error output)
 """
-import csv
-import codecs
-try:
-    from urllib2 import quote, Request, urlopen
-except:
-    from urllib.request import Request, urlopen
-    from urllib.parse import quote
-import time
-import sys
-import xml.etree.ElementTree as ET
-
-from bggcli import BGG_BASE_URL, BGG_SUPPORTED_FIELDS
-from bggcli.ui.loginpage import LoginPage
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+
+from bggcli import BGG_CSV_EXPORT_FIELDS
+from bggcli.commands import authenticate
+from bggcli.util.exportwriter import STDOUT_PATH, get_export_format, open_export_writer
 from bggcli.util.logger import Logger
-from bggcli.util.webdriver import WebDriver
+from bggcli.util.metrics import Metrics
+from bggcli.util.thingcache import ThingCache
+from bggcli.util.thingenricher import THING_FIELDS, ThingEnricher
+from bggcli.util.xmlapi import PollingSchedule, TeeReader, collection_request, fetch
 from bggcli.util.xmltocsv import XmlToCsv
 
-BGG_SESSION_COOKIE_NAME = 'SessionID'
-EXPORT_QUERY_INTERVAL = 5
-ERROR_FILE_PATH = 'error.txt'
+CSV_EXPORT_FIELDS = BGG_CSV_EXPORT_FIELDS
+
+EXPORT_SUBTYPES = ['boardgame', 'boardgameexpansion', 'boardgameaccessory', 'rpgitem',
+                   'rpgissue', 'videogame']
 
 
 def execute(args, options):
     login = args['--login']
     dest_path = args['<file>']
+    subtypes = get_subtypes(options)
+    export_format = get_export_format(dest_path, options.get('export-format'))
+    if dest_path == STDOUT_PATH:
+        # Standard output only receives the exported data
+        Logger.toStderr = True
+        if options.get('save-xml-file') in ('true', 'gzip'):
+            Logger.error("'save-xml-file' option cannot be used when exporting to the standard "
+                         "output!", sysexit=True)
+            return
 
     Logger.info("Exporting collection for '%s' account..." % login)
 
     # 1. Authentication
-    with WebDriver('collection-export', args, options) as web_driver:
-        if not LoginPage(web_driver.driver).authenticate(login, args['--password']):
-            sys.exit(1)
-        auth_cookie = web_driver.driver.get_cookie(BGG_SESSION_COOKIE_NAME)['value']
+    cookies = authenticate('collection-export', args, options)
+
+    enricher = None
+    if options.get('enrich') == 'true':
+        cache = ThingCache.from_options(options)
+        enricher = ThingEnricher.from_options(options, cache.open() if cache else None)
+    try:
+        export(cookies, login, subtypes, dest_path, options, export_format, enricher)
+    finally:
+        if enricher is not None:
+            enricher.close()
+
 
+def export(cookies, login, subtypes, dest_path, options, export_format=None, enricher=None):
     # 2. Export
     # Easier to rely on a client HTTP call rather than Selenium to download a file
     # Just need to pass the session cookie to get the full export with private information
+    if len(subtypes) > 1:
+        export_subtypes(cookies, login, subtypes, dest_path, options, export_format, enricher)
+        return
 
     # Use XML2 API, see https://www.boardgamegeek.com/wiki/page/BGG_XML_API2#Collection
-    # Default CSV export doesn't provide version info!
-    url = '%s/xmlapi2/collection?username=%s&version=1&showprivate=1&stats=1' \
-          % (BGG_BASE_URL, quote(login))
-    req = Request(url, None, {'Cookie': '%s=%s' % (BGG_SESSION_COOKIE_NAME, auth_cookie)})
-
-    # Get a BadStatusLine error most of times without this delay!
-    # Related to Selenium, but in some conditions that I have not identified
-    time.sleep(8)
+    params = export_parameters(subtypes[0], subtypes)
+    req = collection_request(cookies, login, **params)
+    schedule = PollingSchedule.from_options(options)
+
     try:
         Logger.info('Launching export...')
-        response = default_export(req)
+        # A BadStatusLine error happens sometimes on the first request, it is retried as a
+        # queued export
+        response = fetch(req, schedule)
     except Exception as e:
         Logger.error('Error while fetching export file!', e, sysexit=True)
         return
 
-    # 3. Store XML file if requested
+    # 3. Parse the export while it is downloaded, storing the XML file at the same time if
+    # requested
     xml_file = options.get('save-xml-file')
-    if xml_file == 'true':
-        xml_file_path = write_xml_file(response, dest_path)
-        Logger.info("XML file save as %s" % xml_file_path)
-        #source = open(xml_file_path, 'rU')
-        source = codecs.open(xml_file_path, mode='rb', encoding='utf-8', errors='replace')
-    else:
-        source = response
+    xml_file_path = None
+    xml_dest_file = None
+    source = response
+    if xml_file in ('true', 'gzip'):
+        xml_file_path, xml_dest_file = open_xml_file(dest_path, compress=xml_file == 'gzip')
+        source = TeeReader(response, xml_dest_file)
 
     # 4. Write CSV file
     try:
-        write_csv(source, dest_path)
+        write_csv(source, dest_path, item_subtype(params), export_format, enricher)
+        if xml_dest_file is not None:
+            source.drain()
     except Exception as e:
         Logger.error('Error while writing export file in file system!', e, sysexit=True)
         return
     finally:
-        source.close()
+        response.close()
+        if xml_dest_file is not None:
+            xml_dest_file.close()
+
+    if xml_file_path is not None:
+        Logger.info("XML file save as %s" % xml_file_path)
 
     # End
     Logger.info("Collection has been exported as %s" % dest_path)
 
 
-def default_export(req):
-    response = urlopen(req)
+def get_subtypes(options):
+    subtypes = [subtype.strip() for subtype in options.get('export-subtypes', 'boardgame')
+                .split(',') if subtype.strip()]
+    unknown_subtypes = [subtype for subtype in subtypes if subtype not in EXPORT_SUBTYPES]
+    if not subtypes or unknown_subtypes:
+        Logger.error("Invalid value for 'export-subtypes' option, should be a list of: %s"
+                     % ', '.join(EXPORT_SUBTYPES), sysexit=True)
+    # Remove duplicates, keeping the order
+    return [subtype for index, subtype in enumerate(subtypes) if subtype not in subtypes[:index]]
+
+
+def export_parameters(subtype, subtypes):
+    """
+    Returns the parameters of the collection API to export a subtype
+
+    :param subtype: Subtype to export
+    :param subtypes: All exported subtypes
+    """
+    if subtype == 'boardgame':
+        # BGG also returns expansions as board games, unless they are excluded
+        if 'boardgameexpansion' in subtypes:
+            return {'subtype': 'boardgame', 'excludesubtype': 'boardgameexpansion'}
+        return {}
+    return {'subtype': subtype}
+
 
-    if response.code == 202:
-        Logger.info('Export is queued, will retry in %ss' % EXPORT_QUERY_INTERVAL)
-        time.sleep(EXPORT_QUERY_INTERVAL)
-        return default_export(req)
+def item_subtype(params):
+    """
+    Returns the subtype of the items to keep in an export, None to keep all of them
+    """
+    # Without any filter in the query, BGG exports board games and expansions
+    return 'boardgame' if not params else None
 
-    if response.code == 200:
-        return response
 
-    # Write response in a text file otherwise
+def export_subtypes(cookies, login, subtypes, dest_path, options, export_format=None,
+                    enricher=None):
+    """
+    Fetches the exports of several subtypes concurrently, since BGG queues each of them, then
+    merges them in a single CSV file
+    """
+    xml_file = options.get('save-xml-file')
+    downloads = []
+    for subtype in subtypes:
+        if xml_file in ('true', 'gzip'):
+            xml_file_path, xml_dest_file = open_xml_file(dest_path, xml_file == 'gzip', subtype)
+        else:
+            xml_dest_file = tempfile.NamedTemporaryFile(
+                prefix='bggcli-%s-' % subtype, suffix='.xml', delete=False)
+            xml_file_path = None
+        downloads.append({'subtype': subtype, 'params': export_parameters(subtype, subtypes),
+                          'file': xml_dest_file, 'path': xml_file_path, 'error': None})
+
+    def download(entry):
+        try:
+            req = collection_request(cookies, login, **entry['params'])
+            response = fetch(req, PollingSchedule.from_options(options))
+            try:
+                shutil.copyfileobj(response, entry['file'], 64 * 1024)
+            finally:
+                response.close()
+            Logger.info("Export of '%s' items downloaded" % entry['subtype'])
+        except Exception as e:
+            entry['error'] = e
+        finally:
+            entry['file'].close()
+
+    Logger.info('Launching export of %s...' % ', '.join(subtypes))
+    threads = [threading.Thread(target=download, args=(entry,),
+                                name='bggcli-export-%s' % entry['subtype'])
+               for entry in downloads]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    for thread in threads:
+        thread.join()
+
     try:
-        #with open(ERROR_FILE_PATH, "wb") as error_file:
-        with codecs.open(ERROR_FILE_PATH, mode='wb', encoding='utf-8', errors='replace') as error_file:
-            error_file.write(response.read())
-        Logger.error("Unexpected response, content has been written in %s" % ERROR_FILE_PATH)
-    except Exception as e:
-        raise Exception('Unexpected HTTP response for export request, and cannot write '
-                        'response content in %s: %s' % (ERROR_FILE_PATH, e))
-    raise Exception('Unexpected HTTP response for export request, response content written in '
-                    '%s' % ERROR_FILE_PATH)
+        for entry in downloads:
+            if entry['error'] is not None:
+                Logger.error("Error while fetching export file of '%s' items!" % entry['subtype'],
+                             entry['error'], sysexit=True)
+                return
+        try:
+            write_merged_csv([(entry['subtype'], entry['path'] or entry['file'].name,
+                               item_subtype(entry['params'])) for entry in downloads],
+                             dest_path, export_format, enricher)
+        except Exception as e:
+            Logger.error('Error while writing export file in file system!', e, sysexit=True)
+            return
+    finally:
+        for entry in downloads:
+            if entry['path'] is None:
+                os.remove(entry['file'].name)
+
+    for entry in downloads:
+        if entry['path'] is not None:
+            Logger.info("XML file save as %s" % entry['path'])
+    Logger.info("Collection has been exported as %s" % dest_path)
+
+
+def open_xml_file(csv_dest_path, compress=False, subtype=None):
+    """
+    Returns the path and the binary file object where the raw XML export is stored
+    """
+    dest_path = '.'.join(csv_dest_path.split('.')[:-1])
+    if subtype is not None:
+        dest_path += '.' + subtype
+    dest_path += '.xml'
+    if compress:
+        dest_path += '.gz'
+        return dest_path, gzip.open(dest_path, 'wb', compresslevel=6)
+    return dest_path, open(dest_path, 'wb')
+
+
+def open_xml_source(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+def export_columns(enricher=None):
+    """
+    Returns the exported columns, followed by the details of the games when enriched
+    """
+    if enricher is None:
+        return CSV_EXPORT_FIELDS
+    return CSV_EXPORT_FIELDS + ['collid'] + THING_FIELDS
+
 
+def export_rows(source, subtype=None, enricher=None):
+    """
+    Yields the exported rows of an XML export, in the order of export_columns()
 
-def write_xml_file(response, csv_dest_path):
-    dest_path = '.'.join(csv_dest_path.split('.')[:-1]) + '.xml'
-    #with open(dest_path, "wb") as dest_file:
-    with codecs.open(dest_path, mode='wb', encoding='utf-8', errors='replace') as dest_file:
-        dest_file.write(response.read())
+    :param enricher: ThingEnricher adding the details of the games, if provided
+    """
+    if enricher is None:
+        return Metrics.get().count(XmlToCsv.iterate_tuples(source, CSV_EXPORT_FIELDS, subtype))
+    return Metrics.get().count(enricher.enrich(
+        XmlToCsv.iterate_tuples(source, CSV_EXPORT_FIELDS + ['collid'], subtype),
+        CSV_EXPORT_FIELDS.index('objectid')))
 
-    return dest_path
 
+def write_csv(source, dest_path, subtype='boardgame', export_format=None, enricher=None):
+    """
+    :param source: XML export, as a file path or a file object
+    :param dest_path: Path of the file to write, '-' for the standard output
+    :param subtype: Only writes the items of this subtype if provided
+    :param export_format: Format of the file, see exportwriter.EXPORT_FORMATS
+    :param enricher: ThingEnricher adding the details of the games, if provided
+    """
+    with open_export_writer(dest_path, export_columns(enricher), export_format) as writer:
+        writer.write_rows(export_rows(source, subtype, enricher))
 
-def write_csv(source, dest_path):
-    #with open(dest_path, "wb") as dest_file:
-    with codecs.open(dest_path, mode='w', encoding='utf-8', errors='replace') as dest_file:
-        BGG_SUPPORTED_FIELDS.extend(['pp_currency','cv_currency'])
-        csv_writer = csv.DictWriter(dest_file, fieldnames=BGG_SUPPORTED_FIELDS,
-                                    quoting=csv.QUOTE_ALL)
-        # csv_writer.writeheader() use quotes
-        dest_file.write('%s\n' % ','.join(BGG_SUPPORTED_FIELDS))
 
-        for event, elem in ET.iterparse(source, events=['end']):
-            if event == 'end':
-                if elem.tag == 'item' and elem.attrib.get('subtype') == 'boardgame':
-                    row = XmlToCsv.convert_item(elem)
-                    csv_writer.writerow(row)
+def write_merged_csv(sources, dest_path, export_format=None, enricher=None):
+    """
+    Writes the exports of several subtypes in a single file, with a 'subtype' column
 
+    :param sources: List of (subtype, path of the XML export, subtype of the items to keep or
+                    None to keep all of them)
+    :param dest_path: Path of the file to write, '-' for the standard output
+    :param export_format: Format of the file, see exportwriter.EXPORT_FORMATS
+    :param enricher: ThingEnricher adding the details of the games, if provided
+    """
+    with open_export_writer(dest_path, export_columns(enricher) + ['subtype'],
+                            export_format) as writer:
+        for subtype, path, kept_subtype in sources:
+            with open_xml_source(path) as source:
+                writer.write_rows(values + (subtype,) for values
+                                  in export_rows(source, kept_subtype, enricher))
@@ -4,110 +4,220 @@ Import a game collection from a CSV file.
 Note this action can be used to initialize a new collection, but also to update an existing
 collection. Only the fields defined in the file will be updated.
 
+Games without objectid are searched by their name ('objectname' column), and by the year they
+were published if the file has a 'yearpublished' column. Names matching several games are not
+imported, they are written to a review file instead.
+
 Usage: bggcli [-v] -l <login> -p <password>
               [-c <name>=<value>]...
-              collection-import <file>
+              collection-import [--resume] <file>
 
 Options:
     -v                              Activate verbose logging
     -l, --login <login>             Your login on BGG
     -p, --password <password>       Your password on BGG
+    --resume                        Skip games already imported by a previous run, as recorded in
+                                    the journal stored aside the CSV file ('.journal' extension)
     -c <name=value>                 To specify advanced options, see below
 
 Advanced options:
     browser-keep=<true|false>       If you want to keep your web browser opened at the end of the
                                     operation
     browser-profile-dir=<dir>       Path or your browser profile if you want to use an existing
+    browser-headless=<true|false>   To run the web browser without any window, e.g. on a server
+                                    without display
+    browser-lean=<true|false>       Lighter web browser: no images, no web fonts, no ads or
+                                    trackers, and pages are used as soon as their content is
+                                    loaded. The average page load time is logged at the end
+    session-cache=<true|false>      To reuse the session of a previous command instead of logging in
+                                    again. Session cookies are stored in ~/.bggcli/sessions,
+                                    only readable by you
+    session-cache-dir=<dir>         Directory of the session cache
+    workers=<count>                 Number of web browsers importing games in parallel (default: 1)
+    engine=<browser|http>           'http' posts the values directly to BGG instead of filling the
+                                    game page in the web browser, which is much faster. Games
+                                    having values the HTTP engine cannot save (e.g. language) are
+                                    still imported through the web browser (default: browser)
+    fill-mode=<fields|script>       'script' fills the whole form of a game with a single script
+                                    instead of updating each field like a user would do, which
+                                    is much faster. Falls back to 'fields' if the script fails
+                                    (default: fields)
+    skip-unchanged=<true|false>     Fetch the current collection first, and only update games
+                                    (and values) differing from the CSV file
+    name-cache=<true|false>         To keep the games found by name searches in ~/.bggcli/cache,
+                                    so that next imports do not search them again (default: true)
+    name-cache-dir=<dir>            Directory of the cache of name searches
+    name-cache-ttl=<days>           Names not found are searched again after this number of
+                                    days (default: 30)
+    name-review-file=<file>         CSV file where games that cannot be found by their name are
+                                    written (default: aside the CSV file, '.review.csv' extension)
 
 Arguments:
     <file> The CSV file with games to import
 """
 # Updated for BGG 2018
-import sys
-from bggcli.commands import check_file
-from bggcli.ui.gamepage import GamePage
-from bggcli.ui.loginpage import LoginPage
+from bggcli.commands import authenticate, check_file, game_page_session, get_worker_count
+from bggcli.ui.gamepage import FillPlan, GamePage
+from bggcli.util.collectionclient import CollectionClient
+from bggcli.util.collectionmembership import MembershipLoader
+from bggcli.util.collectionsnapshot import CollectionSnapshot
 from bggcli.util.csvreader import CsvReader
+from bggcli.util.gameresolver import GameResolver
+from bggcli.util.httpclient import HttpClient
+from bggcli.util.importjournal import ImportJournal
 from bggcli.util.logger import Logger
-from bggcli.util.webdriver import WebDriver
-from selenium.common.exceptions import WebDriverException
-
-import traceback
+from bggcli.util.metrics import Metrics
+from bggcli.util.workerpool import WorkerPool
 
+# Number of attempts for a game before giving up
 LOOPLIMIT = 5
+
 def execute(args, options):
     print('Executing!')
-    login = args['--login']
-
     file_path = check_file(args)
 
-    csv_reader = CsvReader(file_path)
-    csv_reader.open()
-    rows = []
-#    try:
     Logger.info("Parsing input file '{}'...".format(file_path))
-    csv_reader.iterate(lambda row: rows.append(row))
-    #Logger.info("Found %s games to put in collection..." % csv_reader.rowCount)
-    rows.reverse()
-    firstrow = rows[0]
-    loop = 0
-    
-    Logger.info("Importing {} games to collection of '{}' ...".format(csv_reader.rowCount,login))
-    while rows:
-        try:
-            with WebDriver('collection-import', args, options) as web_driver:
-                if not LoginPage(web_driver.driver).authenticate(login, args['--password']):
-                    sys.exit(1)
-                #input("Kill Firefox, then Press Enter to continue...")
-                game_page = GamePage(web_driver.driver)
-                while rows:
-                    row = rows.pop()
-                    if firstrow is None or firstrow == row:
-                        loop += 1
-                        if loop >= LOOPLIMIT:
-                            Logger.info("Loop limit of {} reached.".format(loop))
-                            return
-                        Logger.info('Loop {} (maximum {})'.format(loop,LOOPLIMIT))
-                        if rows:
-                            firstrow = rows[0]
-                            Logger.info('First assigned {}'.format(firstrow['objectname']))
-                        else:
-                            firstrow = None
-                            Logger.info('First assigned None')
-                            
-                    Logger.info('(BGGID {}) Name: {} ({} game left)'.format(row['objectid'],row['objectname'],len(rows)+1))
-                    
-                    try:
-                        val = game_page.update(row)
-                        Logger.info('update returned {}'.format(val))
-                        
-                        if val:
-                            #Logger.info('Updated (BGGID {0}) "{1}"'.format(row['objectid'],row['objectname']))
-                            Logger.info('(BGGID {}) Name: {} UPDATED!'.format(row['objectid'],row['objectname'],len(rows)))
-                            #  ({} game left)
-                        else:
-                            rows.insert(0,row)
-                            Logger.info('returned False??, back in queue.'.format(len(rows))) #  ({} game left)
-
-                    except WebDriverException:
-                        rows.insert(0,row)
-                        Logger.info('Exception occurred, back in queue.'.format(len(rows))) # ({} left)
-                        Logger.info('WebDriverException occurred, restarting browser.')
-                        raise
-                        
-                    except Exception as e:
-                        traceback.print_exc(limit=2, file=sys.stdout)
-
-                        rows.insert(0,row)
-                        Logger.info('Exception occurred, back in queue.'.format(len(rows))) #  ({} left)
-
-                        #badrows.append(row)
-                # for row in rows:
-                    # try:
-                        # game_page.update(row)
-                    # except:
-                        # badrows.append(row)
-                    # print
-        except WebDriverException:
-            pass
+    csv_reader = CsvReader(file_path)
+    csv_reader.open(resolve_names=True)
+    Logger.info("Found {} games to put in collection...".format(csv_reader.rowCount))
+    Logger.verbose("Fill plan: {}".format(FillPlan.compile(csv_reader.fieldnames)))
+    if not csv_reader.rowCount:
+        Logger.info("Import has finished.")
+        return
+
+    resolver = None
+    if csv_reader.unresolvedCount:
+        Logger.info("{} games without objectid will be searched by name.".format(
+            csv_reader.unresolvedCount))
+        resolver = GameResolver.from_options(options, file_path).open()
+    try:
+        import_rows(csv_reader, resolver, args, options)
+    finally:
+        if resolver is not None:
+            resolver.close()
+            if resolver.reviews:
+                Logger.info("{} games could not be found by name, see {}".format(
+                    resolver.reviews, resolver.review_path))
+
+
+def import_rows(csv_reader, resolver, args, options):
+    login = args['--login']
+    file_path = csv_reader.file_path
+
+    # Rows are parsed and filtered lazily, while games are imported
+    rows = csv_reader.rows()
+    total = csv_reader.rowCount
+    if resolver is not None:
+        rows = resolver.resolve_rows(rows)
+        total = None
+    cookies = None
+    if options.get('skip-unchanged') == 'true':
+        cookies = authenticate('collection-import', args, options)
+        rows = skip_unchanged(rows, cookies, login)
+        total = None
+
+    with ImportJournal(file_path).open(args['--resume']) as journal:
+        if args['--resume']:
+            Logger.info("Resuming import, {} games already imported will be skipped.".format(
+                len(journal.entries)))
+            rows = (row for row in rows if not journal.is_done(row))
+            total = None
+
+        Logger.info("Importing games to collection of '{}' ...".format(login))
+
+        if options.get('engine') == 'http':
+            if cookies is None:
+                cookies = authenticate('collection-import', args, options)
+            rows = http_import(rows, cookies, journal, total)
+            if rows:
+                Logger.info("Importing {} remaining games through the web browser...".format(
+                    len(rows)))
+            total = None
+
+        report = browser_import(rows, args, options, journal, total)
+        if report.failed:
+            Logger.info("Use --resume to import the remaining games later.")
+            return
+
+    journal.remove()
     Logger.info("Import has finished.")
+
+
+def skip_unchanged(rows, cookies, login):
+    """
+    Yields the rows having values to update, with only the values differing from the current
+    collection
+    """
+    Logger.info("Fetching current collection of '{}'...".format(login))
+    snapshot = CollectionSnapshot.fetch(cookies, login)
+    Logger.info("{} games in collection, only games having changes are imported.".format(
+        len(snapshot)))
+    for row in rows:
+        changed_row = snapshot.diff(row)
+        if changed_row is not None:
+            yield changed_row
+
+
+def http_import(rows, cookies, journal, total=None):
+    """
+    Imports the rows over HTTP, and returns the rows that must be imported through the web
+    browser instead
+    """
+    client = CollectionClient(HttpClient(cookies))
+    remaining = []
+    for index, row in enumerate(rows):
+        objectname = row.get('objectname') or \
+            '(name not available for objectid={})'.format(row['objectid'])
+        Logger.info('[{}/{}] (BGGID {}) {}... '.format(index + 1, total or '?', row['objectid'],
+                                                      objectname), break_line=False)
+        if not client.supports(row):
+            remaining.append(row)
+            Logger.info(' [web browser required]', append=True)
+            continue
+        try:
+            if client.update(row):
+                journal.record(row)
+                Metrics.get().inc('rows_processed_total')
+                Logger.info(' [done]', append=True)
+                continue
+        except Exception as e:
+            Logger.info(' [error: {}]'.format(e), append=True, break_line=False)
+        remaining.append(row)
+        Logger.info(' [falling back to web browser]', append=True)
+    return remaining
+
+
+def browser_import(rows, args, options, journal, total=None):
+    worker_count = get_worker_count(options)
+    if worker_count > 1:
+        Logger.info("Using {} web browsers...".format(worker_count))
+
+    # Games already in the collection are edited straight away, without looking for the 'Add
+    # to Collection' button first. Loaded when the first row is pulled, before any web browser
+    # is opened
+    loader = MembershipLoader(args['--login'], options=options)
+    if total is None and isinstance(rows, list):
+        total = len(rows)
+
+    def update(game_page, row):
+        if game_page.update(row):
+            journal.record(row)
+            membership = loader.membership
+            if membership is not None and row['objectid'] not in membership:
+                # Next rows of the same game edit the item added now
+                membership.add(row['objectid'], None)
+            return True
+        return False
+
+    report = WorkerPool(worker_count, LOOPLIMIT).run(
+        loader.rows(rows),
+        lambda index: game_page_session('collection-import-%s' % index, args, options,
+                                        loader.membership),
+        update, total)
+
+    if not report.total:
+        return report
+    Logger.info("Web browser import has finished ({}).".format(report))
+    if GamePage.page_load_summary():
+        Logger.info(GamePage.page_load_summary())
+    return report
@@ -0,0 +1,112 @@
+"""
+Synchronize a local copy of a game collection, stored in a SQLite database.
+
+The first synchronization downloads the whole collection, next ones only download the games
+modified since the previous one. The local copy can then be exported in any format without
+waiting for BGG.
+
+Note games removed from the collection are only removed from the local copy by a full
+synchronization (--full).
+
+Usage: bggcli [-v] -l <login> -p <password>
+              [-c <name>=<value>]...
+              collection-sync [--full] [--export <file>] <store>
+
+Options:
+    -v                              Activate verbose logging
+    -l, --login <login>             Your login on BGG
+    -p, --password <password>       Your password on BGG
+    --full                          Download the whole collection, even if it has already been
+                                    synchronized
+    --export <file>                 Export the collection from the local copy once synchronized,
+                                    as done by collection-export. '-' writes it to the standard
+                                    output
+    -c <name=value>                 To specify advanced options, see below
+
+Advanced options:
+    browser-keep=<true|false>       If you want to keep your web browser opened at the end of the
+                                    operation
+    browser-profile-dir=<dir>       Path or your browser profile if you want to use an existing
+    browser-headless=<true|false>   To run the web browser without any window, e.g. on a server
+                                    without display
+    session-cache=<true|false>      To reuse the session of a previous command instead of logging in
+                                    again. Session cookies are stored in ~/.bggcli/sessions,
+                                    only readable by you
+    session-cache-dir=<dir>         Directory of the session cache
+    export-poll-interval=<seconds>  Delay before asking again for an export queued by BGG,
+                                    doubled after each request (default: 2)
+    export-poll-max=<seconds>       Maximum delay between two requests (default: 30)
+    export-timeout=<seconds>        Maximum time waiting for a queued export (default: 600)
+    export-format=<format>          Format of the exported file: csv, jsonl, sqlite or parquet.
+                                    Guessed from the file extension by default
+
+Arguments:
+    <store> The SQLite database holding the local copy, created if it does not exist
+"""
+import time
+
+from bggcli import BGG_CSV_EXPORT_FIELDS
+from bggcli.commands import authenticate
+from bggcli.util.collectionstore import CollectionStore, STORE_COLUMNS
+from bggcli.util.exportwriter import STDOUT_PATH, get_export_format, open_export_writer
+from bggcli.util.logger import Logger
+from bggcli.util.xmlapi import PollingSchedule, collection_request, fetch
+from bggcli.util.xmltocsv import XmlToCsv
+
+
+def execute(args, options):
+    login = args['--login']
+    store_path = args['<store>']
+    export_path = args['--export']
+    export_format = None
+    if export_path is not None:
+        export_format = get_export_format(export_path, options.get('export-format'))
+        if export_path == STDOUT_PATH:
+            # Standard output only receives the exported data
+            Logger.toStderr = True
+
+    with CollectionStore(store_path).open(login) as store:
+        watermark = None if args['--full'] else store.watermark()
+        if watermark is None:
+            Logger.info("Downloading the whole collection of '%s'..." % login)
+        else:
+            Logger.info("Downloading games of '%s' modified since %s..." % (login, watermark))
+
+        cookies = authenticate('collection-sync', args, options)
+        try:
+            count = sync(store, cookies, login, watermark, PollingSchedule.from_options(options))
+        except Exception as e:
+            Logger.error('Error while synchronizing collection!', e, sysexit=True)
+            return
+        Logger.info('%s games updated, %s games in local copy %s' % (count, len(store),
+                                                                      store_path))
+
+        if export_path is not None:
+            with open_export_writer(export_path, BGG_CSV_EXPORT_FIELDS, export_format) as writer:
+                writer.write_rows(store.rows(BGG_CSV_EXPORT_FIELDS))
+            Logger.info("Collection has been exported as %s" % export_path)
+
+
+def modified_since_parameter(watermark):
+    """
+    Returns the 'modifiedsince' parameter of the XML API (YY-MM-DD HH:MM:SS) for a watermark
+    (YYYY-MM-DD HH:MM:SS)
+    """
+    return watermark[2:]
+
+
+def sync(store, cookies, login, watermark=None, schedule=None):
+    """
+    Fetches the collection items, all of them or only the ones modified since the watermark,
+    and upserts them in the store. Returns the number of fetched items
+    """
+    params = {}
+    if watermark is not None:
+        params['modifiedsince'] = modified_since_parameter(watermark)
+    response = fetch(collection_request(cookies, login, **params), schedule)
+    try:
+        return store.upsert(XmlToCsv.iterate_tuples(response, STORE_COLUMNS, 'boardgame'),
+                            full=watermark is None,
+                            synced_at=time.strftime('%Y-%m-%d %H:%M:%S'))
+    finally:
+        response.close()
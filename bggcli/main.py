@@ -18,12 +18,43 @@ Advanced options:
                                     operation
     browser-profile-dir=<dir>       Path or your browser profile if you want to use an existing
                                     profile (useful for debugging purpose)
+    browser-headless=<true|false>   To run the web browser without any window, e.g. on a server
+                                    without display
+    browser-lean=<true|false>       Lighter web browser: no images, no web fonts, no ads or
+                                    trackers, and pages are used as soon as their content is
+                                    loaded. The average page load time is logged at the end
+    session-cache=<true|false>      To reuse the session of a previous command instead of logging in
+                                    again. Session cookies are stored in ~/.bggcli/sessions,
+                                    only readable by you
+    session-cache-dir=<dir>         Directory of the session cache
+    rate-limit=<requests/s>         Maximum number of requests per second sent to BGG, by HTTP
+                                    calls and web browsers. Slowed down when BGG answers it is
+                                    busy (HTTP 429 or 503). 0 to disable (default: 2)
+    rate-limit-burst=<count>        Number of requests which can be sent at once after a pause
+                                    (default: 5)
+    rate-limit-shared=<true|false>  To share the rate limit with all bggcli processes of the
+                                    host, e.g. parallel scheduled jobs, through a locked file
+    rate-limit-file=<file>          File of the shared rate limit
+                                    (default: ~/.bggcli/ratelimit.json)
+    trace-file=<file>               To record the duration of each step of the command (rows,
+                                    page loads, form filling, requests...) in a trace file, to
+                                    open in chrome://tracing or https://ui.perfetto.dev
+    trace-summary=<true|false>      To display the median and 95th percentile duration of each
+                                    step at the end of the command
+    metrics-file=<file>             To write metrics of the command (rows processed, failed and
+                                    requeued, retries, browser restarts, logins, bytes
+                                    downloaded, latencies...) in a Prometheus text file, e.g. in
+                                    the directory of the node exporter textfile collector
+    metrics-interval=<seconds>      Delay between two updates of the metrics file while the
+                                    command runs, 0 to only write it at the end (default: 30)
 
 Available commands are:
    help                 Display general help or help for a specific command
    collection-import    Import a game collection from a CSV file
-   collection-export    Export a game collection as a CSV file
+   collection-export    Export a game collection as a CSV, JSON Lines, SQLite or Parquet file
    collection-delete    Delete games in a collection
+   collection-sync      Synchronize a local copy of a game collection, only downloading changes
+   collection-enrich    Add the details of the games (ratings, weight, rank...) to a CSV file
 
 See 'bggcli help <command>' for more information on a specific command.
 """
@@ -37,6 +68,9 @@ from docopt import DocoptExit
 
 from bggcli import UI_ERROR_MSG
 from bggcli.util.logger import Logger
+from bggcli.util.metrics import Metrics
+from bggcli.util.ratelimiter import RateLimiter
+from bggcli.util.tracer import Tracer
 from bggcli.version import VERSION
 #import traceback
 
@@ -139,7 +173,20 @@ def execute_command(command, argv):
 
         if command_args:
             #print(command_args, command_args_options)
-            command_module.execute(command_args, command_args_options)
+            limiter = RateLimiter.configure(command_args_options)
+            tracer = Tracer.configure(command_args_options)
+            metrics = Metrics.configure(command_args_options, command)
+            metrics.start()
+            success = False
+            try:
+                with tracer.span('command', command=command):
+                    command_module.execute(command_args, command_args_options)
+                success = True
+            finally:
+                tracer.report()
+                metrics.stop(success)
+            if limiter.summary():
+                Logger.info("(%s)" % limiter.summary())
             show_duration(timer_start)
     except ImportError:
         #traceback.print_exc()
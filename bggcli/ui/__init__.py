@@ -2,7 +2,10 @@
 # Modified timeout from 5 to 15 seconds
 
 import os
+import time
 
+from bggcli.util.metrics import Metrics
+from bggcli.util.ratelimiter import RateLimiter
 from selenium.webdriver.common.by import By
 
 from selenium.webdriver.support import expected_conditions as EC
@@ -20,6 +23,15 @@ class BasePage:
             timeout = 15
         self.wait = WebDriverWait(driver, timeout)
 
+    def navigate(self, url):
+        """
+        Loads a page once the rate limiter allows it
+        """
+        RateLimiter.get().acquire()
+        start = time.time()
+        self.driver.get(url)
+        Metrics.get().observe('page_load_seconds', time.time() - start)
+
     @staticmethod
     def update_text(el, value):
         el.clear()
@@ -19,7 +19,7 @@ class CollectionPage(BasePage):
 
         :param login: User login
         """
-        self.driver.get("%s/collection/user/%s" % (BGG_BASE_URL, login))
+        self.navigate("%s/collection/user/%s" % (BGG_BASE_URL, login))
         try:
             self.driver.find_element_by_xpath("//td[contains(@class, 'collection_objectname')]")
         except NoSuchElementException:
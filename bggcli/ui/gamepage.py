@@ -9,15 +9,17 @@ Selenium Page Object to bind the game details page
 
 """
 import time
-import inspect
 from selenium.common.exceptions import NoSuchElementException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.action_chains import ActionChains
 
-from bggcli import BGG_BASE_URL, BGG_SUPPORTED_FIELDS
+from bggcli import BGG_BASE_URL, BGG_SUPPORTED_FIELDS, BGG_FIELD_DEPENDENCIES, \
+    is_field_applicable
 from bggcli.ui import BasePage
 from bggcli.util.logger import Logger
+from bggcli.util.tracer import span, traced
+from bggcli.util.webdriver import WebDriver
 import traceback
 
 
@@ -68,7 +70,143 @@ def in_version_popup(func):
     return _wrapper
 
 
+# Location of the values in the Angular model of the edit form (editctrl.editdata.item), used
+# to fill the form with a single script
+MODEL_PATHS = {
+    'own': 'status.own',
+    'prevowned': 'status.prevowned',
+    'fortrade': 'status.fortrade',
+    'want': 'status.want',
+    'wanttoplay': 'status.wanttoplay',
+    'wanttobuy': 'status.wanttobuy',
+    'wishlist': 'status.wishlist',
+    'preordered': 'status.preordered',
+    'wishlistpriority': 'wishlistpriority',
+    'rating': 'rating',
+    'comment': 'textfield.comment.value',
+    'conditiontext': 'textfield.conditiontext.value',
+    'wishlistcomment': 'textfield.wishlistcomment.value',
+    'haspartslist': 'textfield.haspartslist.value',
+    'wantpartslist': 'textfield.wantpartslist.value',
+    'pricepaid': 'pricepaid',
+    'pp_currency': 'pp_currency',
+    'currvalue': 'currvalue',
+    'cv_currency': 'cv_currency',
+    'acquisitiondate': 'acquisitiondate',
+    'acquiredfrom': 'acquiredfrom',
+    'quantity': 'quantity',
+    'privatecomment': 'privatecomment',
+    'invlocation': 'invlocation',
+    'publisherid': 'publisherid',
+    'imageid': 'imageid',
+    'year': 'year',
+    'other': 'other',
+    '_versionid': 'versionid',
+}
+
+# Sets all values in the Angular model, then submits the form like WebElement.submit() does.
+# Values keep the type already used by the model (e.g. booleans for checkboxes). The language
+# is provided by its name, and is converted to its identifier with the form configuration
+FILL_SCRIPT = """
+var values = arguments[0], language = arguments[1];
+var form = document.querySelector("form[name='collectioneditorform']");
+if (!form || !window.angular) { return false; }
+var scope = angular.element(form).scope();
+var editdata = scope.editctrl.editdata;
+var item = editdata.item;
+scope.$apply(function() {
+    Object.keys(values).forEach(function(path) {
+        var keys = path.split('.'), obj = item;
+        for (var i = 0; i < keys.length - 1; i++) {
+            if (obj[keys[i]] === undefined || obj[keys[i]] === null) { obj[keys[i]] = {}; }
+            obj = obj[keys[i]];
+        }
+        var key = keys[keys.length - 1], value = values[path], current = obj[key];
+        if (typeof current === 'boolean') { value = (value === '1'); }
+        else if (typeof current === 'number' && value !== '') { value = Number(value); }
+        obj[key] = value;
+    });
+    if (language !== null) {
+        var matches = editdata.config.languages.filter(function(l) { return l.name === language; });
+        item.languageid = matches.length ? matches[0].languageid : '';
+    }
+});
+var event = form.ownerDocument.createEvent('Event');
+event.initEvent('submit', true, true);
+if (form.dispatchEvent(event)) { form.submit(); }
+return true;
+"""
+
+# Either the "Add to Collection" or the "In Collection" button of the toolbar
+COLLECTION_TOOLBAR_XPATH = "//button[contains(@ng-click, 'colltoolbarctrl.editItem') " \
+                           "or @id='button-collection']"
+
+
+# Fields of the "Advanced" panel (private info, parts exchange)
+ADVANCED_PANEL_FIELDS = ['pricepaid', 'pp_currency', 'currvalue', 'cv_currency', 'acquisitiondate',
+                         'acquiredfrom', 'quantity', 'privatecomment', 'invlocation',
+                         'haspartslist', 'wantpartslist']
+# Fields always visible in the edit form. Other fields require the "Customize Game Info" panel
+MAIN_FORM_FIELDS = ['objectid', 'objectname', 'own', 'prevowned', 'fortrade', 'want', 'wanttoplay',
+                    'wanttobuy', 'wishlist', 'wishlistpriority', 'preordered', 'conditiontext',
+                    'wishlistcomment', 'comment', 'rating']
+
+
+class FillPlan:
+    """
+    Fillers to invoke for a set of CSV columns, and panels of the edit form to open. Compiled once
+    per set of columns (i.e. per input file) instead of for each row
+    """
+    _cache = {}
+
+    def __init__(self, fieldnames):
+        self.fieldnames = frozenset(fieldnames)
+        # Supported fields order matters, e.g. 'fortrade' must be filled before 'conditiontext'
+        self.steps = [(key, getattr(GamePage, 'fill_%s' % key),
+                       list(BGG_FIELD_DEPENDENCIES.get(key, {}).items()))
+                      for key in BGG_SUPPORTED_FIELDS if key in self.fieldnames]
+        keys = [key for key, _, _ in self.steps]
+        self.needs_advanced = any(key in ADVANCED_PANEL_FIELDS for key in keys)
+        self.needs_custom = any(key not in MAIN_FORM_FIELDS and key not in ADVANCED_PANEL_FIELDS
+                                for key in keys)
+
+    @staticmethod
+    def compile(fieldnames):
+        """
+        Returns the plan for these columns, compiled on first use
+
+        :param fieldnames: Names of the CSV columns
+        """
+        key = frozenset(fieldnames)
+        plan = FillPlan._cache.get(key)
+        if plan is None:
+            plan = FillPlan._cache[key] = FillPlan(key)
+        return plan
+
+    def fill(self, page, game_attrs):
+        """
+        Fills the edit form of the page with the provided values
+        """
+        for key, filler, dependencies in self.steps:
+            value = game_attrs.get(key)
+            if value is None:
+                continue
+            if any(str(game_attrs.get(dep_key)) != str(dep_value)
+                   for dep_key, dep_value in dependencies):
+                continue
+            with span('fill_%s' % key):
+                filler(page, value)
+
+    def __str__(self):
+        panels = [name for name, needed in (('advanced', self.needs_advanced),
+                                            ('custom', self.needs_custom)) if needed]
+        return '%s fields, panels: %s' % (len(self.steps), ', '.join(panels) or 'none')
+
+
 class GamePage(BasePage):
+    # Durations of game page loads, shared by all pages (i.e. all workers)
+    page_load_times = []
+
     # CSV_SUPPORTED_COLUMNS = [
     #     'objectid', 'rating', 'weight', 'own', 'fortrade', 'want', 'wanttobuy', 'wanttoplay',
     #     'prevowned', 'preordered', 'wishlist', 'wishlistpriority', 'wishlistcomment', 'comment',
@@ -79,33 +217,63 @@ class GamePage(BasePage):
     #objectname	objectid	rating	own	fortrade	want	wanttobuy	wanttoplay	prevowned	preordered	wishlist	wishlistpriority	wishlistcomment	comment	conditiontext	haspartslist	wantpartslist	publisherid	imageid	year	language	other	pricepaid	pp_currency	currvalue	cv_currency	acquisitiondate	acquiredfrom	quantity	privatecomment	_versionid
 
 
-    def __init__(self, driver):
+    def __init__(self, driver, fill_by_script=False, membership=None):
+        """
+        :param driver: Selenium driver
+        :param fill_by_script: True to fill the edit form with a single script, instead of
+                               updating each field like a user would do
+        :param membership: CollectionMembership of the collection, so that games known to be in
+                           it are edited without looking for the 'Add to Collection' button
+        """
         BasePage.__init__(self, driver)
 
+        self.fill_by_script = fill_by_script
+        self.membership = membership
         self.itemEl = None
         self.privateInfoPopupEl = None
         self.versionPopupEl = None
 
+    def recover(self):
+        """
+        Resets the page after an error, returns False if the web browser must be restarted
+        """
+        self.itemEl = None
+        self.privateInfoPopupEl = None
+        self.versionPopupEl = None
+        return WebDriver.reset(self.driver)
+
     # Verified BGG 2018
     def goto(self, game_attrs):
         """
-        Set Web Driver on the game details page
+        Set Web Driver on the game details page, and wait for the collection toolbar
 
         :param game_attrs: Game attributes as a dictionary
         """
-        self.driver.get("%s/boardgame/%s" % (BGG_BASE_URL, game_attrs['objectid']))
+        start = time.time()
+        with span('navigate', objectid=game_attrs['objectid']):
+            self.navigate("%s/boardgame/%s" % (BGG_BASE_URL, game_attrs['objectid']))
+            # With the 'eager' page load strategy, the page is returned before the toolbar is
+            # rendered
+            self.wait.until(EC.presence_of_element_located((By.XPATH, COLLECTION_TOOLBAR_XPATH)))
+        GamePage.page_load_times.append(time.time() - start)
+
+    @staticmethod
+    def page_load_summary():
+        """
+        Returns the average time to load a game page, to compare browser configurations
+        """
+        count = len(GamePage.page_load_times)
+        if not count:
+            return None
+        return "average game page load: %.2fs over %s pages" \
+               % (sum(GamePage.page_load_times) / count, count)
 
     # Verified BGG 2018
     def update(self, game_attrs):
         #Logger.info("update()", append=True, break_line=True)
 
-        # First, see if objectid exists.
-        id = game_attrs.get('objectid',None)
-
-        # if objectid doesn't exist, find it via the name:
-        # this doesn't work at the moment. All the work is done in updateid()
-        if id is None:
-            pass
+        # Games without objectid have been found via their name before, see GameResolver.
+        # All the work is done in updateid()
         return self.updateid(game_attrs)
 
     def notincollection(self):
@@ -118,13 +286,30 @@ class GamePage(BasePage):
         except NoSuchElementException:
             return False
 
-    def openeditform(self):
-        button = self.notincollection()
+    def in_collection(self, game_attrs):
+        """
+        Returns True when the game is known to be in the collection, None when unknown
+        """
+        if self.membership is not None and game_attrs.get('objectid') in self.membership:
+            return True
+        return None
+
+    @traced('openeditform')
+    def openeditform(self, in_collection=None):
+        """
+        :param in_collection: True when the game is known to be in the collection: the 'Add to
+                              Collection' button is not looked for, it would only be found
+                              after the implicit wait of the driver
+        """
+        button = None if in_collection else self.notincollection()
         if button:
             button.click()
         else:
-            Logger.info(" not found. ", append=True, break_line=False)
-            Logger.info("(i.e. game in col'n)...", append=True, break_line=False)
+            if in_collection:
+                Logger.info("(game in col'n)...", append=True, break_line=False)
+            else:
+                Logger.info(" not found. ", append=True, break_line=False)
+                Logger.info("(i.e. game in col'n)...", append=True, break_line=False)
             # div = self.driver.find_element_by_xpath(
             # "(//div[@class, 'toolbar-actions'])[last()]")
 
@@ -170,7 +355,7 @@ class GamePage(BasePage):
         #       a) click the "In Collection" button.
         #       b) click the "Edit" button
         #    4) Open the additional two form dialogs
-        #       (Show Advanced, Show Custom)
+        #       (Show Advanced, Show Custom), when the fill plan needs them
         #    5) fill out items on form, dependencies show which values must
         #       exist before the indicated item.
         #       For example, 'wishlistpriority':{'wishlist':1},
@@ -186,83 +371,36 @@ class GamePage(BasePage):
 
         Logger.info("page, ", append=False, break_line=False)
 
-        self.openeditform()
+        self.openeditform(self.in_collection(game_attrs))
+
+        if self.fill_by_script:
+            try:
+                if self.submit_by_script(game_attrs):
+                    Logger.info("submitted by script. ", append=True, break_line=False)
+                    return True
+                Logger.info("no form model, ", append=True, break_line=False)
+            except WebDriverException as e:
+                Logger.verbose("Script failed: %s" % repr(e))
+            Logger.info("filling fields... ", append=True, break_line=False)
+
+        plan = FillPlan.compile(game_attrs.keys())
 
         # Open advanced data entry panel.
         #<a class="toggler-caret" ng-href="" ng-click="editctrl.showvars.showAdvanced = !editctrl.showvars.showAdvanced" ng-class="{ 'is-active': editctrl.showvars.showAdvanced }"> 			<span class="glyphicon glyphicon-menu-right"></span> 			<strong>Advanced</strong> (private info, parts exchange) 		</a>
-        Logger.info("Advanced button...", append=True, break_line=False)
-        self.wait.until(EC.element_to_be_clickable(
-            (By.XPATH,
-            "//a[starts-with(@class,'toggler-caret') and starts-with(@ng-click,'editctrl.showvars.showAdvanced')]"
-            )))
-        try:
-            Logger.info("finding advanced dropdown...", append=True, break_line=False)
-            b = self.itemEl.find_element_by_xpath(".//a[@class='toggler-caret' and starts-with(@ng-click,'editctrl.showvars.showAdvanced')]")
-            Logger.info("Click. ", append=True, break_line=False)
-            b.click()
-        except:
-            Logger.info("Failed.", append=True, break_line=False)
-            pass
+        if plan.needs_advanced:
+            self.open_advanced_panel()
         # Open Customize Game Info data entry panel.
         #<a class="toggler-caret" ng-href="" ng-click="editctrl.showvars.showCustom = !editctrl.showvars.showCustom" ng-class="{ 'is-active': editctrl.showvars.showCustom }"> 				<span class="glyphicon glyphicon-menu-right"></span> 				<strong>Customize Game Info</strong> (title, image) 			</a>
-        Logger.info("Custom button...", append=True, break_line=False)
-        self.wait.until(EC.element_to_be_clickable(
-            (By.XPATH,
-            "//a[starts-with(@class,'toggler-caret') and starts-with(@ng-click,'editctrl.showvars.showCustom')]"
-            )))
-        try:
-            self.itemEl.find_element_by_xpath(".//a[@class='toggler-caret' and starts-with(@ng-click,'editctrl.showvars.showCustom')]").click()
-        except:
-            Logger.info("Failed. ", append=True, break_line=False)
-
-        # custom = self.wait.until(EC.element_to_be_clickable(
-            # (By.XPATH, ".//a[starts-with(@ng-click,'editctrl.showvars.showCustom')]")))
-        # custom.click()
-
-        #<input ng-model="editctrl.editdata.item.textfield.customname.value" class="form-control ng-pristine ng-valid ng-empty ng-touched" type="text" placeholder="Gloomhaven Nickname" style="">
-        Logger.info("Name field...", append=True, break_line=False)
-        nickname = self.wait.until(EC.element_to_be_clickable(
-            (By.XPATH, './/input[@ng-model="editctrl.editdata.item.textfield.customname.value"]')))
-
-        # self.itemEl = self.wait.until(EC.element_to_be_clickable(
-            # (By.XPATH, "//form[@name='collectioneditorform']")))
-        # Fill all provided values using dynamic invocations 'fill_[fieldname]'
-        dependencies = {
-            'wishlist': {'wishlist': 1},
-            'wishlistpriority':{'wishlist':1},
-            'wishlistcomment':{'wishlist':1},
-            'conditiontext':{'fortrade':1},
-            'wanttoplay':{'wanttoplay': 1},
-            'wanttobuy': {'wanttobuy': 1},
-            'own': {'own': 1},
-        }
-
-# 'fortrade', 'conditiontext',   # these must be in this order
-# 'wishlist', 'wishlistpriority', 'wishlistcomment', # these must be in this order
-
+        if plan.needs_custom:
+            self.open_custom_panel()
 
+        # Fill all provided values using the fillers 'fill_[fieldname]' of the plan
+        # 'fortrade', 'conditiontext',   # these must be in this order
+        # 'wishlist', 'wishlistpriority', 'wishlistcomment', # these must be in this order
         Logger.info("Updating fields: ", append=True, break_line=False)
         try:
-            for key in BGG_SUPPORTED_FIELDS:
-                dontdo = 0
-
-                if key in game_attrs:
-                    value = game_attrs[key]
-                    if value is not None:
-                        #print '{}'.format(key),
-                        #time.sleep(2)
-                        dep = dependencies.get(key,None)
-                        if dep:
-                            #print 'depends on: ',
-                            for k,v in dep.items(): # for python 2: iteritems()
-                                #print '{}={}?'.format(k,v),
-                                if str(game_attrs[k]) != str(v):
-                                    dontdo = 1
-                            if dontdo:
-                                continue
-
-                            getattr(self, "fill_%s" % key)(value)
-
+            with span('fill'):
+                plan.fill(self, game_attrs)
         except:
             Logger.info("\nEXCEPTION.", append=True, break_line=True)
             traceback.print_exc()
@@ -270,14 +408,15 @@ class GamePage(BasePage):
         # <button class="visible-xs-inline btn btn-primary" ng-disabled="editctrl.saving" type="submit"> 				<span>Save</span> 			</button>
         #savebutton = self.itemEl.find_element_by_xpath(".//button[@ng-disabled='editctrl.saving']")
         Logger.info("Form? ", append=True, break_line=False)
-        form = self.itemEl.find_element_by_xpath(".//form[@name='collectioneditorform']")
-        # action=selenium.interactions.Actions(driver);
-        # import selenium.webdriver.common.actions.pointer_actions
-        # selenium.webdriver.common.actions.pointer_actions().click(savebutton)
-        #Logger.info("submitting, ", append=True, break_line=False)
-        form.submit() ;
-        Logger.info("submitted. ", append=True, break_line=False)
-        time.sleep(0.1)
+        with span('submit'):
+            form = self.itemEl.find_element_by_xpath(".//form[@name='collectioneditorform']")
+            # action=selenium.interactions.Actions(driver);
+            # import selenium.webdriver.common.actions.pointer_actions
+            # selenium.webdriver.common.actions.pointer_actions().click(savebutton)
+            #Logger.info("submitting, ", append=True, break_line=False)
+            form.submit() ;
+            Logger.info("submitted. ", append=True, break_line=False)
+            time.sleep(0.1)
         # action.moveToElement(savebutton).click().perform();
         return True
         # Save "Private Info" popup if opened
@@ -300,7 +439,59 @@ class GamePage(BasePage):
 
         return True
 
+    @traced('open_advanced_panel')
+    def open_advanced_panel(self):
+        Logger.info("Advanced button...", append=True, break_line=False)
+        self.wait.until(EC.element_to_be_clickable(
+            (By.XPATH,
+            "//a[starts-with(@class,'toggler-caret') and starts-with(@ng-click,'editctrl.showvars.showAdvanced')]"
+            )))
+        try:
+            Logger.info("finding advanced dropdown...", append=True, break_line=False)
+            b = self.itemEl.find_element_by_xpath(".//a[@class='toggler-caret' and starts-with(@ng-click,'editctrl.showvars.showAdvanced')]")
+            Logger.info("Click. ", append=True, break_line=False)
+            b.click()
+        except:
+            Logger.info("Failed.", append=True, break_line=False)
+            pass
+
+    @traced('open_custom_panel')
+    def open_custom_panel(self):
+        Logger.info("Custom button...", append=True, break_line=False)
+        self.wait.until(EC.element_to_be_clickable(
+            (By.XPATH,
+            "//a[starts-with(@class,'toggler-caret') and starts-with(@ng-click,'editctrl.showvars.showCustom')]"
+            )))
+        try:
+            self.itemEl.find_element_by_xpath(".//a[@class='toggler-caret' and starts-with(@ng-click,'editctrl.showvars.showCustom')]").click()
+        except:
+            Logger.info("Failed. ", append=True, break_line=False)
+
+        #<input ng-model="editctrl.editdata.item.textfield.customname.value" class="form-control ng-pristine ng-valid ng-empty ng-touched" type="text" placeholder="Gloomhaven Nickname" style="">
+        Logger.info("Name field...", append=True, break_line=False)
+        self.wait.until(EC.element_to_be_clickable(
+            (By.XPATH, './/input[@ng-model="editctrl.editdata.item.textfield.customname.value"]')))
+
+    @traced('submit_by_script')
+    def submit_by_script(self, game_attrs):
+        """
+        Fills the opened edit form and submits it with a single script. Returns False if the
+        form model can't be found, the form being left untouched
+
+        :param game_attrs: Game attributes as a dictionary
+        """
+        values = {}
+        for key, path in MODEL_PATHS.items():
+            value = game_attrs.get(key)
+            if value is None or not is_field_applicable(game_attrs, key):
+                continue
+            values[path] = value
+
+        language = game_attrs.get('language')
+        return self.driver.execute_script(FILL_SCRIPT, values, language) is True
+
     # Not verified BGG 2018
+    @traced('delete')
     def delete(self, game_attrs):
         """
         Delete a game in the collection
@@ -308,13 +499,14 @@ class GamePage(BasePage):
         :param game_attrs: Game attributes as a dictionary. Only the id will be used
         """
 
+        in_collection = self.in_collection(game_attrs)
         self.goto(game_attrs)
         #<button type="button" uib-tooltip="More options" tooltip-popup-delay="500" tooltip-append-to-body="true" tooltip-placement="left" class="btn btn-empty text-muted dropdown-toggle" uib-dropdown-toggle="" aria-haspopup="true" aria-expanded="false"> 				<span class="glyphicon glyphicon-option-vertical"></span> 			</button>
         try:
-            if self.notincollection():
+            if not in_collection and self.notincollection():
                 Logger.info(" (not in collection)", append=True, break_line=False)
                 return # Not in collection
-            self.openeditform()
+            self.openeditform(in_collection)
 
             more = self.driver.find_element_by_xpath("//button[@uib-tooltip='More options']'")
             more.click()
@@ -379,45 +571,32 @@ class GamePage(BasePage):
     def fill_weight(self, value):
         self.update_select(self.itemEl.find_element_by_xpath(".//select[@name='weight']"), value)
 
+    def fill_status(self, name, value):
+        self.update_checkbox(self.itemEl, ".//input[@ng-model='item.status.%s']" % name, value)
+
     def fill_own(self, value):
-        varname = inspect.currentframe().f_code.co_name[5:]
-        self.update_checkbox(self.itemEl, ".//input[@ng-model='item.status.{}']".format(varname),
-                             value)
+        self.fill_status('own', value)
 
     def fill_fortrade(self, value):
-        varname = inspect.currentframe().f_code.co_name[5:]
-        self.update_checkbox(self.itemEl, ".//input[@ng-model='item.status.{}']".format(varname),
-                             value)
+        self.fill_status('fortrade', value)
 
     def fill_want(self, value):
-        varname = inspect.currentframe().f_code.co_name[5:]
-        self.update_checkbox(self.itemEl, ".//input[@ng-model='item.status.{}']".format(varname),
-                             value)
+        self.fill_status('want', value)
 
     def fill_wanttobuy(self, value):
-        varname = inspect.currentframe().f_code.co_name[5:]
-        self.update_checkbox(self.itemEl, ".//input[@ng-model='item.status.{}']".format(varname),
-                             value)
+        self.fill_status('wanttobuy', value)
 
     def fill_wanttoplay(self, value):
-        varname = inspect.currentframe().f_code.co_name[5:]
-        self.update_checkbox(self.itemEl, ".//input[@ng-model='item.status.{}']".format(varname),
-                             value)
+        self.fill_status('wanttoplay', value)
 
     def fill_prevowned(self, value):
-        varname = inspect.currentframe().f_code.co_name[5:]
-        self.update_checkbox(self.itemEl, ".//input[@ng-model='item.status.{}']".format(varname),
-                             value)
+        self.fill_status('prevowned', value)
 
     def fill_preordered(self, value):
-        varname = inspect.currentframe().f_code.co_name[5:]
-        self.update_checkbox(self.itemEl, ".//input[@ng-model='item.status.{}']".format(varname),
-                             value)
+        self.fill_status('preordered', value)
 
     def fill_wishlist(self, value):
-        varname = inspect.currentframe().f_code.co_name[5:]
-        self.update_checkbox(self.itemEl, ".//input[@ng-model='item.status.{}']".format(varname),
-                             value)
+        self.fill_status('wishlist', value)
 
     def fill_wishlistpriority(self, value):
         #Wishlist checkbox must be checked for this to be visible
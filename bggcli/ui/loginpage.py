@@ -15,19 +15,30 @@ from selenium.common.exceptions import NoSuchElementException
 from bggcli import BGG_BASE_URL
 from bggcli.ui import BasePage
 from bggcli.util.logger import Logger
+from bggcli.util.metrics import Metrics
+
+
+# Cookie attributes accepted by Selenium when injecting a cookie
+COOKIE_KEYS = ['name', 'value', 'path', 'domain', 'secure', 'expiry']
 
 
 class LoginPage(BasePage):
-    def authenticate(self, login, password):
+    def authenticate(self, login, password, session_cache=None):
         """
         Performs authentication
 
         :param login: BGG login
         :param password: BGG password
+        :param session_cache: Optional SessionCache, to restore a previous session instead of
+                              submitting the login form, and to store the new session
         """
         Logger.info("Authenticating...", break_line=False)
 
-        self.driver.get("%s/login" % BGG_BASE_URL)
+        if session_cache is not None and self.restore_session(login, session_cache):
+            Logger.info(" (session restored) [done]", append=True)
+            return True
+
+        self.navigate("%s/login" % BGG_BASE_URL)
 
         # When user is already authenticated, just skip this task
         # TODO Handle case where another user is logged in
@@ -39,8 +50,11 @@ class LoginPage(BasePage):
         self.update_text(self.driver.find_element_by_id("password"), password)
         self.driver.find_element_by_xpath("//*[@class='forum_table']//input[@type='Submit']") \
             .click()
+        Metrics.get().inc('logins_total')
 
         if self.is_authenticated(login):
+            if session_cache is not None:
+                session_cache.save(self.driver.get_cookies())
             Logger.info(" [done]", append=True)
             return True
 
@@ -48,6 +62,31 @@ class LoginPage(BasePage):
         Logger.error("Authentication failed, check your credentials!")
         return False
 
+    def restore_session(self, login, session_cache):
+        """
+        Injects the cached cookies in the web browser, returns True if the session is still valid
+
+        :param login: BGG login
+        :param session_cache: SessionCache
+        """
+        cookies = session_cache.load()
+        if not cookies:
+            return False
+
+        # Cookies can only be set for the domain of the current page, use a lightweight one
+        self.navigate("%s/robots.txt" % BGG_BASE_URL)
+        for cookie in cookies:
+            self.driver.add_cookie(dict((key, value) for key, value in cookie.items()
+                                        if key in COOKIE_KEYS))
+
+        self.navigate("%s/login" % BGG_BASE_URL)
+        if self.is_authenticated(login):
+            return True
+
+        Logger.info(" (session expired)", append=True, break_line=False)
+        session_cache.clear()
+        return False
+
     def is_authenticated(self, login):
         try:
             self.driver.find_element_by_xpath("//*[contains(@class, 'dropdown-menu')]//a[lowercase(@href)='/user/%s']"
@@ -0,0 +1,130 @@
+"""
+bgg.collectionclient
+~~~~~~~~~~~~
+
+HTTP counterpart of the game page: updates or deletes collection items by posting them directly
+to the collection save endpoint used by the BGG web pages, without driving a web browser
+
+"""
+import json
+
+from bggcli import is_field_applicable
+from bggcli.util.logger import Logger
+
+SAVE_PATH = '/geekcollection.php'
+
+# Values are saved by groups, each group being identified by the 'fieldname' expected by BGG.
+# CSV column -> posted parameter, when names differ
+FIELD_GROUPS = [
+    ('status', ['own', 'prevowned', 'fortrade', 'want', 'wanttoplay', 'wanttobuy', 'wishlist',
+                'wishlistpriority', 'preordered']),
+    ('rating', ['rating']),
+    ('comment', ['comment']),
+    ('conditiontext', ['conditiontext']),
+    ('wishlistcomment', ['wishlistcomment']),
+    ('haspartslist', ['haspartslist']),
+    ('wantpartslist', ['wantpartslist']),
+    ('privateinfo', ['pp_currency', 'pricepaid', 'cv_currency', 'currvalue', 'quantity',
+                     'acquisitiondate', 'acquiredfrom', 'privatecomment', 'invlocation']),
+    ('version', ['_versionid', 'publisherid', 'imageid', 'year', 'other']),
+]
+
+FIELD_PARAMETERS = {
+    '_versionid': 'versionid',
+}
+
+# Fields only editable through the web browser: the language is selected by its name in the
+# UI, and its internal identifier is not known here
+BROWSER_ONLY_FIELDS = ['language']
+
+
+class CollectionClient:
+    def __init__(self, http_client):
+        """
+        :param http_client: HttpClient carrying the cookies of an authenticated session
+        """
+        self.http = http_client
+
+    @staticmethod
+    def supports(game_attrs):
+        """
+        Returns True if all provided values can be saved over HTTP, False if the web browser
+        is required
+
+        :param game_attrs: Game attributes as a dictionary
+        """
+        for key in BROWSER_ONLY_FIELDS:
+            if game_attrs.get(key):
+                return False
+        return True
+
+    def build_requests(self, game_attrs):
+        """
+        Returns the list of form values to post for a game, one entry per group of fields
+
+        :param game_attrs: Game attributes as a dictionary
+        """
+        result = []
+        for fieldname, keys in FIELD_GROUPS:
+            values = {}
+            for key in keys:
+                value = game_attrs.get(key)
+                if value is None or not is_field_applicable(game_attrs, key):
+                    continue
+                values[FIELD_PARAMETERS.get(key, key)] = value
+            if not values:
+                continue
+
+            data = {
+                'ajax': 1,
+                'action': 'savedata',
+                'objecttype': 'thing',
+                'objectid': game_attrs['objectid'],
+                'fieldname': fieldname,
+            }
+            if game_attrs.get('collid'):
+                data['collid'] = game_attrs['collid']
+            data.update(values)
+            result.append(data)
+        return result
+
+    def update(self, game_attrs):
+        """
+        Update game details. Returns True when all values have been saved
+
+        :param game_attrs: Game attributes as a dictionary
+        """
+        for data in self.build_requests(game_attrs):
+            body = self.http.post(SAVE_PATH, data)
+            error = self.parse_error(body)
+            if error:
+                Logger.info("'%s' rejected: %s " % (data['fieldname'], error), append=True,
+                            break_line=False)
+                return False
+        return True
+
+    def delete(self, collid):
+        """
+        Delete a collection item. Returns True when it has been deleted
+
+        :param collid: Identifier of the collection item, see CollectionSnapshot
+        """
+        body = self.http.post(SAVE_PATH, {'ajax': 1, 'action': 'delete', 'collid': collid})
+        error = self.parse_error(body)
+        if error:
+            Logger.info("Deletion rejected: %s" % error)
+            return False
+        return True
+
+    @staticmethod
+    def parse_error(body):
+        """
+        Returns the error message of a save response, None when values have been saved
+        """
+        try:
+            content = json.loads(body)
+        except ValueError:
+            return None
+        if isinstance(content, dict) and content.get('error'):
+            return content['error']
+        return None
@@ -0,0 +1,106 @@
+"""
+bgg.collectionmembership
+~~~~~~~~~~~~
+
+Games of a collection (objectid -> collid), fetched once from the XML API so that the game pages
+of the web browser can go straight to the right path when a game is already in the collection.
+Only board games and expansions are fetched (default subtype of the XML API): other games are
+never known to be in the collection
+
+"""
+from bggcli.util.logger import Logger
+from bggcli.util.xmlapi import PollingSchedule, collection_request, fetch
+from bggcli.util.xmltocsv import XmlToCsv
+
+
+class CollectionMembership:
+    def __init__(self, items=None):
+        """
+        :param items: Collection items as (objectid, collid)
+        """
+        # objectid -> collids, a game may be in the collection several times
+        self.collids = {}
+        for objectid, collid in items or []:
+            self.add(objectid, collid)
+
+    @staticmethod
+    def fetch(login, cookies=None, schedule=None):
+        """
+        Fetches the games of a collection. The collection is public, no session is needed
+
+        :param login: BGG login of the collection owner
+        :param cookies: Session cookies as a dictionary, if available
+        """
+        response = fetch(collection_request(cookies, login, brief=1), schedule)
+        try:
+            return CollectionMembership.parse(response)
+        finally:
+            response.close()
+
+    @staticmethod
+    def parse(source):
+        """
+        :param source: XML export, as a file path or a file object
+        """
+        return CollectionMembership(XmlToCsv.iterate_tuples(source, ['objectid', 'collid']))
+
+    @staticmethod
+    def load(login, cookies=None, options=None):
+        """
+        Returns the membership of a collection, None if it cannot be fetched: game pages then
+        find out by themselves whether a game is in the collection
+        """
+        Logger.info("Fetching games in collection of '%s'..." % login)
+        try:
+            membership = CollectionMembership.fetch(login, cookies,
+                                                    PollingSchedule.from_options(options or {}))
+        except Exception as e:
+            Logger.info("Games in collection cannot be fetched, they will be checked on each "
+                        "game page (%s)" % e)
+            return None
+        Logger.info('%s games in collection.' % len(membership))
+        return membership
+
+    def add(self, objectid, collid):
+        self.collids.setdefault(objectid, []).append(collid)
+
+    def __contains__(self, objectid):
+        return objectid in self.collids
+
+    def __len__(self):
+        return len(self.collids)
+
+    def collid(self, objectid):
+        """
+        Returns the identifier of the first collection item of a game, None if the game is not in
+        the collection
+        """
+        collids = self.collids.get(objectid)
+        return collids[0] if collids else None
+
+
+class MembershipLoader:
+    def __init__(self, login, cookies=None, options=None):
+        """
+        Loads the membership of a collection when the first row is pulled by a worker, so that
+        a run with nothing to process never waits for the export
+
+        :param login: BGG login of the collection owner
+        """
+        self.login = login
+        self.cookies = cookies
+        self.options = options
+        self.loaded = False
+        # CollectionMembership, None until loaded or if it cannot be fetched
+        self.membership = None
+
+    def rows(self, rows):
+        """
+        Yields the rows, loading the membership before the first one
+        """
+        for row in rows:
+            if not self.loaded:
+                self.loaded = True
+                self.membership = CollectionMembership.load(self.login, self.cookies,
+                                                            self.options)
+            yield row
@@ -0,0 +1,121 @@
+"""
+bgg.collectionsnapshot
+~~~~~~~~~~~~
+
+Utility in charge of comparing CSV rows with the current content of a collection, so that
+only actual changes are sent to BGG
+
+"""
+from bggcli import BGG_FIELD_DEPENDENCIES, BGG_SUPPORTED_FIELDS
+from bggcli.util.xmlapi import collection_request, fetch
+from bggcli.util.xmltocsv import XmlToCsv
+
+# Fields identifying the game, always kept in a row
+KEY_FIELDS = ['objectid', 'objectname', '_versionid']
+
+
+class CollectionSnapshot:
+    def __init__(self, items=None):
+        """
+        :param items: Collection items as dictionaries, as converted by XmlToCsv.convert_item
+        """
+        self.items = {}
+        for item in items or []:
+            self.add(item)
+
+    @staticmethod
+    def fetch(cookies, login):
+        """
+        Fetches the current collection with the same XML API call as the export
+
+        :param cookies: Session cookies as a dictionary
+        :param login: BGG login of the collection owner
+        """
+        response = fetch(collection_request(cookies, login))
+        try:
+            return CollectionSnapshot.parse(response)
+        finally:
+            response.close()
+
+    @staticmethod
+    def parse(source):
+        """
+        :param source: XML export, as a file path or a file object
+        """
+        snapshot = CollectionSnapshot()
+        for row in XmlToCsv.iterate_rows(source):
+            snapshot.add(row)
+        return snapshot
+
+    def add(self, item):
+        self.items.setdefault(item['objectid'], []).append(item)
+
+    def __len__(self):
+        return sum(len(items) for items in self.items.values())
+
+    def find(self, row):
+        """
+        Returns the collection item matching a row by objectid and version, None if the game is
+        not in the collection
+        """
+        items = self.items.get(row.get('objectid'))
+        if not items:
+            return None
+        versionid = row.get('_versionid')
+        if versionid is None:
+            return items[0]
+        for item in items:
+            if item.get('_versionid') == versionid:
+                return item
+        return None
+
+    def pop(self, row):
+        """
+        Removes and returns the collection item matching a row, see find(). Rows of several
+        copies of the same game get each their own item
+        """
+        item = self.find(row)
+        if item is not None:
+            self.items[row.get('objectid')].remove(item)
+        return item
+
+    def diff(self, row):
+        """
+        Returns a copy of the row with only the values differing from the collection, None when
+        the row is already up-to-date. The whole row is returned when the game is not in the
+        collection yet
+
+        :param row: Game attributes as a dictionary
+        """
+        item = self.find(row)
+        if item is None:
+            return row
+
+        changed = [key for key in BGG_SUPPORTED_FIELDS
+                   if key in row and key not in KEY_FIELDS and row[key] is not None
+                   and not self.same_value(row[key], item.get(key))]
+        if not changed:
+            return None
+
+        result = dict((key, row[key]) for key in KEY_FIELDS if key in row)
+        for key in changed:
+            result[key] = row[key]
+            # Keep values these fields depend on, otherwise they would be skipped
+            for dep_key in BGG_FIELD_DEPENDENCIES.get(key, {}):
+                if dep_key in row:
+                    result[dep_key] = row[dep_key]
+        return result
+
+    @staticmethod
+    def same_value(csv_value, collection_value):
+        if collection_value is None:
+            # Not provided by the XML API (e.g. language): can't be checked
+            return csv_value.strip() == ''
+        csv_value = csv_value.strip()
+        collection_value = str(collection_value).strip()
+        if csv_value == collection_value:
+            return True
+        try:
+            return float(csv_value or 0) == float(collection_value or 0)
+        except ValueError:
+            return False
@@ -0,0 +1,129 @@
+"""
+bgg.collectionstore
+~~~~~~~~~~~~
+
+Local copy of a collection, stored in a SQLite database. Items are upserted by collid, and the
+most recent modification date of the items is kept as watermark, so that next synchronizations
+only fetch the items modified since then
+
+"""
+import sqlite3
+
+from bggcli import BGG_CSV_EXPORT_FIELDS
+from bggcli.util.logger import Logger
+
+# Columns of the stored items: collection item identifier, exported values, modification date
+STORE_COLUMNS = ['collid'] + BGG_CSV_EXPORT_FIELDS + ['lastmodified']
+
+# Number of items upserted at once
+BATCH_SIZE = 1000
+
+
+class CollectionStore:
+    def __init__(self, path):
+        """
+        :param path: Path of the SQLite database, created if it does not exist
+        """
+        self.path = path
+        self.connection = None
+
+    def open(self, login):
+        """
+        :param login: BGG login of the collection owner. A store only holds one collection
+        """
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS items (%s, PRIMARY KEY (collid))'
+                                % ', '.join('"%s" TEXT' % column for column in STORE_COLUMNS))
+        self.connection.execute('CREATE INDEX IF NOT EXISTS items_objectid ON items (objectid)')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS sync '
+                                '(key TEXT PRIMARY KEY, value TEXT)')
+        self.connection.commit()
+
+        store_login = self.get('login')
+        if store_login is None:
+            self.set('login', login)
+            self.connection.commit()
+        elif store_login.lower() != login.lower():
+            Logger.error("Store %s holds the collection of '%s', not the one of '%s'!"
+                         % (self.path, store_login, login), sysexit=True)
+        return self
+
+    def get(self, key):
+        result = self.connection.execute('SELECT value FROM sync WHERE key = ?', (key,)) \
+            .fetchone()
+        return result[0] if result else None
+
+    def set(self, key, value):
+        self.connection.execute('INSERT OR REPLACE INTO sync (key, value) VALUES (?, ?)',
+                                (key, value))
+
+    def watermark(self):
+        """
+        Returns the most recent modification date of the stored items (e.g.
+        '2015-07-04 20:21:27'), None if the collection has never been synchronized
+        """
+        return self.get('watermark')
+
+    def upsert(self, rows, full=False, synced_at=None):
+        """
+        Inserts or updates items, and moves the watermark forward. Returns the number of items
+
+        :param rows: Items as tuples of values, in the order of STORE_COLUMNS
+        :param full: True when rows are the whole collection: other items are removed
+        :param synced_at: Date of the synchronization, for information
+        """
+        collid_index = STORE_COLUMNS.index('collid')
+        lastmodified_index = STORE_COLUMNS.index('lastmodified')
+        sql = 'INSERT OR REPLACE INTO items VALUES (%s)' % ', '.join('?' * len(STORE_COLUMNS))
+        watermark = None if full else self.watermark()
+        count = 0
+        with self.connection:
+            if full:
+                self.connection.execute('DELETE FROM items')
+            batch = []
+            for values in rows:
+                if not values[collid_index]:
+                    continue
+                batch.append(values)
+                lastmodified = values[lastmodified_index]
+                if lastmodified and (watermark is None or lastmodified > watermark):
+                    watermark = lastmodified
+                if len(batch) >= BATCH_SIZE:
+                    self.connection.executemany(sql, batch)
+                    count += len(batch)
+                    batch = []
+            if batch:
+                self.connection.executemany(sql, batch)
+                count += len(batch)
+            if watermark is not None:
+                self.set('watermark', watermark)
+            if synced_at is not None:
+                self.set('synced_at', synced_at)
+        return count
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM items').fetchone()[0]
+
+    def rows(self, columns):
+        """
+        Yields the stored items as tuples, ordered by name like the XML API
+
+        :param columns: Columns of the rows, among STORE_COLUMNS
+        """
+        cursor = self.connection.execute(
+            'SELECT %s FROM items ORDER BY objectname, collid'
+            % ', '.join('"%s"' % column for column in columns))
+        for values in cursor:
+            yield values
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    # noinspection PyUnusedLocal,PyShadowingBuiltins
+    def __exit__(self, type, value, traceback):
+        self.close()
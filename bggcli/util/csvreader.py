@@ -4,85 +4,164 @@ bgg.csvreader
 
 Utility in charge of reading the CSV file
 
+The file is scanned once to index the byte offset of each row, rows are then parsed lazily
+when iterated, so that huge files are never loaded in memory
+
 """
 
 import csv
+import mmap
+from array import array
 
-from selenium.common.exceptions import WebDriverException
-
-from bggcli import UI_ERROR_MSG, BGG_SUPPORTED_FIELDS
+from bggcli import BGG_SUPPORTED_FIELDS
 from bggcli.util.logger import Logger
-import codecs
 
-class CsvReader:
-    reader = None
+UTF8_BOM = b'\xef\xbb\xbf'
 
+
+class CsvReader:
     def __init__(self, file_path):
-        #self.file = open(file_path, 'rU') # python 2
-        self.file = codecs.open(file_path, mode='rb', encoding='utf-8', errors='replace')#, buffering=1)
+        self.file_path = file_path
+        self.file = open(file_path, 'rb')
+        self.data = None
         self.rowCount = 0
+        self.fieldnames = None
+        # Start offset of each row, followed by the end offset of the last one
+        self.offsets = array('q')
+        # Line number of each row in the file, for error messages
+        self.line_numbers = array('l')
+        # Number of rows only having a name, see open()
+        self.unresolvedCount = 0
+
+    @staticmethod
+    def _decode(record):
+        return record.decode('utf-8', 'replace')
 
     @staticmethod
-    def count_lines(f):
-        count = 0
-        tmp_reader = csv.DictReader(f)
-        for _ in tmp_reader:
-            count += 1
-        f.seek(0)
-        return count
-
-    def open(self):
-        self.rowCount = self.count_lines(self.file)
-        self.reader = csv.DictReader(self.file)
-        self.check()
-
-    def iterate(self, callback):
+    def _parse(text):
+        for values in csv.reader(text.splitlines(True)):
+            return values
+        return []
+
+    def _records(self, start):
+        """
+        Yields (offset, line number, values) of each record from the given offset. The csv
+        module decides where records end, e.g. a record spans several lines when a quoted value
+        contains line breaks
+        """
+        data = self.data
+        size = len(data)
+        # End offset of the last line read by the csv module, which reads one line at a time
+        position = [start]
+
+        def lines():
+            while position[0] < size:
+                end = data.find(b'\n', position[0])
+                end = size if end < 0 else end + 1
+                line = self._decode(data[position[0]:end])
+                position[0] = end
+                yield line
+
+        reader = csv.reader(lines())
+        record_start = start
+        line_number = 1
         try:
-            index = 1
-            for row in self.reader:
-                objectid = row.get('objectid')
-                if objectid is None or not objectid.isdigit():
-                    Logger.error("No valid 'objectid' at line %s!" % index, None, sysexit=True)
-                    return
-
-                # Encode in UTF-8
-                for key in row:
-                    value = row[key]
-                    # if value is not None:
-                        # row[key] = unicode(value, 'utf-8') # python 2
-
-                objectname = row['objectname']
-                if objectname is None or objectname == "":
-                    objectname = "(name not available for objectid=%s)" % objectid
-
-                Logger.info("[%s/%s] %s... " % (index, self.rowCount, objectname),
-                            break_line=False)
-                try:
-                    callback(row)
-                except WebDriverException as e:
-                    Logger.error(UI_ERROR_MSG, e, sysexit=True)
-                    return
-                except Exception as e:
-                    Logger.info("", append=True)
-                    Logger.error("Unexpected error while processing row %s" % index, e,
-                                 sysexit=True)
-                    return
-                Logger.info(" [done]", append=True)
-                index += 1
+            for values in reader:
+                yield record_start, line_number, values
+                record_start = position[0]
+                line_number = reader.line_num + 1
         except csv.Error as e:
             Logger.error('Error while reading file %s at line %d: %s'
-                         % (file, self.reader.line_num, e), sysexit=True)
+                         % (self.file_path, reader.line_num, e), sysexit=True)
+
+    def open(self, resolve_names=False):
+        """
+        Scans the file once: reads the header, validates and indexes all rows
 
-    def check(self):
-        if 'objectid' not in self.reader.fieldnames:
+        :param resolve_names: True to accept rows without objectid but with a name, their
+                              objectid being resolved later (see GameResolver)
+        """
+        try:
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty file
+            self.data = b''
+
+        start = len(UTF8_BOM) if self.data[:len(UTF8_BOM)] == UTF8_BOM else 0
+        records = self._records(start)
+        for _, _, values in records:
+            if values:
+                self.fieldnames = values
+                break
+        self.check(resolve_names)
+
+        objectid_index = self.fieldnames.index('objectid') if 'objectid' in self.fieldnames \
+            else len(self.fieldnames)
+        # Names can only be resolved when the file has a name column
+        resolve_names = resolve_names and 'objectname' in self.fieldnames
+        objectname_index = self.fieldnames.index('objectname') if resolve_names else None
+        for offset, line_number, values in records:
+            if not values:
+                continue
+            objectid = values[objectid_index] if len(values) > objectid_index else None
+            if not objectid and resolve_names and len(values) > objectname_index \
+                    and values[objectname_index].strip():
+                self.unresolvedCount += 1
+            elif objectid is None or not objectid.isdigit():
+                Logger.error("No valid 'objectid' at line %s!" % line_number, None, sysexit=True)
+                return
+            self.offsets.append(offset)
+            self.line_numbers.append(line_number)
+        self.offsets.append(len(self.data))
+        self.rowCount = len(self.line_numbers)
+
+    def _to_row(self, values):
+        row = dict(zip(self.fieldnames, values))
+        if len(values) < len(self.fieldnames):
+            for key in self.fieldnames[len(values):]:
+                row[key] = None
+        elif len(values) > len(self.fieldnames):
+            row[None] = values[len(self.fieldnames):]
+        return row
+
+    def row_at(self, index):
+        """
+        Returns a row by its index, as a dictionary
+
+        :param index: Index of the row, from 0 to rowCount - 1
+        """
+        record = self.data[self.offsets[index]:self.offsets[index + 1]]
+        return self._to_row(self._parse(self._decode(record)))
+
+    def rows(self):
+        """
+        Yields all rows as dictionaries, parsed lazily
+        """
+        for index in range(self.rowCount):
+            yield self.row_at(index)
+
+    def check(self, resolve_names=False):
+        required_fields = ['objectid', 'objectname'] if resolve_names else ['objectid']
+        if not self.fieldnames or not set(required_fields) & set(self.fieldnames):
             Logger.error("Cannot process the CSV file, it should contain at least a column named "
-                         "'objectid'! Provided columns: %s" % self.reader.fieldnames, sysexit=True)
+                         "%s! Provided columns: %s"
+                         % (' or '.join("'%s'" % field for field in required_fields),
+                            self.fieldnames), sysexit=True)
             return
 
-        unknown_fields = set(self.reader.fieldnames) - set(BGG_SUPPORTED_FIELDS)
+        unknown_fields = set(self.fieldnames) - set(BGG_SUPPORTED_FIELDS)
+        if resolve_names:
+            # Used to choose between games having the same name
+            unknown_fields.discard('yearpublished')
         if unknown_fields:
             Logger.info('Some fields are not supported in your CSV file, they will be skipped: %s'
                         % unknown_fields)
 
-    def __del__(self):
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = None
         self.file.close()
+
+    def __del__(self):
+        self.close()
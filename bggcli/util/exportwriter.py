@@ -0,0 +1,246 @@
+"""
+bgg.exportwriter
+~~~~~~~~~~~~
+
+Writers of the exported collection: CSV, JSON Lines, SQLite or Parquet (when pyarrow is
+installed). Values are typed in all formats but CSV. '-' as destination writes to the standard
+output (SQLite excepted)
+
+"""
+import csv
+import io
+import json
+import os
+import sqlite3
+import sys
+
+from bggcli.util.logger import Logger
+
+EXPORT_FORMATS = ['csv', 'jsonl', 'sqlite', 'parquet']
+
+# File extension -> format, CSV otherwise
+EXPORT_FORMAT_EXTENSIONS = {
+    '.jsonl': 'jsonl',
+    '.ndjson': 'jsonl',
+    '.sqlite': 'sqlite',
+    '.sqlite3': 'sqlite',
+    '.db': 'sqlite',
+    '.parquet': 'parquet',
+}
+
+STDOUT_PATH = '-'
+
+# Typed columns, others are text
+INTEGER_FIELDS = ['objectid', 'own', 'fortrade', 'want', 'wanttobuy', 'wanttoplay', 'prevowned',
+                  'preordered', 'wishlist', 'wishlistpriority', 'quantity', 'publisherid',
+                  'imageid', 'year', '_versionid']
+REAL_FIELDS = ['rating', 'pricepaid', 'currvalue']
+
+# Size of the buffer of the written files, rows are written by large blocks
+BUFFER_SIZE = 1024 * 1024
+
+# Number of rows inserted at once in SQLite or Parquet
+BATCH_SIZE = 10000
+
+
+def get_export_format(dest_path, export_format=None):
+    """
+    Returns the format of an export, given explicitly or guessed from the file extension
+    """
+    if export_format is not None:
+        if export_format not in EXPORT_FORMATS:
+            Logger.error("Invalid export format '%s', should be one of: %s"
+                         % (export_format, ', '.join(EXPORT_FORMATS)), sysexit=True)
+        return export_format
+    return EXPORT_FORMAT_EXTENSIONS.get(os.path.splitext(dest_path)[1].lower(), 'csv')
+
+
+def open_export_writer(dest_path, fieldnames, export_format=None):
+    """
+    Returns the writer of an export
+
+    :param dest_path: Path of the file to write, '-' for the standard output
+    :param fieldnames: Columns of the rows
+    :param export_format: One of EXPORT_FORMATS, guessed from the file extension by default
+    """
+    export_format = get_export_format(dest_path, export_format)
+    writer_class = {
+        'csv': CsvExportWriter,
+        'jsonl': JsonLinesExportWriter,
+        'sqlite': SqliteExportWriter,
+        'parquet': ParquetExportWriter,
+    }[export_format]
+    return writer_class(dest_path, fieldnames)
+
+
+def open_text_file(dest_path):
+    if dest_path == STDOUT_PATH:
+        # Logs previously written to the standard output must come first
+        sys.stdout.flush()
+        return io.open(sys.stdout.fileno(), mode='w', encoding='utf-8', errors='replace',
+                       newline='', buffering=BUFFER_SIZE, closefd=False)
+    return io.open(dest_path, mode='w', encoding='utf-8', errors='replace', newline='',
+                   buffering=BUFFER_SIZE)
+
+
+def column_types(fieldnames):
+    """
+    Returns the type of each column: int, float or None for text
+    """
+    return [int if name in INTEGER_FIELDS else float if name in REAL_FIELDS else None
+            for name in fieldnames]
+
+
+def typed_values(types, values):
+    """
+    Converts the values of a row to their column type. Empty or invalid numbers are None
+    """
+    result = []
+    for value_type, value in zip(types, values):
+        if value_type is not None:
+            try:
+                value = value_type(value)
+            except (TypeError, ValueError):
+                value = None
+        result.append(value)
+    return result
+
+
+class ExportWriter:
+    def __init__(self, dest_path, fieldnames):
+        """
+        Base of the writers, which implement write_rows(rows), rows being tuples of values in
+        the order of the columns
+
+        :param dest_path: Path of the file to write, '-' for the standard output
+        :param fieldnames: Columns of the rows
+        """
+        self.dest_path = dest_path
+        self.fieldnames = list(fieldnames)
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    # noinspection PyUnusedLocal,PyShadowingBuiltins
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+
+class CsvExportWriter(ExportWriter):
+    def __init__(self, dest_path, fieldnames):
+        ExportWriter.__init__(self, dest_path, fieldnames)
+        self.file = open_text_file(dest_path)
+        # csv_writer.writeheader() use quotes
+        self.file.write(u'%s\n' % ','.join(self.fieldnames))
+        self.csv_writer = csv.writer(self.file, quoting=csv.QUOTE_ALL)
+
+    def write_rows(self, rows):
+        self.csv_writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+class JsonLinesExportWriter(ExportWriter):
+    def __init__(self, dest_path, fieldnames):
+        ExportWriter.__init__(self, dest_path, fieldnames)
+        self.file = open_text_file(dest_path)
+        self.types = column_types(self.fieldnames)
+
+    def write_rows(self, rows):
+        fieldnames = self.fieldnames
+        types = self.types
+        write = self.file.write
+        for values in rows:
+            write(json.dumps(dict(zip(fieldnames, typed_values(types, values))),
+                             ensure_ascii=False))
+            write(u'\n')
+
+    def close(self):
+        self.file.close()
+
+
+class SqliteExportWriter(ExportWriter):
+    TABLE_NAME = 'collection'
+
+    def __init__(self, dest_path, fieldnames):
+        ExportWriter.__init__(self, dest_path, fieldnames)
+        if dest_path == STDOUT_PATH:
+            Logger.error('A SQLite export cannot be written to the standard output!',
+                         sysexit=True)
+        # Like other formats, the previous export is replaced
+        if os.path.exists(dest_path):
+            os.remove(dest_path)
+        self.types = column_types(self.fieldnames)
+        self.connection = sqlite3.connect(dest_path)
+        sql_types = {int: 'INTEGER', float: 'REAL', None: 'TEXT'}
+        self.connection.execute('CREATE TABLE %s (%s)' % (self.TABLE_NAME, ', '.join(
+            '"%s" %s' % (name, sql_types[column_type])
+            for name, column_type in zip(self.fieldnames, self.types))))
+        self.insert_sql = 'INSERT INTO %s VALUES (%s)' \
+                          % (self.TABLE_NAME, ', '.join('?' * len(self.fieldnames)))
+
+    def write_rows(self, rows):
+        batch = []
+        for values in rows:
+            batch.append(typed_values(self.types, values))
+            if len(batch) >= BATCH_SIZE:
+                self.connection.executemany(self.insert_sql, batch)
+                batch = []
+        if batch:
+            self.connection.executemany(self.insert_sql, batch)
+
+    def close(self):
+        if 'objectid' in self.fieldnames:
+            self.connection.execute('CREATE INDEX %s_objectid ON %s (objectid)'
+                                    % (self.TABLE_NAME, self.TABLE_NAME))
+        self.connection.commit()
+        self.connection.close()
+
+
+class ParquetExportWriter(ExportWriter):
+    def __init__(self, dest_path, fieldnames):
+        ExportWriter.__init__(self, dest_path, fieldnames)
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            Logger.error('pyarrow must be installed to export as Parquet: pip install pyarrow',
+                         sysexit=True)
+            return
+        self.pyarrow = pyarrow
+        self.types = column_types(self.fieldnames)
+        arrow_types = {int: pyarrow.int64(), float: pyarrow.float64(), None: pyarrow.string()}
+        self.schema = pyarrow.schema([(name, arrow_types[column_type])
+                                      for name, column_type in zip(self.fieldnames, self.types)])
+        if dest_path == STDOUT_PATH:
+            sys.stdout.flush()
+            sink = pyarrow.PythonFile(getattr(sys.stdout, 'buffer', sys.stdout), mode='w')
+        else:
+            sink = dest_path
+        self.writer = pyarrow.parquet.ParquetWriter(sink, self.schema)
+
+    def _write_batch(self, batch):
+        columns = [[] for _ in self.fieldnames]
+        for values in batch:
+            for column, value in zip(columns, values):
+                column.append(value)
+        self.writer.write_table(self.pyarrow.Table.from_arrays(
+            [self.pyarrow.array(column, type=field.type)
+             for column, field in zip(columns, self.schema)], schema=self.schema))
+
+    def write_rows(self, rows):
+        batch = []
+        for values in rows:
+            batch.append(typed_values(self.types, values))
+            if len(batch) >= BATCH_SIZE:
+                self._write_batch(batch)
+                batch = []
+        if batch:
+            self._write_batch(batch)
+
+    def close(self):
+        self.writer.close()
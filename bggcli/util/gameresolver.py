@@ -0,0 +1,249 @@
+"""
+bgg.gameresolver
+~~~~~~~~~~~~
+
+Utility in charge of finding the identifier (objectid) of games only known by their name,
+through the search of the XML API
+
+Names are normalized (case, accents, punctuation), and all the games returned by a search are
+kept in a local index stored on disk, so that a name already searched, or returned by a previous
+search, is resolved without any request. Names that are not found are searched again once their
+search has expired, as games may have been added since. Ambiguous names are written to a review
+file instead of being guessed
+
+"""
+import csv
+import io
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+
+from bggcli.util.logger import Logger
+from bggcli.util.thingcache import DEFAULT_CACHE_DIR
+from bggcli.util.xmlapi import PollingSchedule, fetch, search_request
+from bggcli.util.xmltocsv import XmlToCsv
+
+CACHE_FILE_NAME = 'names.sqlite'
+
+# Time to live of the searches, in days
+DEFAULT_TTL = 30
+
+REVIEW_COLUMNS = ['objectname', 'yearpublished', 'reason', 'candidates']
+
+
+def normalize_name(name):
+    """
+    Returns the name in lower case, without accents or punctuation, e.g. 'Puerto Rico' for
+    'Puerto-Rico!'
+    """
+    name = unicodedata.normalize('NFKD', u'%s' % name)
+    name = u''.join(char for char in name if not unicodedata.combining(char)).lower()
+    name = name.replace(u'&', u' and ')
+    return u' '.join(re.split(r'[\W_]+', name, flags=re.UNICODE)).strip()
+
+
+def parse_search(source):
+    """
+    Yields (objectid, name, primary name or not, year published) for each name of the items
+    of a search response of the XML API
+
+    :param source: XML response, as a file path or a file object
+    """
+    for el in XmlToCsv.iterate_items(source):
+        year = el.find('yearpublished')
+        year = year.get('value', '') if year is not None else ''
+        for name in el.findall('name'):
+            yield el.get('id'), name.get('value', ''), name.get('type') == 'primary', year
+
+
+class GameResolver:
+    def __init__(self, cache_dir=None, review_path=None, persistent=True, options=None,
+                 search=None, ttl=DEFAULT_TTL, clock=time.time):
+        """
+        :param cache_dir: Directory of the index of the searched games
+        :param review_path: CSV file where names that cannot be resolved are written
+        :param persistent: False to keep the index in memory only
+        :param options: Advanced options, configuring the polling of the requests
+        :param search: Function searching a name, returning the same tuples as parse_search(),
+                       the XML API by default
+        :param ttl: Time to live of the searches, in days, a name not found is searched again
+                    once its search has expired
+        :param clock: Function returning the current time, in seconds
+        """
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.path = os.path.join(self.cache_dir, CACHE_FILE_NAME) if persistent else ':memory:'
+        self.review_path = review_path
+        self.options = options or {}
+        self.search = search or self._search
+        self.ttl = ttl * 24 * 3600
+        self.clock = clock
+        self.connection = None
+        self.review_file = None
+        self.review_writer = None
+        # (normalized name, year) -> objectid or None, resolved by the current run
+        self.resolved = {}
+        self.searches = 0
+        self.reviews = 0
+
+    @staticmethod
+    def from_options(options, file_path):
+        """
+        :param file_path: Path of the imported CSV file, the review file is stored aside it
+        """
+        try:
+            ttl = float(options.get('name-cache-ttl', DEFAULT_TTL))
+        except ValueError:
+            Logger.error("Invalid value for 'name-cache-ttl' option, should be a number: %s"
+                         % options.get('name-cache-ttl'), sysexit=True)
+            return None
+        return GameResolver(options.get('name-cache-dir'),
+                            options.get('name-review-file', file_path + '.review.csv'),
+                            options.get('name-cache') != 'false', options, ttl=ttl)
+
+    def open(self):
+        if self.path != ':memory:' and not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS names (normalized TEXT, '
+                                'objectid TEXT, name TEXT, is_primary INTEGER, year TEXT, '
+                                'PRIMARY KEY (normalized, objectid))')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS searches '
+                                '(normalized TEXT PRIMARY KEY, searched_at REAL)')
+        self.connection.commit()
+        return self
+
+    def _search(self, name):
+        response = fetch(search_request(name), PollingSchedule.from_options(self.options))
+        try:
+            return list(parse_search(response))
+        finally:
+            response.close()
+
+    def _index(self, results):
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO names VALUES (?, ?, ?, ?, ?)',
+                [(normalize_name(name), objectid, name, int(is_primary), year)
+                 for objectid, name, is_primary, year in results])
+
+    def _candidates(self, normalized):
+        """
+        Returns the indexed games having the given name, as a dictionary (objectid -> (name,
+        primary name or not, year))
+        """
+        candidates = {}
+        for objectid, name, is_primary, year in self.connection.execute(
+                'SELECT objectid, name, is_primary, year FROM names WHERE normalized = ? '
+                'ORDER BY is_primary DESC', (normalized,)):
+            candidates.setdefault(objectid, (name, bool(is_primary), year))
+        return candidates
+
+    def _searched(self, normalized):
+        return self.connection.execute(
+            'SELECT 1 FROM searches WHERE normalized = ? AND searched_at > ?',
+            (normalized, self.clock() - self.ttl)).fetchone() is not None
+
+    @staticmethod
+    def _match(candidates, year=None):
+        """
+        Returns the objectid of the game matching the candidates, or a reason why there is none
+        """
+        if year:
+            candidates = dict((objectid, candidate) for objectid, candidate
+                              in candidates.items() if candidate[2] == year)
+            if not candidates:
+                return None, 'no game with this name published in %s' % year
+        if not candidates:
+            return None, 'not found'
+        if len(candidates) > 1:
+            # Primary names prevail over alternate names (e.g. translations)
+            primary = [objectid for objectid, candidate in candidates.items() if candidate[1]]
+            if len(primary) == 1:
+                return primary[0], None
+            return None, 'ambiguous'
+        return list(candidates)[0], None
+
+    def resolve(self, name, year=None):
+        """
+        Returns the objectid of a game, None if it cannot be resolved without ambiguity (it is
+        then written to the review file)
+
+        :param name: Name of the game
+        :param year: Year the game was published, if known, to choose between games having the
+                     same name
+        """
+        normalized = normalize_name(name or '')
+        year = (year or '').strip()
+        key = (normalized, year)
+        if key in self.resolved:
+            return self.resolved[key]
+        if not normalized:
+            self.resolved[key] = None
+            self._review(name, year, 'no name', {})
+            return None
+
+        candidates = self._candidates(normalized)
+        objectid, reason = self._match(candidates, year)
+        if objectid is None and not self._searched(normalized):
+            Logger.verbose("Searching '%s'..." % name)
+            self._index(self.search(name))
+            self.searches += 1
+            with self.connection:
+                self.connection.execute('INSERT OR REPLACE INTO searches VALUES (?, ?)',
+                                        (normalized, self.clock()))
+            candidates = self._candidates(normalized)
+            objectid, reason = self._match(candidates, year)
+
+        self.resolved[key] = objectid
+        if objectid is None:
+            self._review(name, year, reason, candidates)
+        return objectid
+
+    def _review(self, name, year, reason, candidates):
+        if self.review_path is None:
+            return
+        if self.review_writer is None:
+            self.review_file = io.open(self.review_path, mode='w', encoding='utf-8', newline='')
+            self.review_writer = csv.writer(self.review_file)
+            self.review_writer.writerow(REVIEW_COLUMNS)
+        self.review_writer.writerow([name or '', year or '', reason, '; '.join(
+            '%s: %s (%s)' % (objectid, candidate[0], candidate[2] or '?')
+            for objectid, candidate in sorted(candidates.items()))])
+        self.reviews += 1
+
+    def resolve_rows(self, rows):
+        """
+        Yields the rows, setting the objectid of the ones only having a name. Rows that cannot
+        be resolved are skipped, and written to the review file
+        """
+        for row in rows:
+            if row.get('objectid'):
+                yield row
+                continue
+            objectid = self.resolve(row.get('objectname'), row.get('yearpublished'))
+            if objectid is None:
+                Logger.info("Game '%s' skipped, see %s" % (row.get('objectname'),
+                                                           self.review_path))
+                continue
+            Logger.verbose("Game '%s' resolved as objectid %s" % (row.get('objectname'),
+                                                                  objectid))
+            row = dict(row)
+            row['objectid'] = objectid
+            yield row
+
+    def close(self):
+        if self.review_file is not None:
+            self.review_file.close()
+            self.review_file = None
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    # noinspection PyUnusedLocal,PyShadowingBuiltins
+    def __exit__(self, type, value, traceback):
+        self.close()
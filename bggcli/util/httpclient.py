@@ -0,0 +1,119 @@
+"""
+bgg.httpclient
+~~~~~~~~~~~~
+
+Utility in charge of HTTP calls made outside of the web browser, reusing the cookies of an
+authenticated browser session
+
+"""
+import time
+try:
+    from urllib2 import Request, urlopen, HTTPError
+    from urllib import urlencode, quote
+except ImportError:
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError
+    from urllib.parse import urlencode, quote
+
+from bggcli import BGG_BASE_URL
+from bggcli.util.metrics import Metrics
+from bggcli.util.ratelimiter import RateLimiter, parse_retry_after
+from bggcli.util.tracer import span
+
+BGG_SESSION_COOKIE_NAME = 'SessionID'
+
+# Responses of BGG asking to slow down
+SLOW_DOWN_HTTP_CODES = [429, 503]
+
+
+class HttpClient:
+    def __init__(self, cookies=None, base_url=BGG_BASE_URL, timeout=60):
+        """
+        :param cookies: Session cookies as a dictionary (name -> value)
+        :param base_url: Root URL prepended to relative paths
+        :param timeout: Socket timeout in seconds
+        """
+        self.cookies = dict(cookies or {})
+        self.base_url = base_url
+        self.timeout = timeout
+
+    @staticmethod
+    def cookies_from_driver(driver):
+        """
+        Returns the cookies of a Selenium driver as a dictionary (name -> value)
+        """
+        return dict((cookie['name'], cookie['value']) for cookie in driver.get_cookies())
+
+    def url(self, path):
+        if path.startswith('http://') or path.startswith('https://'):
+            return path
+        return self.base_url + path
+
+    def request(self, path, data=None, headers=None):
+        """
+        Builds a request carrying the session cookies
+
+        :param path: URL, or path relative to the base URL
+        :param data: Form values as a dictionary, sent as a POST request when provided
+        :param headers: Additional headers
+        """
+        all_headers = {}
+        if self.cookies:
+            all_headers['Cookie'] = '; '.join('%s=%s' % (name, value)
+                                              for name, value in self.cookies.items())
+        if data is not None:
+            all_headers['Content-Type'] = 'application/x-www-form-urlencoded; charset=UTF-8'
+            data = urlencode(data).encode('utf-8')
+        if headers:
+            all_headers.update(headers)
+        return Request(self.url(path), data, all_headers)
+
+    def open(self, path, data=None, headers=None):
+        """
+        Sends a request once the rate limiter allows it, and returns the response
+        """
+        limiter = RateLimiter.get()
+        limiter.acquire()
+        start = time.time()
+        try:
+            with span('http', path=path.split('?')[0]):
+                response = urlopen(self.request(path, data, headers), timeout=self.timeout)
+            Metrics.get().observe('http_request_duration_seconds', time.time() - start)
+        except HTTPError as e:
+            if e.code in SLOW_DOWN_HTTP_CODES:
+                limiter.penalize(parse_retry_after(e.headers.get('Retry-After')))
+            raise
+        limiter.succeed()
+        return response
+
+    def get(self, path):
+        """
+        Returns the response body of a GET request as text
+        """
+        return self._read(self.open(path))
+
+    def is_authenticated(self, login):
+        """
+        Returns True if the cookies belong to a valid session of this user. Same check as the
+        login page: a link to the user page is only shown to logged in users
+
+        :param login: BGG login
+        """
+        try:
+            body = self.get('/login')
+        except (HTTPError, IOError):
+            return False
+        return ('href="/user/%s"' % quote(login.lower())) in body.lower()
+
+    def post(self, path, data):
+        """
+        Posts form values and returns the response body as text
+        """
+        return self._read(self.open(path, data))
+
+    @staticmethod
+    def _read(response):
+        try:
+            return response.read().decode('utf-8', 'replace')
+        finally:
+            response.close()
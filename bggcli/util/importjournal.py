@@ -0,0 +1,113 @@
+"""
+bgg.importjournal
+~~~~~~~~~~~~
+
+Utility in charge of recording the rows already imported in an append-only file, so that an
+interrupted import can be resumed without processing them again
+
+"""
+import hashlib
+import os
+import threading
+import time
+
+
+class ImportJournal:
+    def __init__(self, file_path, sync_every=20, sync_interval=5.0):
+        """
+        :param file_path: Path of the imported CSV file, the journal is stored aside it
+        :param sync_every: Number of records written before forcing them to disk
+        :param sync_interval: Maximum delay in seconds before forcing records to disk
+        """
+        self.path = file_path + '.journal'
+        self.sync_every = sync_every
+        self.sync_interval = sync_interval
+        self.entries = set()
+        self.file = None
+        self.pending = 0
+        self.last_sync = time.time()
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def row_hash(row):
+        """
+        Returns a digest of the row content, so that a modified row is imported again
+        """
+        digest = hashlib.sha1()
+        # Values beyond the header are under a None key, which cannot be sorted with the others
+        for key in sorted(key for key in row if key is not None):
+            digest.update(('%s=%s\x1f' % (key, row[key])).encode('utf-8'))
+        return digest.hexdigest()
+
+    def load(self):
+        """
+        Loads the records of a previous run, returns the number of records
+        """
+        self.entries = set()
+        try:
+            with open(self.path) as journal_file:
+                for line in journal_file:
+                    fields = line.rstrip('\n').split('\t')
+                    # Last line may be truncated after a crash
+                    if len(fields) == 2 and len(fields[1]) == 40:
+                        self.entries.add((fields[0], fields[1]))
+        except (IOError, OSError):
+            pass
+        return len(self.entries)
+
+    def is_done(self, row):
+        return (row.get('objectid'), self.row_hash(row)) in self.entries
+
+    def open(self, resume):
+        """
+        :param resume: True to append to the records of a previous run, False to start a new one
+        """
+        if resume:
+            self.load()
+        else:
+            self.entries = set()
+        self.file = open(self.path, 'a' if resume else 'w')
+        if resume and self.file.tell() > 0 and not self._ends_with_newline():
+            # Isolate a record truncated by a crash
+            self.file.write('\n')
+        return self
+
+    def _ends_with_newline(self):
+        with open(self.path, 'rb') as journal_file:
+            journal_file.seek(-1, os.SEEK_END)
+            return journal_file.read(1) == b'\n'
+
+    def record(self, row):
+        with self.lock:
+            self.file.write('%s\t%s\n' % (row.get('objectid'), self.row_hash(row)))
+            self.pending += 1
+            if self.pending >= self.sync_every \
+                    or time.time() - self.last_sync >= self.sync_interval:
+                self._sync()
+
+    def _sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.pending = 0
+        self.last_sync = time.time()
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                self._sync()
+                self.file.close()
+                self.file = None
+
+    def remove(self):
+        self.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def __enter__(self):
+        return self
+
+    # noinspection PyUnusedLocal,PyShadowingBuiltins
+    def __exit__(self, type, value, traceback):
+        self.close()
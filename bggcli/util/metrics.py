@@ -0,0 +1,243 @@
+"""
+bgg.metrics
+~~~~~~~~~~~~
+
+Metrics of a run (rows processed, retries, logins, downloads, latencies...) written as a
+Prometheus text file, to be collected by the textfile collector of the node exporter. The file
+is written periodically during the run, and once more at the end
+
+Metrics are disabled until configured, recording them is then a no-op
+
+"""
+import os
+import threading
+import time
+
+from bggcli.util.logger import Logger
+
+# Upper bounds of the latency histograms, in seconds
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300]
+
+# Name (without 'bggcli_' prefix), type, description
+METRICS = [
+    ('rows_processed_total', 'counter', 'Rows processed successfully'),
+    ('rows_failed_total', 'counter', 'Rows given up after too many attempts'),
+    ('rows_requeued_total', 'counter', 'Rows put back in the queue to be processed again'),
+    ('retries_total', 'counter', 'Requests sent again, because BGG queued or refused them'),
+    ('browser_restarts_total', 'counter', 'Web browsers restarted after an error'),
+    ('logins_total', 'counter', 'Logins through the login form'),
+    ('downloaded_bytes_total', 'counter', 'Bytes downloaded from the XML API'),
+    ('export_queue_wait_seconds', 'histogram',
+     'Time until an XML API response is available, including the time queued by BGG'),
+    ('row_duration_seconds', 'histogram', 'Time to process a row'),
+    ('page_load_seconds', 'histogram', 'Time to load a page in the web browser'),
+    ('http_request_duration_seconds', 'histogram', 'Time to get the response of an HTTP call'),
+    ('run_duration_seconds', 'gauge', 'Duration of the run'),
+    ('run_success', 'gauge', '1 if the run has finished successfully, 0 otherwise'),
+    ('last_update_timestamp_seconds', 'gauge', 'Time the metrics were written'),
+]
+
+DEFAULT_INTERVAL = 30
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value) if value != int(value) else str(int(value))
+    return str(value)
+
+
+class Metrics:
+    # Metrics of the current process, configured by the command line options
+    default = None
+
+    def __init__(self, path=None, labels=None, interval=DEFAULT_INTERVAL, clock=time.time):
+        """
+        :param path: Prometheus text file to write, None to disable the metrics
+        :param labels: Labels of all metrics as a dictionary, e.g. the command
+        :param interval: Delay between two writes of the file during the run, in seconds
+        :param clock: Function returning the current time, in seconds
+        """
+        self.path = path
+        self.enabled = path is not None
+        self.labels = labels or {}
+        self.interval = interval
+        self.clock = clock
+        self.started = clock()
+        self.lock = threading.Lock()
+        self.values = dict((name, 0) for name, metric_type, _ in METRICS
+                           if metric_type != 'histogram')
+        # name -> [count per bucket, sum, count]
+        self.histograms = dict((name, [[0] * len(LATENCY_BUCKETS), 0.0, 0])
+                               for name, metric_type, _ in METRICS if metric_type == 'histogram')
+        self.stopped = threading.Event()
+        self.thread = None
+
+    @staticmethod
+    def from_options(options, command):
+        """
+        Returns the metrics configured by the advanced options, disabled without 'metrics-file'
+        """
+        try:
+            interval = float(options.get('metrics-interval', DEFAULT_INTERVAL))
+        except ValueError:
+            Logger.error("Invalid value for 'metrics-interval' option, should be a number: %s"
+                         % options.get('metrics-interval'), sysexit=True)
+            return None
+        return Metrics(options.get('metrics-file'), {'command': command}, interval)
+
+    @staticmethod
+    def configure(options, command):
+        Metrics.default = Metrics.from_options(options, command)
+        return Metrics.default
+
+    @staticmethod
+    def get():
+        """
+        Returns the metrics of the current process, disabled until configured
+        """
+        if Metrics.default is None:
+            Metrics.default = Metrics()
+        return Metrics.default
+
+    def inc(self, name, value=1):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.values[name] += value
+
+    def set(self, name, value):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.values[name] = value
+
+    def observe(self, name, value):
+        """
+        Adds a value, e.g. a duration in seconds, to a histogram
+        """
+        if not self.enabled:
+            return
+        with self.lock:
+            buckets, _, _ = histogram = self.histograms[name]
+            for index, bound in enumerate(LATENCY_BUCKETS):
+                if value <= bound:
+                    buckets[index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    def count(self, rows, name='rows_processed_total'):
+        """
+        Returns the rows, counted in a metric while they are iterated
+        """
+        if not self.enabled:
+            return rows
+        return self._count(rows, name)
+
+    def _count(self, rows, name):
+        for row in rows:
+            self.inc(name)
+            yield row
+
+    def _labels(self, extra=None):
+        labels = sorted(self.labels.items()) + (extra or [])
+        if not labels:
+            return ''
+        return '{%s}' % ','.join('%s="%s"' % (key, _escape(value)) for key, value in labels)
+
+    def render(self):
+        """
+        Returns the metrics in the Prometheus text format
+        """
+        lines = []
+        with self.lock:
+            for name, metric_type, description in METRICS:
+                full_name = 'bggcli_' + name
+                lines.append('# HELP %s %s' % (full_name, description))
+                lines.append('# TYPE %s %s' % (full_name, metric_type))
+                if metric_type != 'histogram':
+                    lines.append('%s%s %s' % (full_name, self._labels(),
+                                              _format_value(self.values[name])))
+                    continue
+                buckets, total, count = self.histograms[name]
+                for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                    lines.append('%s_bucket%s %s' % (full_name, self._labels(
+                        [('le', _format_value(float(bound)))]), bucket_count))
+                lines.append('%s_bucket%s %s' % (full_name, self._labels([('le', '+Inf')]),
+                                                 count))
+                lines.append('%s_sum%s %s' % (full_name, self._labels(), _format_value(total)))
+                lines.append('%s_count%s %s' % (full_name, self._labels(), count))
+        return '\n'.join(lines) + '\n'
+
+    def write(self):
+        """
+        Writes the file atomically, so that the collector never reads a partial file
+        """
+        if not self.enabled:
+            return
+        now = self.clock()
+        self.set('run_duration_seconds', now - self.started)
+        self.set('last_update_timestamp_seconds', now)
+        tmp_path = '%s.%s.tmp' % (self.path, os.getpid())
+        with open(tmp_path, 'w') as metrics_file:
+            metrics_file.write(self.render())
+        if hasattr(os, 'replace'):
+            os.replace(tmp_path, self.path)
+        else:
+            os.rename(tmp_path, self.path)
+
+    def _write_periodically(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.write()
+            except (IOError, OSError) as e:
+                Logger.verbose('Cannot write metrics in %s: %s' % (self.path, e))
+
+    def start(self):
+        """
+        Writes the file now, then periodically until stop() is invoked
+        """
+        if not self.enabled:
+            return
+        self.write()
+        if self.interval > 0:
+            self.thread = threading.Thread(target=self._write_periodically,
+                                           name='bggcli-metrics')
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self, success):
+        """
+        Writes the final metrics of the run
+
+        :param success: True if the run has finished successfully
+        """
+        if not self.enabled:
+            return
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self.set('run_success', 1 if success else 0)
+        self.write()
+
+
+class CountingReader:
+    def __init__(self, source, metric='downloaded_bytes_total'):
+        """
+        File object counting the bytes read from a source, e.g. an HTTP response, in a metric.
+        Other attributes are the ones of the source
+        """
+        self.source = source
+        self.metric = metric
+
+    def read(self, size=-1):
+        data = self.source.read(size)
+        Metrics.get().inc(self.metric, len(data))
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self.source, name)
@@ -0,0 +1,224 @@
+"""
+bgg.ratelimiter
+~~~~~~~~~~~~
+
+Rate limiter of the requests sent to BGG: HTTP calls, XML API requests and page navigations of
+the web browsers all take a token from a bucket refilled at a constant rate. The rate is halved
+each time BGG answers 429 or 503, and waits for the delay it asks (Retry-After), then slowly
+grows back
+
+The bucket can be shared by all the bggcli processes of the host through a file, locked while
+it is updated, so that concurrent commands stay under the limits of BGG together
+
+"""
+import json
+import os
+import threading
+import time
+from email.utils import mktime_tz, parsedate_tz
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from bggcli.util.logger import Logger
+
+# Requests per second, and number of requests which can be sent at once after a pause
+DEFAULT_RATE = 2.0
+DEFAULT_BURST = 5
+
+# Slowest rate after several 429 or 503 responses, in requests per second
+MIN_RATE = 0.1
+
+# The rate grows back by this part of the configured rate after each successful request
+RECOVERY_STEP = 0.05
+
+DEFAULT_STATE_PATH = os.path.join(os.path.expanduser('~'), '.bggcli', 'ratelimit.json')
+
+
+def parse_retry_after(value, now=None):
+    """
+    Returns the delay in seconds of a Retry-After header, given as seconds or as a date
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return int(value)
+    date = parsedate_tz(value)
+    if date is None:
+        return None
+    return max(0, mktime_tz(date) - (now or time.time()))
+
+
+class RateLimiter:
+    # Limiter of the current process, configured by the command line options
+    default = None
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST, state_path=None, clock=time.time,
+                 sleep=time.sleep):
+        """
+        :param rate: Requests per second, None or 0 to disable the limiter
+        :param burst: Maximum number of tokens in the bucket
+        :param state_path: File holding the bucket, to share it with other processes. None to
+                           keep it in memory
+        :param clock: Function returning the current time, in seconds
+        :param sleep: Function waiting for a number of seconds
+        """
+        self.rate = float(rate) if rate else None
+        self.burst = max(1, int(burst))
+        self.state_path = state_path
+        if state_path is not None and fcntl is None:
+            Logger.info('File locks are not supported, the rate limit is not shared')
+            self.state_path = None
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.state = None
+        self.waited = 0.0
+        self.penalties = 0
+
+    @staticmethod
+    def from_options(options):
+        """
+        Returns the limiter configured by the advanced options
+        """
+        try:
+            rate = float(options.get('rate-limit', DEFAULT_RATE))
+            burst = int(options.get('rate-limit-burst', DEFAULT_BURST))
+        except ValueError:
+            Logger.error("Invalid value for 'rate-limit' or 'rate-limit-burst' option, should "
+                         "be a number", sysexit=True)
+            return None
+        state_path = None
+        if options.get('rate-limit-shared') == 'true':
+            state_path = options.get('rate-limit-file', DEFAULT_STATE_PATH)
+        return RateLimiter(rate, burst, state_path)
+
+    @staticmethod
+    def configure(options):
+        RateLimiter.default = RateLimiter.from_options(options)
+        return RateLimiter.default
+
+    @staticmethod
+    def get():
+        """
+        Returns the limiter of the current process, disabled until configured
+        """
+        if RateLimiter.default is None:
+            RateLimiter.default = RateLimiter(None)
+        return RateLimiter.default
+
+    def _new_state(self, now):
+        return {'tokens': float(self.burst), 'updated': now, 'rate': self.rate,
+                'blocked_until': 0.0}
+
+    def _update(self, change):
+        """
+        Applies a change to the state of the bucket, and returns its result. The state is read
+        from and written to the shared file when there is one, while it is locked
+        """
+        with self.lock:
+            now = self.clock()
+            if self.state_path is None:
+                if self.state is None:
+                    self.state = self._new_state(now)
+                return change(self.state, now)
+
+            directory = os.path.dirname(self.state_path)
+            if directory and not os.path.isdir(directory):
+                os.makedirs(directory)
+            fd = os.open(self.state_path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                content = b''
+                while True:
+                    chunk = os.read(fd, 4096)
+                    if not chunk:
+                        break
+                    content += chunk
+                try:
+                    state = json.loads(content.decode('utf-8'))
+                except ValueError:
+                    state = self._new_state(now)
+                result = change(state, now)
+                os.lseek(fd, 0, os.SEEK_SET)
+                os.ftruncate(fd, 0)
+                os.write(fd, json.dumps(state).encode('utf-8'))
+                return result
+            finally:
+                os.close(fd)
+
+    def _refill(self, state, now):
+        rate = min(state.get('rate') or self.rate, self.rate)
+        state['rate'] = rate
+        elapsed = max(0.0, now - state['updated'])
+        state['tokens'] = min(float(self.burst), state['tokens'] + elapsed * rate)
+        state['updated'] = now
+        return rate
+
+    def acquire(self):
+        """
+        Takes a token, waiting until one is available or the delay asked by BGG is over.
+        Returns the waited time, in seconds
+        """
+        if self.rate is None:
+            return 0.0
+
+        def take(state, now):
+            rate = self._refill(state, now)
+            # The token is reserved right away, so that concurrent requests queue up behind it
+            state['tokens'] -= 1
+            wait = -state['tokens'] / rate if state['tokens'] < 0 else 0.0
+            return max(wait, state['blocked_until'] - now)
+
+        wait = self._update(take)
+        if wait > 0:
+            self.waited += wait
+            self.sleep(wait)
+        return wait
+
+    def penalize(self, retry_after=None):
+        """
+        Slows down after a 429 or 503 response: the rate is halved, and no request is sent
+        before the delay asked by BGG
+
+        :param retry_after: Delay asked by BGG (Retry-After header), in seconds
+        """
+        self.penalties += 1
+        if self.rate is None:
+            return
+
+        def slow_down(state, now):
+            rate = self._refill(state, now)
+            state['rate'] = max(MIN_RATE, rate / 2)
+            delay = retry_after if retry_after is not None else 1 / state['rate']
+            state['blocked_until'] = max(state['blocked_until'], now + delay)
+            return state['rate']
+
+        rate = self._update(slow_down)
+        Logger.verbose('BGG is busy, slowing down to %.2f requests per second' % rate)
+
+    def succeed(self):
+        """
+        Lets the rate grow back after a successful request
+        """
+        if self.rate is None:
+            return
+
+        def recover(state, now):
+            rate = self._refill(state, now)
+            if rate < self.rate:
+                state['rate'] = min(self.rate, rate + self.rate * RECOVERY_STEP)
+
+        self._update(recover)
+
+    def summary(self):
+        """
+        Returns a description of the waits, None if the requests have never been delayed
+        """
+        if not self.waited and not self.penalties:
+            return None
+        return 'rate limit: waited %.1fs, %s responses asking to slow down' % (self.waited,
+                                                                           self.penalties)
@@ -0,0 +1,84 @@
+"""
+bgg.sessioncache
+~~~~~~~~~~~~
+
+Utility in charge of storing the cookies of an authenticated session on disk, so that next
+commands can skip the login page
+
+"""
+import hashlib
+import json
+import os
+import time
+
+from bggcli.util.httpclient import BGG_SESSION_COOKIE_NAME
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.bggcli', 'sessions')
+
+
+class SessionCache:
+    def __init__(self, login, cache_dir=None):
+        """
+        :param login: BGG login, cookies are stored per login
+        :param cache_dir: Directory of the cache files, only readable by the current user
+        """
+        self.login = login
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        key = hashlib.sha1(login.lower().encode('utf-8')).hexdigest()
+        self.path = os.path.join(self.cache_dir, '%s.json' % key)
+
+    @staticmethod
+    def from_options(login, options):
+        """
+        Returns the cache configured by the advanced options, None when disabled
+        """
+        if options.get('session-cache') != 'true':
+            return None
+        return SessionCache(login, options.get('session-cache-dir'))
+
+    def load(self):
+        """
+        Returns the cached cookies as a list of dictionaries (Selenium format), None if there is
+        no session or if it has expired
+        """
+        try:
+            with open(self.path) as cache_file:
+                cookies = json.load(cache_file)['cookies']
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+
+        now = time.time()
+        cookies = [cookie for cookie in cookies
+                   if not cookie.get('expiry') or cookie['expiry'] > now]
+        if not any(cookie['name'] == BGG_SESSION_COOKIE_NAME for cookie in cookies):
+            self.clear()
+            return None
+        return cookies
+
+    def load_values(self):
+        """
+        Returns the cached cookies as a dictionary (name -> value), None if there is no session
+        """
+        cookies = self.load()
+        if cookies is None:
+            return None
+        return dict((cookie['name'], cookie['value']) for cookie in cookies)
+
+    def save(self, cookies):
+        """
+        :param cookies: Cookies as a list of dictionaries, as returned by Selenium
+        """
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir, 0o700)
+
+        tmp_path = '%s.%s.tmp' % (self.path, os.getpid())
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as cache_file:
+            json.dump({'login': self.login, 'cookies': cookies}, cache_file)
+        os.rename(tmp_path, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
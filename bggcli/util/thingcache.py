@@ -0,0 +1,133 @@
+"""
+bgg.thingcache
+~~~~~~~~~~~~
+
+On-disk cache of the game details fetched from the XML API (thing), stored in a SQLite database.
+Entries expire after a time to live, and the least recently used ones are evicted once the cache
+holds too many of them
+
+"""
+import json
+import os
+import sqlite3
+import time
+
+from bggcli.util.logger import Logger
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.bggcli', 'cache')
+CACHE_FILE_NAME = 'things.sqlite'
+
+# Time to live of the entries, in days
+DEFAULT_TTL = 7
+DEFAULT_MAX_ENTRIES = 50000
+
+
+class ThingCache:
+    def __init__(self, cache_dir=None, ttl=DEFAULT_TTL, max_entries=DEFAULT_MAX_ENTRIES,
+                 clock=time.time):
+        """
+        :param cache_dir: Directory of the cache database
+        :param ttl: Time to live of the entries, in days
+        :param max_entries: Maximum number of entries, the least recently used ones are evicted
+        :param clock: Function returning the current time, in seconds
+        """
+        self.cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        self.path = os.path.join(self.cache_dir, CACHE_FILE_NAME)
+        self.ttl = ttl * 24 * 3600
+        self.max_entries = max_entries
+        self.clock = clock
+        self.connection = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def from_options(options):
+        """
+        Returns the cache configured by the advanced options, None when disabled
+        """
+        if options.get('thing-cache') == 'false':
+            return None
+        try:
+            ttl = float(options.get('thing-cache-ttl', DEFAULT_TTL))
+            max_entries = int(options.get('thing-cache-size', DEFAULT_MAX_ENTRIES))
+        except ValueError:
+            Logger.error("Invalid value for 'thing-cache-ttl' or 'thing-cache-size' option, "
+                         "should be a number", sysexit=True)
+            return None
+        return ThingCache(options.get('thing-cache-dir'), ttl, max_entries)
+
+    def open(self):
+        if not os.path.isdir(self.cache_dir):
+            os.makedirs(self.cache_dir)
+        self.connection = sqlite3.connect(self.path)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS things (objectid TEXT PRIMARY KEY, '
+                                'data TEXT, fetched_at REAL, accessed_at REAL)')
+        self.connection.execute('CREATE INDEX IF NOT EXISTS things_accessed_at '
+                                'ON things (accessed_at)')
+        self.connection.commit()
+        return self
+
+    def get_many(self, objectids):
+        """
+        Returns the cached details of the given games as a dictionary (objectid -> values),
+        games missing or expired are not part of it
+        """
+        now = self.clock()
+        result = {}
+        objectids = list(objectids)
+        # SQLite limits the number of parameters of a query
+        for start in range(0, len(objectids), 500):
+            chunk = objectids[start:start + 500]
+            cursor = self.connection.execute(
+                'SELECT objectid, data FROM things WHERE objectid IN (%s) AND fetched_at > ?'
+                % ', '.join('?' * len(chunk)), chunk + [now - self.ttl])
+            for objectid, data in cursor:
+                result[objectid] = json.loads(data)
+        if result:
+            self.connection.executemany('UPDATE things SET accessed_at = ? WHERE objectid = ?',
+                                        [(now, objectid) for objectid in result])
+        self.hits += len(result)
+        self.misses += len(objectids) - len(result)
+        return result
+
+    def put_many(self, things):
+        """
+        :param things: Details of games as a dictionary (objectid -> values)
+        """
+        now = self.clock()
+        with self.connection:
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO things VALUES (?, ?, ?, ?)',
+                [(objectid, json.dumps(values), now, now) for objectid, values in things.items()])
+
+    def evict(self):
+        """
+        Removes the expired entries, then the least recently used ones above the maximum number
+        of entries. Returns the number of removed entries
+        """
+        with self.connection:
+            removed = self.connection.execute('DELETE FROM things WHERE fetched_at <= ?',
+                                              (self.clock() - self.ttl,)).rowcount
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                removed += self.connection.execute(
+                    'DELETE FROM things WHERE objectid IN '
+                    '(SELECT objectid FROM things ORDER BY accessed_at LIMIT ?)',
+                    (excess,)).rowcount
+        return removed
+
+    def __len__(self):
+        return self.connection.execute('SELECT COUNT(*) FROM things').fetchone()[0]
+
+    def close(self):
+        if self.connection is not None:
+            self.evict()
+            self.connection.close()
+            self.connection = None
+
+    def __enter__(self):
+        return self
+
+    # noinspection PyUnusedLocal,PyShadowingBuiltins
+    def __exit__(self, type, value, traceback):
+        self.close()
@@ -0,0 +1,216 @@
+"""
+bgg.thingenricher
+~~~~~~~~~~~~
+
+Utility in charge of completing collection rows with the details of the games (ratings, weight,
+rank, players...), fetched from the XML API by batches of games and kept in a ThingCache
+
+"""
+from bggcli import BGG_GAMEDB_FIELDS
+from bggcli.util.logger import Logger
+from bggcli.util.xmlapi import PollingSchedule, fetch, thing_request
+from bggcli.util.xmltocsv import XmlToCsv
+
+# Details of a game, collid excepted since it comes from the collection
+THING_FIELDS = [field for field in BGG_GAMEDB_FIELDS if field != 'collid']
+
+# Number of games per request, the maximum accepted by BGG
+DEFAULT_BATCH_SIZE = 20
+
+# Number of rows buffered before looking up their games, so that batches are full
+WINDOW_SIZE = 500
+
+# Type of the thing -> item type, as in the CSV export of BGG
+ITEM_TYPES = {
+    'boardgame': 'standalone',
+    'boardgameexpansion': 'expansion',
+}
+
+# Values held by a 'value' attribute: column, path of the element from the item
+THING_VALUES = [
+    ('yearpublished', 'yearpublished'),
+    ('minplayers', 'minplayers'),
+    ('maxplayers', 'maxplayers'),
+    ('playingtime', 'playingtime'),
+    ('minplaytime', 'minplaytime'),
+    ('maxplaytime', 'maxplaytime'),
+    ('average', 'statistics/ratings/average'),
+    ('baverage', 'statistics/ratings/bayesaverage'),
+    ('avgweight', 'statistics/ratings/averageweight'),
+]
+
+
+def _votes(result):
+    try:
+        return int(result.get('numvotes', 0))
+    except ValueError:
+        return 0
+
+
+def _poll(el, name):
+    for poll in el.findall('poll'):
+        if poll.get('name') == name:
+            return poll
+    return None
+
+
+def _most_voted(results):
+    """
+    Returns the most voted result of a poll, None when nobody has voted
+    """
+    best = None
+    for result in results.findall('result'):
+        if _votes(result) and (best is None or _votes(result) > _votes(best)):
+            best = result
+    return best
+
+
+def parse_thing(el):
+    """
+    Extracts the details of a game from a thing item of the XML API. Returns a dictionary
+    (column of THING_FIELDS -> value)
+    """
+    values = dict((field, '') for field in THING_FIELDS)
+    values['objecttype'] = 'thing'
+    values['itemtype'] = ITEM_TYPES.get(el.get('type'), el.get('type') or '')
+    for name in el.findall('name'):
+        if name.get('type') == 'primary':
+            values['originalname'] = name.get('value', '')
+            break
+    for column, path in THING_VALUES:
+        node = el.find(path)
+        if node is not None:
+            values[column] = node.get('value', '')
+    for rank in el.findall('statistics/ratings/ranks/rank'):
+        if rank.get('type') == 'subtype':
+            value = rank.get('value', '')
+            values['rank'] = value if value.isdigit() else ''
+            break
+
+    poll = _poll(el, 'suggested_numplayers')
+    if poll is not None:
+        best = []
+        recommended = []
+        for results in poll.findall('results'):
+            votes = dict((result.get('value'), _votes(result))
+                         for result in results.findall('result'))
+            yes = votes.get('Best', 0) + votes.get('Recommended', 0)
+            if yes and yes > votes.get('Not Recommended', 0):
+                recommended.append(results.get('numplayers'))
+            if votes.get('Best', 0) and votes.get('Best', 0) >= max(votes.values()):
+                best.append(results.get('numplayers'))
+        values['bggrecplayers'] = ','.join(recommended)
+        values['bggbestplayers'] = ','.join(best)
+
+    poll = _poll(el, 'suggested_playerage')
+    if poll is not None and poll.find('results') is not None:
+        result = _most_voted(poll.find('results'))
+        if result is not None:
+            values['bggrecagerange'] = result.get('value', '').rstrip('+') + '+'
+
+    poll = _poll(el, 'language_dependence')
+    if poll is not None and poll.find('results') is not None:
+        result = _most_voted(poll.find('results'))
+        if result is not None:
+            values['bgglanguagedependence'] = result.get('value', '')
+    return values
+
+
+def parse_things(source):
+    """
+    Yields (objectid, details) for the items of a thing response of the XML API, while it is
+    parsed
+
+    :param source: XML response, as a file path or a file object
+    """
+    for el in XmlToCsv.iterate_items(source):
+        yield el.get('id'), parse_thing(el)
+
+
+class ThingEnricher:
+    def __init__(self, cache=None, batch_size=DEFAULT_BATCH_SIZE, options=None,
+                 fetch_things=None):
+        """
+        :param cache: ThingCache where details are looked up first, None to always fetch them
+        :param batch_size: Number of games per request
+        :param options: Advanced options, configuring the polling of the requests
+        :param fetch_things: Function fetching the details of a list of games as a dictionary
+                             (objectid -> details), the XML API by default
+        """
+        self.cache = cache
+        self.batch_size = batch_size
+        self.options = options or {}
+        self.fetch_things = fetch_things or self._fetch_things
+        self.requests = 0
+        self.fetched = 0
+
+    @staticmethod
+    def from_options(options, cache=None):
+        try:
+            batch_size = int(options.get('thing-batch-size', DEFAULT_BATCH_SIZE))
+        except ValueError:
+            Logger.error("Invalid value for 'thing-batch-size' option, should be a number: %s"
+                         % options.get('thing-batch-size'), sysexit=True)
+            return None
+        return ThingEnricher(cache, batch_size, options)
+
+    def close(self):
+        if self.cache is not None:
+            self.cache.close()
+        if self.requests:
+            Logger.info('Details of %s games fetched in %s requests' % (self.fetched,
+                                                                        self.requests))
+
+    def _fetch_things(self, objectids):
+        response = fetch(thing_request(objectids), PollingSchedule.from_options(self.options))
+        try:
+            return dict(parse_things(response))
+        finally:
+            response.close()
+
+    def lookup(self, objectids):
+        """
+        Returns the details of the given games as a dictionary (objectid -> details). Games
+        unknown to BGG are not part of it
+        """
+        objectids = sorted(set(objectid for objectid in objectids if objectid))
+        things = self.cache.get_many(objectids) if self.cache is not None else {}
+        missing = [objectid for objectid in objectids if objectid not in things]
+        for start in range(0, len(missing), self.batch_size):
+            batch = missing[start:start + self.batch_size]
+            Logger.verbose('Fetching details of %s games...' % len(batch))
+            fetched = self.fetch_things(batch)
+            self.requests += 1
+            self.fetched += len(fetched)
+            if self.cache is not None:
+                self.cache.put_many(fetched)
+            things.update(fetched)
+        return things
+
+    def enrich(self, rows, objectid_index, window=WINDOW_SIZE):
+        """
+        Yields the rows followed by the details of their game, in the order of THING_FIELDS.
+        Details of games unknown to BGG are empty
+
+        :param rows: Rows as tuples of values
+        :param objectid_index: Index of the game identifier in the rows
+        :param window: Number of rows buffered before looking up their games
+        """
+        empty = ('',) * len(THING_FIELDS)
+        buffer = []
+
+        def flush():
+            things = self.lookup(row[objectid_index] for row in buffer)
+            for row in buffer:
+                thing = things.get(row[objectid_index])
+                yield tuple(row) + (tuple(thing.get(field, '') for field in THING_FIELDS)
+                                    if thing is not None else empty)
+            del buffer[:]
+
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) >= window:
+                for enriched in flush():
+                    yield enriched
+        for enriched in flush():
+            yield enriched
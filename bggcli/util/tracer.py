@@ -0,0 +1,206 @@
+"""
+bgg.tracer
+~~~~~~~~~~~~
+
+Lightweight tracing of a run: nested spans (command, rows, page navigations, form filling,
+requests...) are recorded with their duration, then written as a Chrome trace (to open in
+chrome://tracing or https://ui.perfetto.dev) and summarized per span name
+
+Tracing is disabled until configured, spans then cost a single function call
+
+"""
+import functools
+import json
+import math
+import os
+import threading
+import time
+
+from bggcli.util.logger import Logger
+
+
+class _NullSpan(object):
+    def __enter__(self):
+        return self
+
+    # noinspection PyUnusedLocal,PyShadowingBuiltins
+    def __exit__(self, type, value, traceback):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class Span(object):
+    __slots__ = ('tracer', 'name', 'category', 'args', 'start')
+
+    def __init__(self, tracer, name, category, args):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.start = None
+
+    def __enter__(self):
+        self.start = self.tracer.clock()
+        return self
+
+    # noinspection PyShadowingBuiltins
+    def __exit__(self, type, value, traceback):
+        if type is not None:
+            self.args['error'] = type.__name__
+        self.tracer.record(self.name, self.category, self.start, self.tracer.clock(), self.args)
+        return False
+
+
+class Tracer:
+    # Tracer of the current process, configured by the command line options
+    default = None
+
+    def __init__(self, enabled=True, clock=time.time):
+        """
+        :param enabled: False to ignore all spans
+        :param clock: Function returning the current time, in seconds
+        """
+        self.enabled = enabled
+        self.clock = clock
+        self.origin = clock()
+        self.lock = threading.Lock()
+        # (name, category, start, end, thread id, args)
+        self.events = []
+        self.threads = {}
+        self.trace_path = None
+        self.show_summary = False
+
+    @staticmethod
+    def from_options(options):
+        """
+        Returns the tracer configured by the advanced options, disabled unless a trace file or a
+        summary is requested
+        """
+        trace_path = options.get('trace-file')
+        show_summary = options.get('trace-summary') == 'true'
+        tracer = Tracer(enabled=trace_path is not None or show_summary)
+        tracer.trace_path = trace_path
+        tracer.show_summary = show_summary
+        return tracer
+
+    @staticmethod
+    def configure(options):
+        Tracer.default = Tracer.from_options(options)
+        return Tracer.default
+
+    @staticmethod
+    def get():
+        """
+        Returns the tracer of the current process, disabled until configured
+        """
+        if Tracer.default is None:
+            Tracer.default = Tracer(enabled=False)
+        return Tracer.default
+
+    def span(self, name, category='bggcli', **args):
+        """
+        Returns a context manager recording the duration of the code it wraps
+
+        :param name: Name of the span, durations are summarized by name
+        :param category: Category of the span, to filter them in the trace viewer
+        :param args: Details displayed with the span in the trace viewer
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, category, args)
+
+    def record(self, name, category, start, end, args=None):
+        thread = threading.current_thread()
+        with self.lock:
+            self.threads.setdefault(thread.ident, thread.name)
+            self.events.append((name, category, start, end, thread.ident, args or {}))
+
+    def durations(self):
+        """
+        Returns the durations of the spans, in seconds, by name in order of first occurrence
+        """
+        result = {}
+        names = []
+        with self.lock:
+            for name, _, start, end, _, _ in self.events:
+                if name not in result:
+                    result[name] = []
+                    names.append(name)
+                result[name].append(end - start)
+        return [(name, result[name]) for name in names]
+
+    @staticmethod
+    def percentile(values, ratio):
+        """
+        Returns the percentile of the values (nearest rank), e.g. the median for 0.5
+        """
+        values = sorted(values)
+        return values[max(0, int(math.ceil(ratio * len(values))) - 1)]
+
+    def summary(self):
+        """
+        Returns the summary of the spans as lines of text: count, p50, p95 and total duration
+        for each span name
+        """
+        durations = self.durations()
+        if not durations:
+            return []
+        width = max(len(name) for name, _ in durations)
+        lines = ['%s %7s %9s %9s %10s' % ('span'.ljust(width), 'count', 'p50', 'p95', 'total')]
+        for name, values in durations:
+            lines.append('%s %7s %8.3fs %8.3fs %9.3fs'
+                         % (name.ljust(width), len(values), self.percentile(values, 0.5),
+                            self.percentile(values, 0.95), sum(values)))
+        return lines
+
+    def chrome_trace(self):
+        """
+        Returns the spans in the Chrome trace event format, as a dictionary
+        """
+        pid = os.getpid()
+        with self.lock:
+            events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid,
+                       'args': {'name': thread_name}}
+                      for tid, thread_name in sorted(self.threads.items())]
+            for name, category, start, end, tid, args in self.events:
+                events.append({'name': name, 'cat': category, 'ph': 'X', 'pid': pid,
+                               'tid': tid, 'ts': int((start - self.origin) * 1e6),
+                               'dur': int((end - start) * 1e6), 'args': args})
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+    def write_chrome_trace(self, path):
+        with open(path, 'w') as trace_file:
+            json.dump(self.chrome_trace(), trace_file)
+
+    def report(self):
+        """
+        Writes the trace file and logs the summary, as configured
+        """
+        if self.trace_path is not None:
+            self.write_chrome_trace(self.trace_path)
+            Logger.info("Trace written in %s" % self.trace_path)
+        if self.show_summary:
+            for line in self.summary():
+                Logger.info(line)
+
+
+def span(name, category='bggcli', **args):
+    """
+    Returns a span of the tracer of the current process, see Tracer.span
+    """
+    return Tracer.get().span(name, category, **args)
+
+
+def traced(name, category='bggcli'):
+    """
+    Decorator recording each invocation of a function as a span
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with Tracer.get().span(name, category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
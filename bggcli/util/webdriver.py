@@ -6,12 +6,26 @@ Utility in charge of wrapping Selenium web driver
 
 """
 import os
+try:
+    from urllib import quote
+except ImportError:
+    from urllib.parse import quote
 
 from selenium import webdriver
-from selenium.common.exceptions import WebDriverException
+from selenium.common.exceptions import NoAlertPresentException, WebDriverException
 from selenium.webdriver import DesiredCapabilities
 from bggcli.util.logger import Logger
 
+# Ads and analytics served with BGG pages, useless for bggcli
+BLOCKED_HOSTS = [
+    '.doubleclick.net', '.googlesyndication.com', '.googletagservices.com',
+    '.googletagmanager.com', '.google-analytics.com', '.googleadservices.com',
+    '.adnxs.com', '.amazon-adsystem.com', '.moatads.com', '.scorecardresearch.com',
+    '.quantserve.com', '.rubiconproject.com', '.pubmatic.com', '.openx.net', '.casalemedia.com',
+    '.criteo.com', '.criteo.net', '.taboola.com', '.outbrain.com', '.facebook.net',
+    '.adsafeprotected.com', '.indexww.com', '.sharethrough.com', '.yieldmo.com', '.3lift.com',
+]
+
 
 class WebDriver:
     # noinspection PyUnusedLocal,PyDefaultArgument
@@ -23,7 +37,9 @@ class WebDriver:
         if os.environ.get('CI') == 'true':
             self.driver = self.create_ci_driver()
         else:
-            self.driver = self.create_local_firefox_driver(options.get('browser-profile-dir'))
+            self.driver = self.create_local_firefox_driver(options.get('browser-profile-dir'),
+                                                           options.get('browser-headless') == 'true',
+                                                           options.get('browser-lean') == 'true')
 
     def __enter__(self):
         return self
@@ -39,14 +55,77 @@ class WebDriver:
                             % (self.name, repr(e)))
         return type is None
 
+    @staticmethod
+    def reset(driver):
+        """
+        Tries to bring a live browser session back to a clean state after an error: closes
+        additional windows, dismisses any alert and leaves the current page. Returns False when the
+        session is dead and the browser must be restarted
+
+        :param driver: Selenium driver
+        """
+        try:
+            handles = driver.window_handles
+            if not handles:
+                return False
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+            try:
+                driver.switch_to.alert.dismiss()
+            except NoAlertPresentException:
+                pass
+            driver.get('about:blank')
+            return True
+        except WebDriverException as e:
+            Logger.verbose("Web browser session can't be recovered: %s" % repr(e))
+            return False
+
+    @staticmethod
+    def lean_pac_script():
+        """
+        Returns a proxy auto-config script sending requests of blocked hosts to a closed port
+        """
+        conditions = ' || '.join('dnsDomainIs(host, "%s")' % host for host in BLOCKED_HOSTS)
+        return 'function FindProxyForURL(url, host) { ' \
+               'if (%s) { return "PROXY 127.0.0.1:9"; } return "DIRECT"; }' % conditions
+
+    @staticmethod
+    def configure_lean_profile(profile):
+        """
+        Strips down a profile to what bggcli needs: no images, no web fonts, no ads or trackers
+        """
+        profile.set_preference('permissions.default.image', 2)
+        profile.set_preference('gfx.downloadable_fonts.enabled', False)
+        profile.set_preference('browser.display.use_document_fonts', 0)
+        profile.set_preference('media.autoplay.default', 5)
+        profile.set_preference('privacy.trackingprotection.enabled', True)
+        profile.set_preference('network.proxy.type', 2)
+        profile.set_preference('network.proxy.autoconfig_url',
+                               'data:application/x-ns-proxy-autoconfig,'
+                               + quote(WebDriver.lean_pac_script()))
+
     # noinspection PyMethodMayBeStatic
-    def create_local_firefox_driver(self, profile_path):
+    def create_local_firefox_driver(self, profile_path, headless=False, lean=False):
         if profile_path is None:
             profile = webdriver.FirefoxProfile()
         else:
             profile = webdriver.FirefoxProfile(profile_path)
 
-        return webdriver.Firefox(firefox_profile=profile)
+        firefox_options = webdriver.FirefoxOptions()
+        # Useful on servers without display
+        firefox_options.set_headless(headless)
+
+        capabilities = DesiredCapabilities.FIREFOX.copy()
+        if lean:
+            self.configure_lean_profile(profile)
+            # Don't wait for images, stylesheets and frames: pages wait for the elements they
+            # need anyway
+            capabilities['pageLoadStrategy'] = 'eager'
+
+        return webdriver.Firefox(firefox_profile=profile, options=firefox_options,
+                                 capabilities=capabilities)
 
     # noinspection PyMethodMayBeStatic
     def create_ci_driver(self):
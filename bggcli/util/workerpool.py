@@ -0,0 +1,190 @@
+"""
+bgg.workerpool
+~~~~~~~~~~~~
+
+Utility in charge of processing rows from a shared queue with several workers, each worker
+owning its own session (typically an authenticated web browser)
+
+"""
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+
+from selenium.common.exceptions import WebDriverException
+
+from bggcli.util.logger import Logger
+from bggcli.util.metrics import Metrics
+from bggcli.util.tracer import span
+
+
+class PoolReport:
+    def __init__(self, total):
+        self.total = total
+        self.pulled = 0
+        self.done = 0
+        self.failed = []
+        self.requeued = 0
+
+    def __str__(self):
+        return '%s/%s done, %s failed, %s retries' \
+               % (self.done, self.total, len(self.failed), self.requeued)
+
+
+class WorkerPool:
+    def __init__(self, worker_count=1, retry_limit=5):
+        """
+        :param worker_count: Number of workers processing rows concurrently
+        :param retry_limit: Number of attempts for a row before giving up
+        """
+        self.worker_count = max(1, worker_count)
+        self.retry_limit = retry_limit
+        self.lock = threading.Lock()
+        self.source = None
+        self.queue = deque()
+        self.pending = None
+        self.report = None
+        self.exit_code = None
+
+    def run(self, rows, open_session, process, total=None):
+        """
+        Processes all rows and returns a PoolReport
+
+        :param rows: Rows to process, as dictionaries. Any iterable is accepted, rows are only
+                     pulled from it when a worker is ready to process them
+        :param open_session: Function returning a context manager which provides the object
+                             given to 'process' (e.g. a GamePage). When a WebDriverException
+                             occurs, the 'recover()' method of this object is invoked if any,
+                             and the session is only opened again when it returns False
+        :param process: Function invoked with the session object and a row, returns True when
+                        the row has been processed, False to put it back in the queue
+        :param total: Number of rows, displayed in the progress. Defaults to the length of
+                      'rows' when available
+        """
+        if total is None and hasattr(rows, '__len__'):
+            total = len(rows)
+        self.source = iter(rows)
+        self.queue = deque()
+        self.pending = None
+        self.report = PoolReport(total)
+
+        if self.worker_count == 1:
+            self._work(0, open_session, process)
+        else:
+            workers = [threading.Thread(target=self._work, args=(i, open_session, process),
+                                        name='bggcli-worker-%s' % i)
+                       for i in range(self.worker_count)]
+            for worker in workers:
+                worker.daemon = True
+                worker.start()
+            for worker in workers:
+                worker.join()
+
+        if self.exit_code is not None:
+            sys.exit(self.exit_code)
+        if self.report.total is None:
+            self.report.total = self.report.pulled
+        return self.report
+
+    def _pull(self):
+        """
+        Returns the next (row, attempt) to process, new rows first then rows put back in the
+        queue. Must be called with the lock held
+        """
+        if self.pending is not None:
+            item, self.pending = self.pending, None
+            return item
+        if self.source is not None:
+            for row in self.source:
+                self.report.pulled += 1
+                return row, 1
+            self.source = None
+        if self.queue:
+            return self.queue.popleft()
+        return None
+
+    def _next(self):
+        with self.lock:
+            if self.exit_code is not None:
+                return None
+            return self._pull()
+
+    def _requeue(self, row, attempt):
+        with self.lock:
+            if attempt >= self.retry_limit:
+                Logger.info('(BGGID %s) Retry limit of %s reached, skipped.'
+                            % (row.get('objectid'), self.retry_limit))
+                self.report.failed.append(row)
+                Metrics.get().inc('rows_failed_total')
+            else:
+                Logger.info('(BGGID %s) Back in queue.' % row.get('objectid'))
+                self.report.requeued += 1
+                Metrics.get().inc('rows_requeued_total')
+                self.queue.append((row, attempt + 1))
+
+    def _done(self, row):
+        with self.lock:
+            self.report.done += 1
+            Metrics.get().inc('rows_processed_total')
+            Logger.info('[%s/%s] (BGGID %s) %s [done]'
+                        % (self.report.done, self.report.total or '?', row.get('objectid'),
+                           row.get('objectname')))
+
+    def _work(self, index, open_session, process):
+        try:
+            while self._has_pending():
+                try:
+                    with open_session(index) as session:
+                        self._process_session(session, process)
+                except WebDriverException:
+                    Logger.info('WebDriverException occurred, restarting browser.')
+                    Metrics.get().inc('browser_restarts_total')
+        except SystemExit as e:
+            with self.lock:
+                self.exit_code = e.code
+
+    def _has_pending(self):
+        with self.lock:
+            if self.exit_code is not None:
+                return False
+            if self.pending is None:
+                self.pending = self._pull()
+            return self.pending is not None
+
+    def _process_session(self, session, process):
+        while True:
+            try:
+                self._process_rows(session, process)
+                return
+            except WebDriverException:
+                # Restarting the browser (and logging in again) is expensive, reuse the current
+                # one when it is still alive
+                recover = getattr(session, 'recover', None)
+                if recover is None or not recover():
+                    raise
+                Logger.info('WebDriverException occurred, web browser session recovered.')
+
+    def _process_rows(self, session, process):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            row, attempt = item
+            Logger.info('(BGGID %s) Name: %s (attempt %s)'
+                        % (row.get('objectid'), row.get('objectname'), attempt))
+            started = time.time()
+            try:
+                with span('row', objectid=row.get('objectid'), attempt=attempt):
+                    processed = process(session, row)
+                Metrics.get().observe('row_duration_seconds', time.time() - started)
+                if processed:
+                    self._done(row)
+                else:
+                    self._requeue(row, attempt)
+            except WebDriverException:
+                self._requeue(row, attempt)
+                raise
+            except Exception:
+                traceback.print_exc(limit=2, file=sys.stdout)
+                self._requeue(row, attempt)
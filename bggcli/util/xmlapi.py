@@ -0,0 +1,225 @@
+"""
+bgg.xmlapi
+~~~~~~~~~~~~
+
+Utility in charge of querying the XML API 2 of BGG, see
+https://www.boardgamegeek.com/wiki/page/BGG_XML_API2
+
+"""
+import codecs
+import random
+import time
+try:
+    from urllib2 import urlopen, HTTPError
+    from urllib import urlencode
+    from httplib import BadStatusLine
+except ImportError:
+    from urllib.request import urlopen
+    from urllib.error import HTTPError
+    from urllib.parse import urlencode
+    from http.client import BadStatusLine
+
+from bggcli.util.httpclient import HttpClient, BGG_SESSION_COOKIE_NAME
+from bggcli.util.logger import Logger
+from bggcli.util.metrics import CountingReader, Metrics
+from bggcli.util.ratelimiter import RateLimiter, parse_retry_after
+from bggcli.util.tracer import span
+
+EXPORT_QUERY_INTERVAL = 2
+EXPORT_QUERY_MAX_INTERVAL = 30
+EXPORT_TIMEOUT = 600
+ERROR_FILE_PATH = 'error.txt'
+
+# Responses meaning the request must be sent again later: queued export, or BGG too busy
+RETRY_HTTP_CODES = [202, 429, 503]
+
+
+class PollingSchedule:
+    def __init__(self, interval=EXPORT_QUERY_INTERVAL, max_interval=EXPORT_QUERY_MAX_INTERVAL,
+                 timeout=EXPORT_TIMEOUT, factor=2.0, jitter=0.2, rand=None):
+        """
+        Delays between the requests of a queued export: exponential backoff with jitter, and an
+        overall deadline
+
+        :param interval: Delay in seconds before the first retry
+        :param max_interval: Maximum delay in seconds between two requests
+        :param timeout: Maximum time in seconds waiting for the export
+        :param factor: Growth of the delay after each retry
+        :param jitter: Ratio of the delay randomly added or removed, so that several clients do
+                       not query BGG at the same time
+        """
+        self.interval = interval
+        self.max_interval = max_interval
+        self.timeout = timeout
+        self.factor = factor
+        self.jitter = jitter
+        self.random = rand or random.Random()
+        # Time spent in the queue and number of requests of the last fetch, for tuning
+        self.queue_time = 0
+        self.attempts = 0
+
+    @staticmethod
+    def from_options(options):
+        values = {}
+        for name, key in [('export-poll-interval', 'interval'),
+                          ('export-poll-max', 'max_interval'),
+                          ('export-timeout', 'timeout')]:
+            if options.get(name) is None:
+                continue
+            try:
+                values[key] = float(options[name])
+            except ValueError:
+                Logger.error("Invalid value for '%s' option, should be a number of seconds: %s"
+                             % (name, options[name]), sysexit=True)
+        return PollingSchedule(**values)
+
+    def delay(self, attempt, retry_after=None):
+        """
+        Returns the delay in seconds before sending the request again
+
+        :param attempt: Number of requests already sent
+        :param retry_after: Delay in seconds requested by BGG, if any
+        """
+        if retry_after is not None:
+            return max(0, retry_after)
+        delay = min(self.max_interval, self.interval * self.factor ** (attempt - 1))
+        return delay * (1 + self.jitter * self.random.uniform(-1, 1))
+
+    @staticmethod
+    def parse_retry_after(value, now=None):
+        """
+        Returns the delay in seconds of a Retry-After header, given as seconds or as a date
+        """
+        return parse_retry_after(value, now)
+
+
+class TeeReader:
+    def __init__(self, source, copy):
+        """
+        File object reading from a source and writing everything read to a copy, so that a
+        response can be parsed and saved at once
+
+        :param source: File object to read, e.g. an HTTP response
+        :param copy: File object opened in binary mode, receiving the content read
+        """
+        self.source = source
+        self.copy = copy
+
+    def read(self, size=-1):
+        data = self.source.read(size)
+        self.copy.write(data)
+        return data
+
+    def drain(self, chunk_size=64 * 1024):
+        """
+        Copies the content not read yet
+        """
+        while self.read(chunk_size):
+            pass
+
+
+def collection_request(cookies, login, **params):
+    """
+    Builds the request to export a collection, with version and private information
+
+    :param cookies: Session cookies as a dictionary, to get private information. None to only
+                    get public information
+    :param login: BGG login of the collection owner
+    :param params: Additional parameters of the collection API
+    """
+    # Default CSV export doesn't provide version info!
+    query = [('username', login), ('version', 1), ('showprivate', 1), ('stats', 1)]
+    query.extend(sorted(params.items()))
+    http_client = HttpClient({BGG_SESSION_COOKIE_NAME: cookies[BGG_SESSION_COOKIE_NAME]}
+                             if cookies else None)
+    return http_client.request('/xmlapi2/collection?%s' % urlencode(query))
+
+
+def thing_request(ids):
+    """
+    Builds the request to get the details and statistics of games
+
+    :param ids: Identifiers of the games (objectid)
+    """
+    query = [('id', ','.join(str(objectid) for objectid in ids)), ('stats', 1)]
+    return HttpClient().request('/xmlapi2/thing?%s' % urlencode(query))
+
+
+def search_request(query, types=('boardgame', 'boardgameexpansion')):
+    """
+    Builds the request to search games by name
+
+    :param query: Name, or part of the name of the games
+    :param types: Types of the searched things
+    """
+    query = [('query', query.encode('utf-8') if not isinstance(query, str) else query),
+             ('type', ','.join(types))]
+    return HttpClient().request('/xmlapi2/search?%s' % urlencode(query))
+
+
+def fetch(req, schedule=None):
+    """
+    Returns the response of an XML API request, waiting while BGG queues it (HTTP 202)
+
+    :param req: Request to send
+    :param schedule: PollingSchedule of the retries, default one if not provided
+    """
+    schedule = schedule or PollingSchedule()
+    limiter = RateLimiter.get()
+    metrics = Metrics.get()
+    start = time.time()
+    attempt = 0
+    while True:
+        attempt += 1
+        retry_after = None
+        limiter.acquire()
+        request_start = time.time()
+        try:
+            with span('xmlapi', attempt=attempt):
+                response = urlopen(req)
+            metrics.observe('http_request_duration_seconds', time.time() - request_start)
+            if response.code not in RETRY_HTTP_CODES:
+                limiter.succeed()
+                break
+            retry_after = response.headers.get('Retry-After')
+            response.close()
+            reason = 'Export is queued'
+        except HTTPError as e:
+            if e.code not in RETRY_HTTP_CODES:
+                raise
+            retry_after = e.headers.get('Retry-After')
+            reason = 'BGG is busy (HTTP %s)' % e.code
+            limiter.penalize(PollingSchedule.parse_retry_after(retry_after))
+        except BadStatusLine:
+            # Happens sometimes when the connection of a previous request is reused
+            reason = 'Connection closed by BGG'
+
+        delay = schedule.delay(attempt, PollingSchedule.parse_retry_after(retry_after))
+        if time.time() - start + delay > schedule.timeout:
+            raise Exception('Export is still not available after %ss, giving up'
+                            % int(time.time() - start))
+        Logger.info('%s, will retry in %.1fs' % (reason, delay))
+        metrics.inc('retries_total')
+        time.sleep(delay)
+
+    schedule.queue_time = time.time() - start
+    schedule.attempts = attempt
+    metrics.observe('export_queue_wait_seconds', schedule.queue_time)
+    if attempt > 1:
+        Logger.info('Export was available after %.1fs and %s requests'
+                       % (schedule.queue_time, attempt))
+
+    if response.code == 200:
+        return CountingReader(response) if metrics.enabled else response
+
+    # Write response in a text file otherwise
+    try:
+        #with open(ERROR_FILE_PATH, "wb") as error_file:
+        with codecs.open(ERROR_FILE_PATH, mode='wb', encoding='utf-8', errors='replace') as error_file:
+            error_file.write(response.read())
+        Logger.error("Unexpected response, content has been written in %s" % ERROR_FILE_PATH)
+    except Exception as e:
+        raise Exception('Unexpected HTTP response for export request, and cannot write '
+                        'response content in %s: %s' % (ERROR_FILE_PATH, e))
+    raise Exception('Unexpected HTTP response for export request, response content written in '
+                    '%s' % ERROR_FILE_PATH)
@@ -4,93 +4,274 @@ bgg.xmltocsv
 
 Utility in charge of converting an XML export to CSV
 
+Values are extracted from the items with a table compiled once, lxml is used to parse the
+export when it is installed, it is much faster than the standard library
+
 """
+import xml.etree.ElementTree as ET
 
+try:
+    from lxml import etree as lxml_etree
+except ImportError:
+    lxml_etree = None
 
-class _EmptyNode:
-    def __init__(self):
-        self.text = ''
-        self.attrib = {}
+XML_BACKENDS = ['lxml', 'etree']
+
+# Values extracted from a collection item: CSV column, path of the element from the item ('.'
+# for the item itself), attribute (None for the text of the element), default value when the
+# element or the value is missing, normalizer of the value (name of a XmlToCsv method)
+ITEM_EXTRACTORS = [
+    ('objectname', 'name', None, '', None),
+    ('objectid', '.', 'objectid', None, None),
+    ('rating', 'stats/rating', 'value', None, 'zero_if_na'),
+    ('own', 'status', 'own', '0', None),
+    ('fortrade', 'status', 'fortrade', '0', None),
+    ('want', 'status', 'want', '0', None),
+    ('wanttobuy', 'status', 'wanttobuy', '0', None),
+    ('wanttoplay', 'status', 'wanttoplay', '0', None),
+    ('prevowned', 'status', 'prevowned', '0', None),
+    ('preordered', 'status', 'preordered', '0', None),
+    ('wishlist', 'status', 'wishlist', '0', None),
+    ('wishlistpriority', 'status', 'wishlistpriority', '', None),
+    ('wishlistcomment', 'wishlistcomment', None, '', None),
+    ('comment', 'comment', None, '', None),
+    ('conditiontext', 'conditiontext', None, '', None),
+    ('haspartslist', 'haspartslist', None, '', None),
+    ('wantpartslist', 'wantpartslist', None, '', None),
+    ('publisherid', 'version/publisher', 'publisherid', '', None),
+    ('year', 'version/year', None, '', None),
+    ('imageid', 'version/imageid', 'value', '', None),
+    ('other', 'version/other', None, '', None),
+    ('pricepaid', 'privateinfo', 'pricepaid', '', None),
+    ('pp_currency', 'privateinfo', 'pp_currency', '', None),
+    ('currvalue', 'privateinfo', 'currvalue', '', None),
+    ('cv_currency', 'privateinfo', 'cv_currency', '', None),
+    ('acquisitiondate', 'privateinfo', 'acquisitiondate', '', None),
+    ('acquiredfrom', 'privateinfo', 'acquiredfrom', '', None),
+    ('quantity', 'privateinfo', 'quantity', '', None),
+    ('privatecomment', 'privateinfo/privatecomment', None, '', None),
+    ('_versionid', 'version/item', 'id', '', None),
+    ('collid', '.', 'collid', '', None),
+    ('lastmodified', 'status', 'lastmodified', '', None),
+]
+
+ITEM_COLUMNS = [extractor[0] for extractor in ITEM_EXTRACTORS]
+
+
+class _RowConverter:
+    def __init__(self, columns):
+        """
+        Compiles the extractors of the given columns. Columns without extractor are empty
+
+        :param columns: Columns of the rows, in output order
+        """
+        positions = dict((column, index) for index, column in enumerate(columns))
+        self.defaults = [''] * len(columns)
+        # (index, attribute, normalizer) of the values held by the item itself
+        self.item_values = []
+        # (path, index, attribute, normalizer) of the values held by descendants
+        self.values = []
+        for column, path, attribute, default, normalizer in ITEM_EXTRACTORS:
+            if column not in positions:
+                continue
+            index = positions[column]
+            self.defaults[index] = default
+            if normalizer is not None:
+                normalizer = getattr(XmlToCsv, '_' + normalizer)
+            if path == '.':
+                self.item_values.append((index, attribute, normalizer))
+            else:
+                self.values.append((path, index, attribute, normalizer))
+
+    def _row(self, el):
+        row = list(self.defaults)
+        for index, attribute, normalizer in self.item_values:
+            value = el.get(attribute)
+            if value is not None:
+                row[index] = value if normalizer is None else normalizer(value)
+        return row
 
-    # noinspection PyUnusedLocal
-    def find(self, pattern):
-        return self
 
-    # noinspection PyUnusedLocal
-    def get(self, key):
-        return None
+class _EtreeRowConverter(_RowConverter):
+    def __init__(self, columns):
+        _RowConverter.__init__(self, columns)
+        # Tag of the item child -> (path in the child or None, index, attribute, normalizer),
+        # so that each child is only visited once
+        self.children = {}
+        for path, index, attribute, normalizer in self.values:
+            tag, _, child_path = path.partition('/')
+            self.children.setdefault(tag, []).append(
+                (child_path or None, index, attribute, normalizer))
+
+    def __call__(self, el):
+        row = self._row(el)
+        children = self.children
+        visited = set()
+        for child in el:
+            tag = child.tag
+            # Keep the first element, like find()
+            if tag not in children or tag in visited:
+                continue
+            visited.add(tag)
+            for child_path, index, attribute, normalizer in children[tag]:
+                node = child if child_path is None else child.find(child_path)
+                if node is None:
+                    continue
+                value = node.text if attribute is None else node.get(attribute)
+                if value is not None:
+                    row[index] = value if normalizer is None else normalizer(value)
+        return tuple(row)
+
+
+class _LxmlRowConverter(_RowConverter):
+    def __init__(self, columns):
+        _RowConverter.__init__(self, columns)
+        # All elements holding values are selected at once by an XPath expression, then
+        # dispatched by tag, which is unique among the selected elements
+        paths = []
+        self.tags = {}
+        for path, index, attribute, normalizer in self.values:
+            if path not in paths:
+                paths.append(path)
+            self.tags.setdefault(path.split('/')[-1], []).append((index, attribute, normalizer))
+        self.xpath = lxml_etree.XPath(' | '.join(paths), smart_strings=False) if paths \
+            else lambda el: []
+
+    def __call__(self, el):
+        row = self._row(el)
+        tags = self.tags
+        visited = set()
+        for node in self.xpath(el):
+            tag = node.tag
+            # Keep the first element, like find()
+            if tag in visited:
+                continue
+            visited.add(tag)
+            for index, attribute, normalizer in tags[tag]:
+                value = node.text if attribute is None else node.get(attribute)
+                if value is not None:
+                    row[index] = value if normalizer is None else normalizer(value)
+        return tuple(row)
 
 
 class XmlToCsv:
-    empty_node = _EmptyNode()
-    
+    _converters = {}
+
     def __init__(self):
         pass
 
     @staticmethod
-    def _wrap(node):
-        if node is None:
-            return XmlToCsv.empty_node
-        return node
+    def _zero_if_na(value):
+        if value == 'N/A':
+            return 0
+        return value
+
+    @staticmethod
+    def default_backend():
+        return 'lxml' if lxml_etree is not None else 'etree'
 
     @staticmethod
-    def _to_str(value):
-        if value is None:
-            return ""
-        return str(value) #.encode('utf8')
+    def row_converter(columns, backend=None):
+        """
+        Returns a function converting an item to a tuple of values, compiled once per columns
+
+        :param columns: Columns of the rows, in output order
+        :param backend: 'lxml' or 'etree', the backend which has parsed the items
+        """
+        key = (backend or XmlToCsv.default_backend(), tuple(columns))
+        converter = XmlToCsv._converters.get(key)
+        if converter is None:
+            converter_class = _LxmlRowConverter if key[0] == 'lxml' else _EtreeRowConverter
+            converter = XmlToCsv._converters[key] = converter_class(columns)
+        return converter
 
     @staticmethod
-    def _to_int(value):
-        if value is None:
-            return "0"
-        return value
+    def iterate_tuples(source, columns, subtype=None, backend=None):
+        """
+        Yields the collection items of an XML export as tuples of values, while it is parsed
+
+        :param source: XML export, as a file path or a file object
+        :param columns: Columns of the rows, in output order
+        :param subtype: Only yields the items of this subtype (e.g. 'boardgame') if provided
+        :param backend: 'lxml' or 'etree', lxml if it is installed by default
+        """
+        backend = backend or XmlToCsv.default_backend()
+        convert = XmlToCsv.row_converter(columns, backend)
+        if backend == 'lxml':
+            items = XmlToCsv._iterate_lxml_items(source, subtype)
+        else:
+            items = XmlToCsv.iterate_items(source, subtype)
+        for elem in items:
+            yield convert(elem)
 
     @staticmethod
-    def _zero_if_na(value):
-        if value == 'N/A':
-            return 0
-        return value
+    def iterate_rows(source, subtype=None, backend=None):
+        """
+        Yields the collection items of an XML export as dictionaries, while it is parsed
+
+        :param source: XML export, as a file path or a file object
+        :param subtype: Only yields the items of this subtype (e.g. 'boardgame') if provided
+        :param backend: 'lxml' or 'etree', lxml if it is installed by default
+        """
+        for values in XmlToCsv.iterate_tuples(source, ITEM_COLUMNS, subtype, backend):
+            yield dict(zip(ITEM_COLUMNS, values))
+
+    @staticmethod
+    def iterate_items(source, subtype=None):
+        """
+        Yields the collection items of an XML export while it is parsed. Each item is released
+        once the caller has processed it, so that memory does not grow with the collection size
+
+        :param source: XML export, as a file path or a file object
+        :param subtype: Only yields the items of this subtype (e.g. 'boardgame') if provided
+        """
+        root = None
+        depth = 0
+        for event, elem in ET.iterparse(source, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = elem
+                if elem.tag == 'item':
+                    depth += 1
+                continue
+            if elem.tag != 'item':
+                continue
+            depth -= 1
+            # Items of the versions are nested in collection items
+            if depth:
+                continue
+            if subtype is None or elem.attrib.get('subtype') == subtype:
+                yield elem
+            elem.clear()
+            root.clear()
+
+    @staticmethod
+    def _iterate_lxml_items(source, subtype=None):
+        """
+        lxml counterpart of iterate_items, only reporting events of 'item' elements
+        """
+        depth = 0
+        for event, elem in lxml_etree.iterparse(source, events=('start', 'end'), tag='item',
+                                                resolve_entities=False, huge_tree=True):
+            if event == 'start':
+                depth += 1
+                continue
+            depth -= 1
+            # Items of the versions are nested in collection items
+            if depth:
+                continue
+            if subtype is None or elem.get('subtype') == subtype:
+                yield elem
+            elem.clear()
+            # Also release the previous items, still referenced by the root element
+            parent = elem.getparent()
+            while elem.getprevious() is not None:
+                del parent[0]
 
-    # noinspection PyTypeChecker
     @staticmethod
     def convert_item(el):
+        """
+        Converts an item parsed by the standard library to a dictionary
+        """
         # Language is not exported for custom version!
-    
-        status_atts = XmlToCsv._wrap(el.find('status')).attrib
-        version_el = XmlToCsv._wrap(el.find('version'))
-        private_info_el = XmlToCsv._wrap(el.find('privateinfo'))
-
-        publisher_atts = XmlToCsv._wrap(version_el.find('publisher')).attrib
-    
-        return {
-            'objectname': XmlToCsv._to_str(el.find('name').text),
-            'objectid': el.attrib.get('objectid'),
-            'rating': XmlToCsv._zero_if_na(XmlToCsv._wrap(el.find('stats/rating')).get('value')),
-            'own': XmlToCsv._to_int(status_atts.get('own')),
-            'fortrade': XmlToCsv._to_int(status_atts.get('fortrade')),
-            'want': XmlToCsv._to_int(status_atts.get('want')),
-            'wanttobuy': XmlToCsv._to_int(status_atts.get('wanttobuy')),
-            'wanttoplay': XmlToCsv._to_int(status_atts.get('wanttoplay')),
-            'prevowned': XmlToCsv._to_int(status_atts.get('prevowned')),
-            'preordered': XmlToCsv._to_int(status_atts.get('preordered')),
-            'wishlist': XmlToCsv._to_int(status_atts.get('wishlist')),
-            'wishlistpriority': XmlToCsv._to_str(status_atts.get('wishlistpriority')),
-            'wishlistcomment': XmlToCsv._to_str(XmlToCsv._wrap(el.find('wishlistcomment')).text),
-            'comment': XmlToCsv._to_str(XmlToCsv._wrap(el.find('comment')).text),
-            'conditiontext': XmlToCsv._to_str(XmlToCsv._wrap(el.find('conditiontext')).text),
-            'haspartslist': XmlToCsv._to_str(XmlToCsv._wrap(el.find('haspartslist')).text),
-            'wantpartslist': XmlToCsv._to_str(XmlToCsv._wrap(el.find('wantpartslist')).text),
-            'publisherid': XmlToCsv._to_str(publisher_atts.get('publisherid')),
-            'year': XmlToCsv._to_str(XmlToCsv._wrap(version_el.find('year')).text),
-            'imageid': XmlToCsv._to_str(XmlToCsv._wrap(version_el.find('imageid')).get('value')),
-            'other': XmlToCsv._to_str(XmlToCsv._wrap(version_el.find('other')).text),
-            'pricepaid': XmlToCsv._to_str(private_info_el.get('pricepaid')),
-            'pp_currency': XmlToCsv._to_str(private_info_el.get('pp_currency')),
-            'currvalue': XmlToCsv._to_str(private_info_el.get('currvalue')),
-            'cv_currency': XmlToCsv._to_str(private_info_el.get('cv_currency')),
-            'acquisitiondate': XmlToCsv._to_str(private_info_el.get('acquisitiondate')),
-            'acquiredfrom': XmlToCsv._to_str(private_info_el.get('acquiredfrom')),
-            'quantity': XmlToCsv._to_str(private_info_el.get('quantity')),
-            'privatecomment': XmlToCsv._to_str(private_info_el.find('privatecomment').text),
-            '_versionid': XmlToCsv._to_str(XmlToCsv._wrap(version_el.find('item')).get('id'))
-        }
+        return dict(zip(ITEM_COLUMNS, XmlToCsv.row_converter(ITEM_COLUMNS, 'etree')(el)))
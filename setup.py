@@ -42,6 +42,10 @@ setup(
     install_requires=[
         'selenium', 'docopt'
     ],
+    extras_require={
+        'lxml': ['lxml'],
+        'parquet': ['pyarrow'],
+    },
     keywords='bgg boardgamegeek',
     license='MIT',
     long_description=long_description,
@@ -0,0 +1,404 @@
+"""
+Fake BGG server for the tests and benchmarks
+
+Serves the pages and endpoints used by bggcli from an in-memory collection: login page, game
+pages with the collection edit form, collection save endpoint (values and deletions) and the
+collection export of the XML API, queued (HTTP 202) like BGG does. Commands run against it
+when the BGGCLI_BASE_URL environment variable is set to its URL.
+
+Only the standard library is used, so that the server can be started before bggcli is imported
+"""
+import json
+import threading
+import time
+import uuid
+from xml.sax.saxutils import escape, quoteattr
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from SocketServer import ThreadingMixIn
+    from urlparse import parse_qs, urlparse
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from socketserver import ThreadingMixIn
+    from urllib.parse import parse_qs, urlparse
+
+SESSION_COOKIE_NAME = 'SessionID'
+
+STATUS_FIELDS = ['own', 'prevowned', 'fortrade', 'want', 'wanttoplay', 'wanttobuy', 'wishlist',
+                 'preordered']
+TEXT_FIELDS = ['comment', 'conditiontext', 'wishlistcomment', 'haspartslist', 'wantpartslist']
+PRIVATE_FIELDS = ['pp_currency', 'pricepaid', 'cv_currency', 'currvalue', 'quantity',
+                  'acquisitiondate', 'acquiredfrom', 'privatecomment', 'invlocation']
+VERSION_FIELDS = ['_versionid', 'publisherid', 'imageid', 'year', 'other']
+ITEM_FIELDS = STATUS_FIELDS + TEXT_FIELDS + PRIVATE_FIELDS + VERSION_FIELDS + \
+    ['rating', 'wishlistpriority', 'language']
+
+# Parameters of the save endpoint named differently from the CSV columns
+PARAMETER_FIELDS = {'versionid': '_versionid'}
+
+QUEUED_MESSAGE = '<message>Your request for this collection has been accepted and will be ' \
+                 'processed.  Please try again later for access.</message>'
+
+
+class FakeBgg:
+    def __init__(self, users=None, queued_responses=1, latency=0):
+        """
+        :param users: Accounts as a dictionary (login -> password)
+        :param queued_responses: Number of HTTP 202 responses of a collection export before it
+                                 is available. Counted again after each change of the collection
+        :param latency: Delay added to each response, in seconds
+        """
+        self.users = dict(users or {'bggcli': 'secret'})
+        self.queued_responses = queued_responses
+        self.latency = latency
+        self.lock = threading.Lock()
+        # objectid -> name
+        self.games = {}
+        # collid -> item values, as the CSV columns
+        self.items = {}
+        self.next_collid = 1000
+        # session id -> login
+        self.sessions = {}
+        # Export query -> number of requests since the last change of the collection
+        self.export_requests = {}
+        # Request counts by kind (e.g. 'gamepage', 'save', 'export-queued'...)
+        self.hits = {}
+        self.server = None
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%s' % self.server.server_address[1]
+
+    def start(self):
+        self.server = FakeBggServer(('127.0.0.1', 0), FakeBggHandler)
+        self.server.bgg = self
+        thread = threading.Thread(target=self.server.serve_forever, name='fakebgg')
+        thread.daemon = True
+        thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    # noinspection PyShadowingBuiltins
+    def __exit__(self, type, value, traceback):
+        self.stop()
+
+    def add_games(self, count, first_id=1000):
+        """
+        Adds games to the database, returns their objectids
+        """
+        objectids = [str(objectid) for objectid in range(first_id, first_id + count)]
+        for objectid in objectids:
+            self.games[objectid] = 'Game %s' % objectid
+        return objectids
+
+    def add_item(self, objectid, **values):
+        """
+        Adds a game in the collection, returns the collection item
+        """
+        with self.lock:
+            return self._add_item(objectid, values)
+
+    def _add_item(self, objectid, values):
+        self.games.setdefault(objectid, 'Game %s' % objectid)
+        self.next_collid += 1
+        item = {'collid': str(self.next_collid), 'objectid': objectid}
+        item.update((key, value) for key, value in values.items() if key in ITEM_FIELDS)
+        self.items[item['collid']] = item
+        self.export_requests = {}
+        return item
+
+    def login(self, login, password=None):
+        """
+        Opens a session, returns its id (value of the session cookie). None if the password is
+        wrong
+        """
+        if password is not None and self.users.get(login) != password:
+            return None
+        session_id = uuid.uuid4().hex
+        with self.lock:
+            self.sessions[session_id] = login
+        return session_id
+
+    def find_items(self, objectid):
+        with self.lock:
+            return [item for item in self.items.values() if item['objectid'] == objectid]
+
+    def hit(self, kind):
+        with self.lock:
+            self.hits[kind] = self.hits.get(kind, 0) + 1
+
+    def save(self, objectid, collid, values):
+        """
+        Saves values of a game in the collection, the item is created when the game is not in
+        the collection yet. Returns an error message, None if saved
+        """
+        with self.lock:
+            if collid:
+                item = self.items.get(collid)
+                if item is None:
+                    return 'Invalid collection item'
+            else:
+                items = [item for item in self.items.values() if item['objectid'] == objectid]
+                item = items[0] if items else self._add_item(objectid, {})
+            for key, value in values.items():
+                key = PARAMETER_FIELDS.get(key, key)
+                if key in ITEM_FIELDS:
+                    item[key] = value
+            self.export_requests = {}
+        return None
+
+    def delete(self, collid):
+        with self.lock:
+            if self.items.pop(collid, None) is None:
+                return 'Invalid collection item'
+            self.export_requests = {}
+        return None
+
+    def export(self, query, session_login):
+        """
+        Returns the HTTP code and the body of a collection export
+        """
+        login = query.get('username')
+        with self.lock:
+            count = self.export_requests.get(tuple(sorted(query.items())), 0) + 1
+            self.export_requests[tuple(sorted(query.items()))] = count
+            if count <= self.queued_responses:
+                return 202, QUEUED_MESSAGE
+            if login not in self.users:
+                return 200, '<errors><error><message>Invalid username specified</message>' \
+                            '</error></errors>'
+            subtype = query.get('subtype', 'boardgame')
+            items = sorted(self.items.values(), key=lambda item: int(item['collid'])) \
+                if subtype == 'boardgame' else []
+            private = query.get('showprivate') == '1' and session_login == login
+            brief = query.get('brief') == '1'
+            content = [export_item(item, self.games[item['objectid']], private, brief)
+                       for item in items]
+        return 200, '<items totalitems="%s" termsofuse="https://boardgamegeek.com/xmlapi/' \
+                    'termsofuse">%s</items>' % (len(content), ''.join(content))
+
+
+class FakeBggServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+def export_item(item, name, private, brief):
+    """
+    Returns the XML element of a collection item, as exported by the XML API
+    """
+    status = ''.join(' %s="%s"' % (key, item.get(key) or '0') for key in STATUS_FIELDS)
+    if item.get('wishlist') == '1':
+        status += ' wishlistpriority="%s"' % (item.get('wishlistpriority') or '3')
+    parts = ['<item objecttype="thing" objectid="%s" subtype="boardgame" collid="%s">'
+             % (item['objectid'], item['collid']),
+             '<name sortindex="1">%s</name>' % escape(name),
+             '<status%s lastmodified="2018-01-01 00:00:00"/>' % status]
+    if not brief:
+        parts.append('<stats><rating value=%s/></stats>' % quoteattr(item.get('rating') or 'N/A'))
+        parts.extend('<%s>%s</%s>' % (key, escape(item[key]), key) for key in TEXT_FIELDS
+                     if item.get(key))
+        if private:
+            attributes = ''.join(' %s=%s' % (key, quoteattr(item[key]))
+                                 for key in PRIVATE_FIELDS if item.get(key)
+                                 and key not in ('privatecomment', 'invlocation'))
+            parts.append('<privateinfo%s><privatecomment>%s</privatecomment></privateinfo>'
+                         % (attributes, escape(item.get('privatecomment', ''))))
+        if item.get('_versionid'):
+            parts.append('<version><item type="boardgameversion" id=%s/></version>'
+                         % quoteattr(item['_versionid']))
+    parts.append('</item>')
+    return ''.join(parts)
+
+
+def page(body, login=None):
+    """
+    Returns a page with the header of BGG: the user menu is only shown to logged in users
+    """
+    header = ''
+    if login is not None:
+        header = '<ul class="dropdown-menu"><li><a href="/user/%s">%s</a></li></ul>' \
+                 '<span show-access="admin_login"></span>' % (login, escape(login))
+    return '<!DOCTYPE html><html><head><title>BoardGameGeek</title></head><body>%s%s' \
+           '</body></html>' % (header, body)
+
+
+LOGIN_FORM = '<table class="forum_table"><tr><td><form method="post" action="/login">' \
+             '<input id="username" name="username" type="text">' \
+             '<input id="password" name="password" type="password">' \
+             '<input type="Submit" value="Sign In"></form></td></tr></table>'
+
+
+def game_page(objectid, name, item):
+    """
+    Returns a game page, with the collection toolbar and the edit form used by GamePage
+    """
+    item = item or {}
+    if item.get('collid'):
+        toolbar = '<button id="button-collection" type="button"><span ng-show="colltoolbarctrl' \
+                  '.collection.items.length">In Collection</span></button>' \
+                  '<span class="collection-dropdown-item-edit"><button type="button">Edit' \
+                  '</button></span>'
+    else:
+        toolbar = '<button type="button" ng-click="colltoolbarctrl.editItem({objectid: %s})">' \
+                  'Add to Collection</button>' % objectid
+
+    fields = ['<input type="hidden" name="objectid" value="%s">' % objectid,
+              '<input type="hidden" name="collid" value="%s">' % item.get('collid', '')]
+    # First list of the form: versions
+    fields.append('<ul>%s</ul>' % ''.join(
+        '<li><input type="radio" name="_versionid" value="%s"%s></li>'
+        % (version, ' checked' if item.get('_versionid') == version else '')
+        for version in (objectid + '1', objectid + '2')))
+    fields.extend('<label><input type="checkbox" ng-model="item.status.%s" name="%s" value="1"'
+                  '%s>%s</label>' % (key, key, ' checked' if item.get(key) == '1' else '', key)
+                  for key in STATUS_FIELDS)
+    fields.append('<select ng-model="item.wishlistpriority" name="wishlistpriority">%s</select>'
+                  % ''.join('<option value="%s"%s>%s</option>'
+                            % (priority, ' selected' if item.get('wishlistpriority') ==
+                               str(priority) else '', priority) for priority in range(1, 6)))
+    fields.append('<i class="glyphicon fi-star"></i><input type="text" name="rating" '
+                  'ng-model="editctrl.editdata.item.rating" value=%s>'
+                  % quoteattr(item.get('rating', '')))
+    fields.extend('<textarea id="%s" name="%s">%s</textarea>'
+                  % (key, key, escape(item.get(key, ''))) for key in TEXT_FIELDS)
+    fields.append('<a class="toggler-caret" ng-click="editctrl.showvars.showAdvanced = '
+                  '!editctrl.showvars.showAdvanced">Advanced</a>')
+    fields.extend('<input id="%s" name="%s" type="text" value=%s>'
+                  % (key, key, quoteattr(item.get(key, ''))) for key in PRIVATE_FIELDS
+                  if key not in ('pp_currency', 'cv_currency'))
+    fields.append('<a class="toggler-caret" ng-click="editctrl.showvars.showCustom = '
+                  '!editctrl.showvars.showCustom">Customize Game Info</a>'
+                  '<input type="text" name="customname" '
+                  'ng-model="editctrl.editdata.item.textfield.customname.value">')
+    fields.extend('<input id="%s" name="%s" type="text" value=%s>'
+                  % ('customimage' if key == 'imageid' else key, key,
+                     quoteattr(item.get(key, ''))) for key in VERSION_FIELDS[1:])
+    fields.append('<button type="button" uib-tooltip="More options">...</button>'
+                  '<button type="submit" name="action" value="delete" '
+                  'ng-click="editctrl.deleteItem(editctrl.editdata.item)">Delete from '
+                  'Collection</button>'
+                  '<button type="submit">Save</button>')
+    return '<h1>%s</h1><div class="toolbar-actions">%s</div><div class="modal-content">' \
+           '<form name="collectioneditorform" method="post" action="/geekcollection.php">%s' \
+           '</form></div>' % (escape(name), toolbar, ''.join(fields))
+
+
+class FakeBggHandler(BaseHTTPRequestHandler):
+    @property
+    def bgg(self):
+        return self.server.bgg
+
+    def session_login(self):
+        for cookie in (self.headers.get('Cookie') or '').split(';'):
+            name, _, value = cookie.strip().partition('=')
+            if name == SESSION_COOKIE_NAME:
+                return self.bgg.sessions.get(value)
+        return None
+
+    def respond(self, code, body, content_type='text/html; charset=utf-8', headers=None):
+        if self.bgg.latency:
+            time.sleep(self.bgg.latency)
+        data = body.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def redirect(self, location, headers=None):
+        headers = dict(headers or {})
+        headers['Location'] = location
+        self.respond(303, '', headers=headers)
+
+    def form(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length).decode('utf-8')
+        return dict((key, values[0]) for key, values
+                    in parse_qs(body, keep_blank_values=True).items())
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        login = self.session_login()
+        if url.path == '/login':
+            self.bgg.hit('login-page')
+            self.respond(200, page('' if login else LOGIN_FORM, login))
+        elif url.path == '/robots.txt':
+            self.respond(200, 'User-agent: *\n', 'text/plain')
+        elif url.path.startswith('/boardgame/'):
+            self.bgg.hit('gamepage')
+            objectid = url.path.split('/')[2]
+            if objectid not in self.bgg.games:
+                self.respond(404, page('<h1>Not found</h1>', login))
+                return
+            items = self.bgg.find_items(objectid) if login else []
+            self.respond(200, page(game_page(objectid, self.bgg.games[objectid],
+                                             items[0] if items else None), login))
+        elif url.path == '/xmlapi2/collection':
+            query = dict((key, values[0]) for key, values in parse_qs(url.query).items())
+            code, body = self.bgg.export(query, login)
+            self.bgg.hit('export-queued' if code == 202 else 'export')
+            self.respond(code, '<?xml version="1.0" encoding="utf-8" standalone="yes"?>' + body,
+                         'text/xml; charset=utf-8')
+        else:
+            self.respond(404, page('<h1>Not found</h1>', login))
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        values = self.form()
+        if url.path == '/login':
+            session_id = self.bgg.login(values.get('username'), values.get('password'))
+            if session_id is None:
+                self.respond(200, page('<p>Invalid username or password</p>' + LOGIN_FORM))
+                return
+            self.redirect('/login', {'Set-Cookie': '%s=%s; Path=/' % (SESSION_COOKIE_NAME,
+                                                                       session_id)})
+        elif url.path == '/geekcollection.php':
+            self.post_collection(values)
+        else:
+            self.respond(404, '')
+
+    def post_collection(self, values):
+        if self.session_login() is None:
+            self.bgg.hit('save-rejected')
+            self.respond(200, json.dumps({'error': 'You must login to save items'}),
+                         'application/json')
+            return
+
+        if values.get('ajax') == '1':
+            # Requests of the edit form scripts, see CollectionClient
+            self.bgg.hit(values.get('action'))
+            if values.get('action') == 'delete':
+                error = self.bgg.delete(values.get('collid'))
+            else:
+                error = self.bgg.save(values.get('objectid'), values.get('collid'),
+                                      dict((key, value) for key, value in values.items()
+                                           if key not in ('ajax', 'action', 'objecttype',
+                                                          'objectid', 'fieldname', 'collid')))
+            self.respond(200, json.dumps({'error': error} if error else {}), 'application/json')
+            return
+
+        # Edit form submitted by the web browser: unchecked checkboxes are not sent
+        objectid = values.get('objectid')
+        if values.get('action') == 'delete':
+            self.bgg.hit('delete')
+            self.bgg.delete(values.get('collid'))
+        else:
+            self.bgg.hit('savedata')
+            for key in STATUS_FIELDS:
+                values.setdefault(key, '0')
+            self.bgg.save(objectid, values.get('collid'),
+                          dict((key, value) for key, value in values.items()
+                               if key in ITEM_FIELDS))
+        self.redirect('/boardgame/%s' % objectid)
+
+    # noinspection PyShadowingBuiltins
+    def log_message(self, format, *args):
+        pass
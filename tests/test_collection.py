@@ -1,29 +1,36 @@
 import csv
+import gzip
+import shutil
+
+import pytest
+
 from bggcli.commands import collection_export
 
 from bggcli.main import _main
 from bggcli.ui.collectionpage import CollectionPage
 from bggcli.util.webdriver import WebDriver
+from bggcli.util.xmlapi import TeeReader
+from bggcli.util.xmltocsv import XmlToCsv
 from commons import *
 
 
 def compare_csv_files(file_actual, file_expected):
-    reader_actual = csv.DictReader(open(file_actual, 'rU'))
-    reader_expected = csv.DictReader(open(file_expected, 'rU'))
+    reader_actual = csv.DictReader(open(file_actual))
+    reader_expected = csv.DictReader(open(file_expected))
 
     index = 1
     for row_actual in reader_actual:
-        row_expected = reader_expected.next()
+        row_expected = next(reader_expected)
         for col in CSV_COLUMN_TO_IGNORE:
-            del row_actual[col]
-            del row_expected[col]
+            row_actual.pop(col, None)
+            row_expected.pop(col, None)
         assert row_actual == row_expected, \
             'Values are not the expected ones at line %s in %s!\n* Expected: %s\n* Actual: %s' \
             % (index, file_actual, row_expected, row_actual)
         index += 1
 
     try:
-        reader_expected.next()
+        next(reader_expected)
         assert False, "Expected file has more lines than the actual one!"
     except StopIteration:
         pass
@@ -36,6 +43,9 @@ def test_collection(tmpdir):
 
     debug_test()
     debug_test("End-to-end test is executed in %s" % tmpdir)
+    # Commands write files aside the CSV file (e.g. the import journal), use a copy
+    csv_file = tmpdir.join('collection.csv').strpath
+    shutil.copy(COLLECTION_CSV_PATH, csv_file)
 
     #
     debug_test()
@@ -44,7 +54,7 @@ def test_collection(tmpdir):
         if not CollectionPage(web_driver.driver).is_empty(LOGIN):
             try:
                 _main(['-v', '--login', LOGIN, '--password', PASSWORD,
-                      'collection-delete', '--force', COLLECTION_CSV_PATH])
+                      'collection-delete', '--force', csv_file])
             except BaseException as e:
                 assert False, "Delete command should not fail: %s" % e
 
@@ -56,7 +66,7 @@ def test_collection(tmpdir):
     debug_test()
     debug_test("2. Import collection")
     _main(['-v', '--login', LOGIN, '--password', PASSWORD,
-          'collection-import', COLLECTION_CSV_PATH])
+          'collection-import', csv_file])
     debug_test("-> [ok]")
 
     #
@@ -83,3 +93,73 @@ def test_export_xml_to_csv(tmpdir):
     generated_csv_file = tmpdir.join('xml-converted.csv').strpath
     collection_export.write_csv(COLLECTION_XML_PATH, generated_csv_file)
     compare_csv_files(generated_csv_file, COLLECTION_CSV_PATH)
+
+
+def test_export_streamed_to_gzip_xml_file(tmpdir):
+    csv_file = tmpdir.join('exported.csv').strpath
+    xml_file_path, xml_file = collection_export.open_xml_file(csv_file, compress=True)
+    with open(COLLECTION_XML_PATH, 'rb') as response:
+        source = TeeReader(response, xml_file)
+        collection_export.write_csv(source, csv_file)
+        source.drain()
+    xml_file.close()
+
+    compare_csv_files(csv_file, COLLECTION_CSV_PATH)
+    assert xml_file_path == tmpdir.join('exported.xml.gz').strpath
+    with gzip.open(xml_file_path) as saved, open(COLLECTION_XML_PATH, 'rb') as expected:
+        assert saved.read() == expected.read()
+
+
+def test_items_released_once_processed():
+    items = []
+    for elem in XmlToCsv.iterate_items(COLLECTION_XML_PATH):
+        # Nested version items are part of their collection item
+        assert elem.attrib.get('subtype') == 'boardgame'
+        items.append((XmlToCsv.convert_item(elem)['_versionid'], elem))
+
+    assert [versionid for versionid, _ in items] == ['107117', '']
+    items = [elem for _, elem in items]
+    assert all(len(elem) == 0 and not elem.attrib for elem in items)
+
+
+def test_export_merged_subtypes(tmpdir):
+    merged_csv_file = tmpdir.join('merged.csv').strpath
+    collection_export.write_merged_csv([('boardgame', COLLECTION_XML_PATH, None),
+                                        ('boardgameexpansion', COLLECTION_XML_PATH, None)],
+                                       merged_csv_file)
+
+    rows = list(csv.DictReader(open(merged_csv_file)))
+    assert [row.pop('subtype') for row in rows] == ['boardgame'] * 2 + ['boardgameexpansion'] * 2
+    expected = list(csv.DictReader(open(COLLECTION_CSV_PATH)))
+    for row_actual, row_expected in zip(rows, expected * 2):
+        for col in CSV_COLUMN_TO_IGNORE:
+            row_actual.pop(col, None)
+            row_expected.pop(col, None)
+        assert row_actual == row_expected
+
+
+def test_export_parameters():
+    assert collection_export.export_parameters('boardgame', ['boardgame']) == {}
+    assert collection_export.export_parameters('boardgame', ['boardgame', 'boardgameexpansion']) \
+        == {'subtype': 'boardgame', 'excludesubtype': 'boardgameexpansion'}
+    assert collection_export.export_parameters('rpgitem', ['boardgame', 'rpgitem']) \
+        == {'subtype': 'rpgitem'}
+    assert collection_export.get_subtypes({'export-subtypes': 'rpgitem, boardgame,rpgitem'}) \
+        == ['rpgitem', 'boardgame']
+
+
+@pytest.mark.skipif(XmlToCsv.default_backend() != 'lxml', reason='lxml is not installed')
+def test_lxml_backend_same_rows():
+    with open(COLLECTION_XML_PATH, 'rb') as source:
+        lxml_rows = list(XmlToCsv.iterate_rows(source, 'boardgame', backend='lxml'))
+    assert lxml_rows == list(XmlToCsv.iterate_rows(COLLECTION_XML_PATH, 'boardgame',
+                                                   backend='etree'))
+
+
+def test_row_converter_columns():
+    convert = XmlToCsv.row_converter(['_versionid', 'invlocation', 'objectid', 'own'], 'etree')
+    assert convert is XmlToCsv.row_converter(['_versionid', 'invlocation', 'objectid', 'own'],
+                                             'etree')
+    rows = [convert(elem) for elem in XmlToCsv.iterate_items(COLLECTION_XML_PATH)]
+    # Values in column order, empty when there is no extractor
+    assert rows == [('107117', '', '68448', '1'), ('', '', '4098', '0')]
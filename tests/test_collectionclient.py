@@ -0,0 +1,110 @@
+import threading
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from urlparse import parse_qs
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from urllib.parse import parse_qs
+
+from commons import *
+from bggcli.commands import collection_delete
+from bggcli.util.collectionclient import CollectionClient
+from bggcli.util.collectionsnapshot import CollectionSnapshot
+from bggcli.util.httpclient import HttpClient
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    posted = []
+    response = b'{}'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length'])).decode('utf-8')
+        StubHandler.posted.append((self.path, self.headers['Cookie'],
+                                   dict((k, v[0]) for k, v in parse_qs(body).items())))
+        self.send_response(200)
+        self.end_headers()
+        self.wfile.write(StubHandler.response)
+
+    # noinspection PyShadowingBuiltins
+    def log_message(self, format, *args):
+        pass
+
+
+def start_stub_server():
+    StubHandler.posted = []
+    StubHandler.response = b'{}'
+    server = HTTPServer(('127.0.0.1', 0), StubHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def create_client(server):
+    return CollectionClient(HttpClient({'SessionID': 'abc'},
+                                       base_url='http://127.0.0.1:%s' % server.server_port))
+
+
+def test_update_posts_groups():
+    server = start_stub_server()
+    try:
+        row = {'objectid': '68448', 'objectname': '7 Wonders', 'own': '1', 'wishlist': '0',
+               'wishlistpriority': '3', 'rating': '9', 'comment': 'Some comment',
+               'pricepaid': '35', '_versionid': '107117'}
+        assert create_client(server).update(row)
+
+        posted = dict((data['fieldname'], data) for _, _, data in StubHandler.posted)
+        assert sorted(posted) == ['comment', 'privateinfo', 'rating', 'status', 'version']
+        assert all(path == '/geekcollection.php' for path, _, _ in StubHandler.posted)
+        assert all(cookie == 'SessionID=abc' for _, cookie, _ in StubHandler.posted)
+        assert posted['status']['objectid'] == '68448'
+        assert posted['status']['own'] == '1'
+        # Not applicable since the game is not in wishlist
+        assert 'wishlistpriority' not in posted['status']
+        assert posted['version']['versionid'] == '107117'
+    finally:
+        server.shutdown()
+
+
+def test_update_rejected():
+    server = start_stub_server()
+    try:
+        StubHandler.response = b'{"error": "Invalid item"}'
+        assert not create_client(server).update({'objectid': '1', 'comment': 'x'})
+    finally:
+        server.shutdown()
+
+
+def test_supports():
+    assert CollectionClient.supports({'objectid': '1', 'language': ''})
+    assert not CollectionClient.supports({'objectid': '1', 'language': 'French'})
+
+
+def test_http_delete():
+    server = start_stub_server()
+    try:
+        snapshot = CollectionSnapshot.parse(COLLECTION_XML_PATH)
+        rows = [{'objectid': '68448', 'objectname': '7 Wonders'},
+                {'objectid': '1', 'objectname': 'Not in collection'},
+                {'objectid': '4098', 'objectname': 'Age of Steam'},
+                {'objectid': '4098', 'objectname': 'Age of Steam, second copy'},
+                {'objectid': '42', 'collid': '123'}]
+
+        report = collection_delete.http_delete(rows, snapshot, create_client(server),
+                                               worker_count=3)
+
+        assert (report.total, report.done, report.failed) == (3, 3, [])
+        assert all(data['action'] == 'delete' for _, _, data in StubHandler.posted)
+        assert sorted(data['collid'] for _, _, data in StubHandler.posted) == \
+            ['123', '29121959', '29122015']
+    finally:
+        server.shutdown()
+
+
+def test_delete_rejected():
+    server = start_stub_server()
+    try:
+        StubHandler.response = b'{"error": "Invalid item"}'
+        assert not create_client(server).delete('123')
+    finally:
+        server.shutdown()
@@ -0,0 +1,33 @@
+from commons import *
+from bggcli.util.collectionmembership import CollectionMembership, MembershipLoader
+
+
+def test_parse():
+    membership = CollectionMembership.parse(COLLECTION_XML_PATH)
+
+    assert len(membership) == 2
+    assert '68448' in membership
+    assert '1' not in membership
+    assert membership.collid('4098') == '29122015'
+    assert membership.collid('1') is None
+
+
+
+def test_loader(monkeypatch):
+    loads = []
+
+    def load(login, cookies=None, options=None):
+        loads.append(login)
+        return CollectionMembership([('68448', '1')])
+
+    monkeypatch.setattr(CollectionMembership, 'load', staticmethod(load))
+
+    loader = MembershipLoader('bggcli')
+    assert list(loader.rows(iter([]))) == []
+    assert loads == [] and loader.membership is None
+
+    rows = loader.rows(iter([{'objectid': '68448'}, {'objectid': '4098'}]))
+    assert next(rows) == {'objectid': '68448'}
+    assert '68448' in loader.membership
+    assert list(rows) == [{'objectid': '4098'}]
+    assert loads == ['bggcli']
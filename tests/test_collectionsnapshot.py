@@ -0,0 +1,42 @@
+import csv
+
+from bggcli.util.collectionsnapshot import CollectionSnapshot
+from commons import *
+
+
+def read_rows():
+    with open(COLLECTION_CSV_PATH) as csv_file:
+        return list(csv.DictReader(csv_file))
+
+
+def test_unchanged_rows_skipped():
+    snapshot = CollectionSnapshot.parse(COLLECTION_XML_PATH)
+    rows = read_rows()
+
+    assert len(snapshot) == 2
+    assert snapshot.diff(rows[0]) is None
+    # Language is not provided by the XML API, it can't be checked
+    assert snapshot.diff(rows[1]) == {'objectid': '4098', 'objectname': 'Age of Steam',
+                                      '_versionid': '', 'language': 'French'}
+
+
+def test_changed_values_with_dependencies():
+    snapshot = CollectionSnapshot.parse(COLLECTION_XML_PATH)
+    row = read_rows()[1]
+    row['language'] = ''
+    row['wishlistpriority'] = '1'
+    row['pricepaid'] = '12.50'
+
+    assert snapshot.diff(row) == {'objectid': '4098', 'objectname': 'Age of Steam',
+                                  '_versionid': '', 'wishlist': '1', 'wishlistpriority': '1',
+                                  'pricepaid': '12.50'}
+
+
+def test_new_game_or_version_kept():
+    snapshot = CollectionSnapshot.parse(COLLECTION_XML_PATH)
+    row = read_rows()[0]
+    row['_versionid'] = '1234'
+    assert snapshot.diff(row) is row
+
+    row = {'objectid': '1', 'objectname': 'Not in collection', 'own': '1'}
+    assert snapshot.diff(row) is row
@@ -0,0 +1,59 @@
+import pytest
+
+from commons import *
+from bggcli.commands import collection_export
+from bggcli.commands.collection_sync import modified_since_parameter
+from bggcli.util.collectionstore import CollectionStore, STORE_COLUMNS
+from bggcli.util.exportwriter import open_export_writer
+from bggcli.util.xmltocsv import XmlToCsv
+
+
+def read_items(xml):
+    return XmlToCsv.iterate_tuples(xml, STORE_COLUMNS, 'boardgame')
+
+
+def test_full_sync_and_export(tmpdir):
+    store_path = tmpdir.join('collection.sqlite').strpath
+    with CollectionStore(store_path).open('Login') as store:
+        assert store.watermark() is None
+        assert store.upsert(read_items(COLLECTION_XML_PATH), full=True) == 2
+        assert store.watermark() == '2015-07-04 20:21:27'
+        assert modified_since_parameter(store.watermark()) == '15-07-04 20:21:27'
+
+        # Export from the store is the same as a direct export
+        store_csv = tmpdir.join('store.csv')
+        with open_export_writer(store_csv.strpath, collection_export.CSV_EXPORT_FIELDS) as writer:
+            writer.write_rows(store.rows(collection_export.CSV_EXPORT_FIELDS))
+        export_csv = tmpdir.join('export.csv')
+        collection_export.write_csv(COLLECTION_XML_PATH, export_csv.strpath)
+        assert store_csv.read() == export_csv.read()
+
+
+def test_incremental_sync(tmpdir):
+    store_path = tmpdir.join('collection.sqlite').strpath
+    with CollectionStore(store_path).open('login') as store:
+        store.upsert(read_items(COLLECTION_XML_PATH), full=True)
+
+    # Only the modified game is returned by BGG
+    with open(COLLECTION_XML_PATH) as xml_file:
+        content = xml_file.read()
+    modified_xml = tmpdir.join('modified.xml')
+    modified_xml.write(content[:content.index('    <item ')]
+                       + content[content.index('    <item objecttype="thing" objectid="4098"'):]
+                       .replace('wishlistpriority="3"', 'wishlistpriority="5"')
+                       .replace('lastmodified="2015-07-04 18:05:18"',
+                                'lastmodified="2015-07-06 10:00:00"'))
+
+    with CollectionStore(store_path).open('Login') as store:
+        assert store.upsert(read_items(modified_xml.strpath)) == 1
+        assert len(store) == 2
+        assert store.watermark() == '2015-07-06 10:00:00'
+        assert list(store.rows(['objectid', 'wishlistpriority'])) == [('68448', ''),
+                                                                     ('4098', '5')]
+
+
+def test_store_of_another_login(tmpdir):
+    store_path = tmpdir.join('collection.sqlite').strpath
+    CollectionStore(store_path).open('login1').close()
+    with pytest.raises(SystemExit):
+        CollectionStore(store_path).open('login2')
@@ -0,0 +1,95 @@
+import csv
+import pytest
+
+from commons import *
+from bggcli.util.csvreader import CsvReader
+
+
+def test_read_resource_file():
+    expected = list(csv.DictReader(open(COLLECTION_CSV_PATH)))
+
+    reader = CsvReader(COLLECTION_CSV_PATH)
+    reader.open()
+
+    assert reader.rowCount == len(expected)
+    assert list(reader.rows()) == expected
+    # Random access, without parsing previous rows
+    assert reader.row_at(len(expected) - 1) == expected[-1]
+    reader.close()
+
+
+def test_multiline_values(tmpdir):
+    file_path = tmpdir.join('collection.csv')
+    file_path.write_binary(b'\xef\xbb\xbfobjectid,objectname,comment\r\n'
+                           b'1,Game 1,"First line\r\nSecond ""line"""\r\n'
+                           b'\r\n'
+                           b'2,Game 2\r\n')
+
+    reader = CsvReader(file_path.strpath)
+    reader.open()
+
+    assert reader.rowCount == 2
+    assert list(reader.line_numbers) == [2, 5]
+    assert reader.row_at(0)['comment'] == 'First line\r\nSecond "line"'
+    assert reader.row_at(1) == {'objectid': '2', 'objectname': 'Game 2', 'comment': None}
+    reader.close()
+
+
+def test_stray_quote(tmpdir):
+    file_path = tmpdir.join('collection.csv')
+    file_path.write('objectid,objectname,comment\n1,Game 1,7" box\n2,Game 2,\n3,Game 3,ok\n')
+
+    reader = CsvReader(file_path.strpath)
+    reader.open()
+
+    assert list(reader.rows()) == list(csv.DictReader(open(file_path.strpath)))
+    assert list(reader.line_numbers) == [2, 3, 4]
+    assert reader.row_at(0)['comment'] == '7" box'
+    reader.close()
+
+
+def test_invalid_objectid(tmpdir):
+    file_path = tmpdir.join('collection.csv')
+    file_path.write('objectid,objectname\n1,Game 1\nabc,Game 2\n')
+
+    reader = CsvReader(file_path.strpath)
+    with pytest.raises(SystemExit):
+        reader.open()
+    reader.close()
+
+
+def test_rows_without_objectid(tmpdir):
+    file_path = tmpdir.join('collection.csv')
+    file_path.write('objectid,objectname\n1,Game 1\n,Game 2\n')
+
+    reader = CsvReader(file_path.strpath)
+    with pytest.raises(SystemExit):
+        reader.open()
+    reader.close()
+
+    reader = CsvReader(file_path.strpath)
+    reader.open(resolve_names=True)
+    assert (reader.rowCount, reader.unresolvedCount) == (2, 1)
+    assert [row['objectname'] for row in reader.rows()] == ['Game 1', 'Game 2']
+    reader.close()
+
+
+def test_resolve_names_without_name_column(tmpdir):
+    file_path = tmpdir.join('collection.csv')
+    file_path.write('objectid,rating\n1,7\n2,8\n')
+
+    reader = CsvReader(file_path.strpath)
+    reader.open(resolve_names=True)
+    assert (reader.rowCount, reader.unresolvedCount) == (2, 0)
+    assert [row['objectid'] for row in reader.rows()] == ['1', '2']
+    reader.close()
+
+
+def test_csv_error(tmpdir):
+    file_path = tmpdir.join('collection.csv')
+    file_path.write_binary(b'objectid,objectname\n1,Game\r1\n')
+
+    reader = CsvReader(file_path.strpath)
+    with pytest.raises(SystemExit):
+        reader.open()
+    reader.close()
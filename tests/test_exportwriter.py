@@ -0,0 +1,73 @@
+import json
+import sqlite3
+
+import pytest
+
+from commons import *
+from bggcli.commands import collection_export
+from bggcli.util.exportwriter import get_export_format
+from bggcli.util.logger import Logger
+
+
+def test_export_format():
+    assert get_export_format('collection.csv') == 'csv'
+    assert get_export_format('collection.JSONL') == 'jsonl'
+    assert get_export_format('collection.db') == 'sqlite'
+    assert get_export_format('-') == 'csv'
+    assert get_export_format('collection.csv', 'parquet') == 'parquet'
+    with pytest.raises(SystemExit):
+        get_export_format('collection.csv', 'xls')
+
+
+def test_json_lines_to_stdout(capfd):
+    Logger.toStderr = True
+    try:
+        Logger.info('Exporting...')
+        collection_export.write_csv(COLLECTION_XML_PATH, '-', export_format='jsonl')
+    finally:
+        Logger.toStderr = False
+
+    out, err = capfd.readouterr()
+    rows = [json.loads(line) for line in out.splitlines()]
+    assert 'Exporting...' in err
+    assert [row['objectid'] for row in rows] == [68448, 4098]
+    assert rows[0]['objectname'] == '7 Wonders'
+    assert rows[0]['rating'] == 9.0
+    assert rows[0]['own'] == 1
+    assert rows[0]['pp_currency'] == 'USD'
+    # Empty numbers
+    assert rows[1]['_versionid'] is None
+
+
+def test_sqlite(tmpdir):
+    db_path = tmpdir.join('collection.sqlite').strpath
+    for _ in range(2):
+        # Previous export is replaced
+        collection_export.write_csv(COLLECTION_XML_PATH, db_path)
+
+    connection = sqlite3.connect(db_path)
+    try:
+        assert connection.execute(
+            'SELECT objectid, typeof(objectid), rating, typeof(rating), objectname '
+            'FROM collection ORDER BY objectid').fetchall() \
+            == [(4098, 'integer', 0.0, 'real', 'Age of Steam'),
+                (68448, 'integer', 9.0, 'real', '7 Wonders')]
+        assert connection.execute("SELECT name FROM sqlite_master WHERE type = 'index'") \
+            .fetchall() == [('collection_objectid',)]
+    finally:
+        connection.close()
+
+
+def test_sqlite_to_stdout_rejected():
+    with pytest.raises(SystemExit):
+        collection_export.write_csv(COLLECTION_XML_PATH, '-', export_format='sqlite')
+
+
+def test_parquet(tmpdir):
+    pq = pytest.importorskip('pyarrow.parquet')
+    parquet_path = tmpdir.join('collection.parquet').strpath
+    collection_export.write_csv(COLLECTION_XML_PATH, parquet_path)
+
+    table = pq.read_table(parquet_path)
+    assert table.column('objectid').to_pylist() == [68448, 4098]
+    assert table.column('objectname').to_pylist() == ['7 Wonders', 'Age of Steam']
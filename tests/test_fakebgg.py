@@ -0,0 +1,113 @@
+import csv
+import os
+import subprocess
+import sys
+try:
+    from urllib2 import Request
+except ImportError:
+    from urllib.request import Request
+
+from commons import *
+from fakebgg import FakeBgg
+from bggcli.commands import collection_delete
+from bggcli.util.collectionclient import CollectionClient
+from bggcli.util.collectionmembership import CollectionMembership
+from bggcli.util.collectionsnapshot import CollectionSnapshot
+from bggcli.util.httpclient import HttpClient
+from bggcli.util.sessioncache import SessionCache
+from bggcli.util.xmlapi import PollingSchedule, fetch
+
+ROOT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def export_request(bgg, session_id=None, **params):
+    query = '&'.join('%s=%s' % item for item in sorted(params.items()))
+    headers = {'Cookie': 'SessionID=%s' % session_id} if session_id else {}
+    return Request('%s/xmlapi2/collection?username=bggcli&%s' % (bgg.url, query),
+                   headers=headers)
+
+
+def test_export_queued():
+    with FakeBgg(queued_responses=2) as bgg:
+        for objectid in bgg.add_games(3):
+            bgg.add_item(objectid, own='1')
+        schedule = PollingSchedule(interval=0.01, jitter=0)
+        response = fetch(export_request(bgg, brief=1), schedule)
+        try:
+            membership = CollectionMembership.parse(response)
+        finally:
+            response.close()
+
+    assert schedule.attempts == 3
+    assert bgg.hits['export-queued'] == 2
+    assert len(membership) == 3
+    assert '1000' in membership
+
+
+def test_http_update_and_delete():
+    with FakeBgg(queued_responses=0) as bgg:
+        bgg.add_games(2)
+        session_id = bgg.login('bggcli', 'secret')
+        http_client = HttpClient({'SessionID': session_id}, base_url=bgg.url)
+        assert http_client.is_authenticated('bggcli')
+        assert not HttpClient(base_url=bgg.url).is_authenticated('bggcli')
+
+        client = CollectionClient(http_client)
+        assert client.update({'objectid': '1000', 'objectname': 'Game 1000', 'own': '1',
+                              'rating': '8', 'pricepaid': '12', 'privatecomment': 'Gift'})
+        assert client.update({'objectid': '1001', 'objectname': 'Game 1001', 'wishlist': '1',
+                              'wishlistpriority': '2'})
+
+        response = fetch(export_request(bgg, session_id, showprivate=1, stats=1))
+        try:
+            snapshot = CollectionSnapshot.parse(response)
+        finally:
+            response.close()
+        item = snapshot.find({'objectid': '1000'})
+        assert (item['own'], item['rating'], item['pricepaid'], item['privatecomment']) == \
+            ('1', '8', '12', 'Gift')
+        assert snapshot.find({'objectid': '1001'})['wishlistpriority'] == '2'
+
+        report = collection_delete.http_delete([{'objectid': '1000'}, {'objectid': '1001'}],
+                                               snapshot, client, 2)
+        assert report.done == 2
+        assert not bgg.items
+        assert not client.delete('1')
+
+
+def run_command(bgg, tmpdir, *args):
+    session_dir = tmpdir.join('sessions').strpath
+    SessionCache('bggcli', session_dir).save([{'name': 'SessionID',
+                                               'value': bgg.login('bggcli')}])
+    env = dict(os.environ, BGGCLI_BASE_URL=bgg.url)
+    env['PYTHONPATH'] = ROOT_DIR + os.pathsep + env.get('PYTHONPATH', '')
+    return subprocess.check_output(
+        [sys.executable, '-m', 'bggcli.main', '-l', 'bggcli', '-p', 'secret',
+         '-c', 'session-cache=true', '-c', 'session-cache-dir=%s' % session_dir,
+         '-c', 'rate-limit=0', '-c', 'export-poll-interval=0.01'] + list(args),
+        env=env, cwd=tmpdir.strpath).decode('utf-8')
+
+
+def test_commands(tmpdir):
+    csv_path = tmpdir.join('games.csv').strpath
+    with open(csv_path, 'w') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['objectid', 'objectname', 'own', 'rating', 'comment'])
+        writer.writerow(['1000', 'Game 1000', '1', '7', 'Great'])
+        writer.writerow(['1001', 'Game 1001', '1', '', ''])
+
+    with FakeBgg() as bgg:
+        bgg.add_games(3)
+        run_command(bgg, tmpdir, '-c', 'engine=http', 'collection-import', csv_path)
+        assert sorted(item['objectid'] for item in bgg.items.values()) == ['1000', '1001']
+
+        export_path = tmpdir.join('export.csv').strpath
+        run_command(bgg, tmpdir, 'collection-export', export_path)
+        with open(export_path) as export_file:
+            rows = list(csv.DictReader(export_file))
+        assert [(row['objectid'], row['rating'], row['comment']) for row in rows] == \
+            [('1000', '7', 'Great'), ('1001', '0', '')]
+        assert bgg.hits['export-queued'] == 1
+
+        run_command(bgg, tmpdir, '-c', 'engine=http', 'collection-delete', '--force', csv_path)
+        assert not bgg.items
@@ -0,0 +1,60 @@
+from bggcli.ui.gamepage import FillPlan, GamePage, FILL_SCRIPT
+
+
+class FakeDriver:
+    def __init__(self, script_result=True):
+        self.script_result = script_result
+        self.scripts = []
+
+    def execute_script(self, script, *args):
+        self.scripts.append((script, args))
+        return self.script_result
+
+
+def test_submit_by_script():
+    driver = FakeDriver()
+    row = {'objectid': '4098', 'objectname': 'Age of Steam', 'own': '0', 'wishlist': '1',
+           'wishlistpriority': '3', 'fortrade': '0', 'conditiontext': 'Some condition',
+           'comment': 'Some comment', '_versionid': '', 'language': 'French'}
+
+    assert GamePage(driver, fill_by_script=True).submit_by_script(row)
+
+    # A single call for the whole form
+    assert len(driver.scripts) == 1
+    script, (values, language) = driver.scripts[0]
+    assert script == FILL_SCRIPT
+    # 'own' and 'conditiontext' are skipped because of their dependencies
+    assert values == {'status.wishlist': '1', 'wishlistpriority': '3', 'status.fortrade': '0',
+                      'textfield.comment.value': 'Some comment', 'versionid': ''}
+    assert language == 'French'
+
+
+def test_submit_by_script_without_form_model():
+    assert not GamePage(FakeDriver(script_result=False)).submit_by_script({'objectid': '1'})
+
+
+def test_fill_plan():
+    plan = FillPlan.compile(['objectname', 'objectid', 'own', 'wishlist', 'wishlistpriority'])
+    assert plan is FillPlan.compile(['wishlistpriority', 'wishlist', 'own', 'objectid',
+                                     'objectname'])
+    # Only status checkboxes: no panel to open
+    assert not plan.needs_advanced
+    assert not plan.needs_custom
+
+    plan = FillPlan.compile(['objectid', 'pricepaid'])
+    assert plan.needs_advanced and not plan.needs_custom
+    plan = FillPlan.compile(['objectid', 'year'])
+    assert plan.needs_custom and not plan.needs_advanced
+
+
+def test_fill_plan_order_and_dependencies():
+    calls = []
+    plan = FillPlan(['objectid', 'comment', 'fortrade', 'conditiontext', 'own'])
+    plan.steps = [(key, lambda page, value, key=key: calls.append((key, value)), deps)
+                  for key, _, deps in plan.steps]
+
+    plan.fill(None, {'objectid': '1', 'comment': 'Nice', 'fortrade': '1',
+                     'conditiontext': 'Good', 'own': '0'})
+
+    assert calls == [('fortrade', '1'), ('conditiontext', 'Good'), ('comment', 'Nice'),
+                     ('objectid', '1')]
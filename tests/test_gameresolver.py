@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import csv
+import io
+
+from bggcli.util.gameresolver import GameResolver, normalize_name, parse_search
+
+SEARCH_XML = b'''<?xml version="1.0" encoding="utf-8"?>
+<items total="3" termsofuse="https://boardgamegeek.com/xmlapi/termsofuse">
+    <item type="boardgame" id="13">
+        <name type="primary" value="CATAN"/>
+        <yearpublished value="1995" />
+    </item>
+    <item type="boardgameexpansion" id="926">
+        <name type="primary" value="Catan: Seafarers"/>
+        <yearpublished value="1997" />
+    </item>
+    <item type="boardgame" id="2807">
+        <name type="alternate" value="Catan"/>
+        <yearpublished value="2003" />
+    </item>
+</items>'''
+
+RESULTS = {
+    'Catan': list(parse_search(io.BytesIO(SEARCH_XML))),
+    'Carcassonne': [('822', 'Carcassonne', True, '2000'), ('822', 'Carcassonne', False, '2000')],
+    'Coup': [('131357', 'Coup', True, '2012'), ('2810', 'Coup', True, '1997')],
+}
+
+
+class FakeSearch:
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, name):
+        self.queries.append(name)
+        return RESULTS.get(name, [])
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_normalize_name():
+    assert normalize_name(u'Puerto-Rico!') == u'puerto rico'
+    assert normalize_name(u'  Les Aventuriers du Rail :  Europe ') == \
+        u'les aventuriers du rail europe'
+    assert normalize_name(u'Café & Co') == u'cafe and co'
+
+
+def test_resolve(tmpdir):
+    search = FakeSearch()
+    with GameResolver(tmpdir.strpath, search=search).open() as resolver:
+        # Primary name prevails over alternate names
+        assert resolver.resolve('Catan') == '13'
+        assert resolver.resolve('CATAN', '2003') == '2807'
+        # Already returned by the previous search
+        assert resolver.resolve('Catan - Seafarers') == '926'
+        assert resolver.resolve('Carcassonne') == '822'
+        assert search.queries == ['Catan', 'Carcassonne']
+
+    # Index is persisted
+    search = FakeSearch()
+    with GameResolver(tmpdir.strpath, search=search).open() as resolver:
+        assert resolver.resolve('Carcassonne') == '822'
+        assert search.queries == []
+
+
+def test_search_expired(tmpdir):
+    clock = Clock()
+    search = FakeSearch()
+    with GameResolver(tmpdir.strpath, search=search, ttl=1, clock=clock).open() as resolver:
+        assert resolver.resolve('Unknown game') is None
+    with GameResolver(tmpdir.strpath, search=search, ttl=1, clock=clock).open() as resolver:
+        assert resolver.resolve('Unknown game') is None
+        assert search.queries == ['Unknown game']
+
+    # Game added to BGG since the first search
+    RESULTS['Unknown game'] = [('424242', 'Unknown game', True, '2020')]
+    clock.now += 2 * 24 * 3600
+    try:
+        with GameResolver(tmpdir.strpath, search=search, ttl=1, clock=clock).open() as resolver:
+            assert resolver.resolve('Unknown game') == '424242'
+            assert search.queries == ['Unknown game', 'Unknown game']
+    finally:
+        del RESULTS['Unknown game']
+
+
+def test_review_ambiguous_names(tmpdir):
+    review_path = tmpdir.join('review.csv').strpath
+    search = FakeSearch()
+    with GameResolver(tmpdir.strpath, review_path, persistent=False,
+                      search=search).open() as resolver:
+        rows = [{'objectid': '1', 'objectname': 'Known'},
+                {'objectid': '', 'objectname': 'Coup'},
+                {'objectid': '', 'objectname': 'Coup', 'yearpublished': '2012'},
+                {'objectid': '', 'objectname': 'Unknown game'},
+                {'objectid': '', 'objectname': 'Coup'}]
+        result = list(resolver.resolve_rows(rows))
+        assert resolver.reviews == 2
+        assert search.queries == ['Coup', 'Unknown game']
+
+    assert [row['objectid'] for row in result] == ['1', '131357']
+    with io.open(review_path, encoding='utf-8', newline='') as review_file:
+        review = list(csv.DictReader(review_file))
+    assert [(row['objectname'], row['reason']) for row in review] == \
+        [('Coup', 'ambiguous'), ('Unknown game', 'not found')]
+    assert review[0]['candidates'] == '131357: Coup (2012); 2810: Coup (1997)'
@@ -0,0 +1,49 @@
+from bggcli.util.csvreader import CsvReader
+from bggcli.util.importjournal import ImportJournal
+
+
+def test_resume(tmpdir):
+    file_path = tmpdir.join('collection.csv').strpath
+    row1 = {'objectid': '1', 'objectname': 'Game 1', 'own': '1'}
+    row2 = {'objectid': '2', 'objectname': 'Game 2', 'own': '1'}
+
+    with ImportJournal(file_path, sync_every=1).open(False) as journal:
+        journal.record(row1)
+    # Simulate a crash while writing a record
+    with open(file_path + '.journal', 'a') as journal_file:
+        journal_file.write('2\t3f2a')
+
+    journal = ImportJournal(file_path).open(True)
+    assert journal.is_done(row1)
+    assert not journal.is_done(row2)
+    journal.record(row2)
+    journal.close()
+
+    journal = ImportJournal(file_path).open(True)
+    assert journal.is_done(row2)
+    # Row has been modified since the previous run
+    assert not journal.is_done(dict(row1, own='0'))
+    journal.close()
+
+    # A new run starts from scratch
+    journal = ImportJournal(file_path).open(False)
+    assert not journal.is_done(row1)
+    journal.remove()
+    assert not tmpdir.join('collection.csv.journal').exists()
+
+
+def test_row_with_extra_values(tmpdir):
+    file_path = tmpdir.join('collection.csv')
+    file_path.write('objectid,rating\n13,7,\n')
+    reader = CsvReader(file_path.strpath)
+    reader.open()
+    row = next(reader.rows())
+    reader.close()
+    assert None in row
+
+    with ImportJournal(file_path.strpath, sync_every=1).open(False) as journal:
+        journal.record(row)
+
+    journal = ImportJournal(file_path.strpath).open(True)
+    assert journal.is_done(row)
+    journal.remove()
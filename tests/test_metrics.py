@@ -0,0 +1,72 @@
+import io
+import os
+
+from bggcli.util.metrics import CountingReader, Metrics
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_disabled(tmpdir):
+    metrics = Metrics.from_options({}, 'collection-import')
+    assert not metrics.enabled
+    metrics.inc('rows_processed_total')
+    metrics.start()
+    metrics.stop(True)
+    assert metrics.values['rows_processed_total'] == 0
+    rows = [1, 2]
+    assert metrics.count(rows) is rows
+
+
+def test_write(tmpdir):
+    path = tmpdir.join('bggcli.prom').strpath
+    clock = Clock()
+    metrics = Metrics(path, {'command': 'collection-import'}, interval=0, clock=clock)
+    metrics.start()
+    assert os.path.exists(path)
+
+    metrics.inc('rows_processed_total', 3)
+    metrics.inc('rows_requeued_total')
+    assert list(metrics.count(['a', 'b'], 'rows_failed_total')) == ['a', 'b']
+    metrics.observe('row_duration_seconds', 0.3)
+    metrics.observe('row_duration_seconds', 4)
+    clock.now += 12.5
+    metrics.stop(True)
+
+    with open(path) as metrics_file:
+        lines = metrics_file.read().splitlines()
+    assert not [name for name in os.listdir(tmpdir.strpath) if name.endswith('.tmp')]
+
+    label = '{command="collection-import"}'
+    assert '# TYPE bggcli_rows_processed_total counter' in lines
+    assert 'bggcli_rows_processed_total%s 3' % label in lines
+    assert 'bggcli_rows_requeued_total%s 1' % label in lines
+    assert 'bggcli_rows_failed_total%s 2' % label in lines
+    assert 'bggcli_browser_restarts_total%s 0' % label in lines
+    assert '# TYPE bggcli_row_duration_seconds histogram' in lines
+    assert 'bggcli_row_duration_seconds_bucket{command="collection-import",le="0.25"} 0' in lines
+    assert 'bggcli_row_duration_seconds_bucket{command="collection-import",le="0.5"} 1' in lines
+    assert 'bggcli_row_duration_seconds_bucket{command="collection-import",le="5"} 2' in lines
+    assert 'bggcli_row_duration_seconds_bucket{command="collection-import",le="+Inf"} 2' in lines
+    assert 'bggcli_row_duration_seconds_sum%s 4.3' % label in lines
+    assert 'bggcli_row_duration_seconds_count%s 2' % label in lines
+    assert 'bggcli_run_duration_seconds%s 12.5' % label in lines
+    assert 'bggcli_run_success%s 1' % label in lines
+
+
+def test_counting_reader():
+    metrics = Metrics.default
+    Metrics.default = Metrics(os.devnull)
+    try:
+        reader = CountingReader(io.BytesIO(b'<items></items>'))
+        assert reader.read(5) == b'<item'
+        assert reader.read() == b's></items>'
+        assert not reader.closed
+        assert Metrics.default.values['downloaded_bytes_total'] == 15
+    finally:
+        Metrics.default = metrics
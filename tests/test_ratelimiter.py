@@ -0,0 +1,72 @@
+from bggcli.util.ratelimiter import MIN_RATE, RateLimiter
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, delay):
+        self.sleeps.append(delay)
+        self.now += delay
+
+
+def create_limiter(clock, state_path=None, rate=2, burst=2):
+    return RateLimiter(rate, burst, state_path, clock=clock, sleep=clock.sleep)
+
+
+def test_token_bucket():
+    clock = Clock()
+    limiter = create_limiter(clock)
+
+    assert [limiter.acquire() for _ in range(4)] == [0, 0, 0.5, 0.5]
+    clock.now += 10
+    # The bucket does not hold more than its burst
+    assert [limiter.acquire() for _ in range(3)] == [0, 0, 0.5]
+    assert limiter.waited == 1.5
+
+
+def test_slow_down_and_recover():
+    clock = Clock()
+    limiter = create_limiter(clock, burst=1)
+    limiter.acquire()
+
+    limiter.penalize(retry_after=30)
+    assert limiter.acquire() == 30
+    assert limiter.state['rate'] == 1
+
+    for _ in range(3):
+        limiter.penalize()
+    assert limiter.state['rate'] == 0.125
+    limiter.penalize()
+    assert limiter.state['rate'] == MIN_RATE
+
+    for _ in range(100):
+        limiter.succeed()
+    assert limiter.state['rate'] == 2
+    assert limiter.summary() == 'rate limit: waited 30.0s, 5 responses asking to slow down'
+
+
+def test_shared_bucket(tmpdir):
+    clock = Clock()
+    state_path = tmpdir.join('ratelimit.json').strpath
+    first = create_limiter(clock, state_path)
+    second = create_limiter(clock, state_path)
+    # Concurrent processes: time does not pass while they wait
+    first.sleep = second.sleep = lambda delay: None
+
+    assert [first.acquire(), second.acquire(), first.acquire(), second.acquire()] == \
+        [0, 0, 0.5, 1.0]
+    second.penalize(retry_after=10)
+    assert first.acquire() >= 10
+
+
+def test_disabled():
+    limiter = RateLimiter(0)
+    assert limiter.acquire() == 0
+    limiter.penalize(10)
+    assert limiter.acquire() == 0
+    assert RateLimiter.from_options({'rate-limit': '0'}).rate is None
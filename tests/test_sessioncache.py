@@ -0,0 +1,34 @@
+import os
+import stat
+import time
+
+from bggcli.util.sessioncache import SessionCache
+
+
+def test_save_and_load(tmpdir):
+    cache_dir = tmpdir.join('sessions').strpath
+    cookies = [{'name': 'SessionID', 'value': 'abc', 'domain': '.boardgamegeek.com'},
+               {'name': 'bggusername', 'value': 'me', 'expiry': int(time.time()) + 3600},
+               {'name': '_gat', 'value': '1', 'expiry': int(time.time()) - 10}]
+    SessionCache('MyLogin', cache_dir).save(cookies)
+
+    cache = SessionCache('mylogin', cache_dir)
+    assert cache.load_values() == {'SessionID': 'abc', 'bggusername': 'me'}
+    assert stat.S_IMODE(os.stat(cache.path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(cache_dir).st_mode) == 0o700
+    assert SessionCache('otherlogin', cache_dir).load() is None
+
+
+def test_expired_session_cleared(tmpdir):
+    cache = SessionCache('mylogin', tmpdir.strpath)
+    cache.save([{'name': 'SessionID', 'value': 'abc', 'expiry': int(time.time()) - 10}])
+
+    assert cache.load() is None
+    assert not os.path.exists(cache.path)
+
+
+def test_from_options(tmpdir):
+    assert SessionCache.from_options('mylogin', {}) is None
+    cache = SessionCache.from_options('mylogin', {'session-cache': 'true',
+                                                  'session-cache-dir': tmpdir.strpath})
+    assert cache.cache_dir == tmpdir.strpath
@@ -0,0 +1,43 @@
+from bggcli.util.thingcache import ThingCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_get_and_expire(tmpdir):
+    clock = Clock()
+    with ThingCache(tmpdir.strpath, ttl=1, clock=clock).open() as cache:
+        cache.put_many({'13': {'rank': '476'}, '926': {'rank': ''}})
+        assert cache.get_many(['13', '926', '42']) == {'13': {'rank': '476'}, '926': {'rank': ''}}
+        assert (cache.hits, cache.misses) == (2, 1)
+
+        clock.now += 2 * 24 * 3600
+        assert cache.get_many(['13']) == {}
+        assert cache.evict() == 2
+        assert len(cache) == 0
+
+
+def test_persisted(tmpdir):
+    with ThingCache(tmpdir.strpath).open() as cache:
+        cache.put_many({'13': {'rank': '476'}})
+    with ThingCache(tmpdir.strpath).open() as cache:
+        assert cache.get_many(['13']) == {'13': {'rank': '476'}}
+
+
+def test_evict_least_recently_used(tmpdir):
+    clock = Clock()
+    cache = ThingCache(tmpdir.strpath, max_entries=2, clock=clock).open()
+    for objectid in ['1', '2', '3']:
+        clock.now += 1
+        cache.put_many({objectid: {}})
+    clock.now += 1
+    cache.get_many(['1'])
+
+    assert cache.evict() == 1
+    assert sorted(cache.get_many(['1', '2', '3'])) == ['1', '3']
+    cache.close()
@@ -0,0 +1,103 @@
+import os
+
+from commons import *
+from bggcli.commands import collection_export
+from bggcli.commands.collection_enrich import enriched_columns, enriched_rows
+from bggcli.util.csvreader import CsvReader
+from bggcli.util.thingcache import ThingCache
+from bggcli.util.thingenricher import THING_FIELDS, ThingEnricher, parse_things
+
+THING_XML_PATH = os.path.join(os.path.dirname(__file__), 'resources/thing.xml')
+
+
+class FakeThings:
+    def __init__(self, things):
+        self.things = things
+        self.batches = []
+
+    def __call__(self, objectids):
+        self.batches.append(list(objectids))
+        return dict((objectid, self.things[objectid]) for objectid in objectids
+                    if objectid in self.things)
+
+
+def test_parse_things():
+    things = dict(parse_things(THING_XML_PATH))
+
+    assert sorted(things) == ['13', '926']
+    catan = things['13']
+    assert set(catan) == set(THING_FIELDS)
+    assert catan['originalname'] == 'CATAN'
+    assert catan['itemtype'] == 'standalone'
+    assert catan['objecttype'] == 'thing'
+    assert (catan['minplayers'], catan['maxplayers'], catan['playingtime']) == ('3', '4', '120')
+    assert (catan['average'], catan['baverage'], catan['avgweight']) == \
+        ('7.10119', '6.93012', '2.2891')
+    assert catan['rank'] == '476'
+    assert catan['bggrecplayers'] == '3,4'
+    assert catan['bggbestplayers'] == '4'
+    assert catan['bggrecagerange'] == '10+'
+    assert catan['bgglanguagedependence'] == 'No necessary in-game text'
+
+    seafarers = things['926']
+    assert seafarers['itemtype'] == 'expansion'
+    assert seafarers['rank'] == ''
+    assert seafarers['bggrecplayers'] == ''
+
+
+def test_lookup_batches_and_cache(tmpdir):
+    fake = FakeThings(dict((str(objectid), {'rank': str(objectid)}) for objectid in range(1, 6)))
+    with ThingCache(tmpdir.strpath).open() as cache:
+        enricher = ThingEnricher(cache, batch_size=2, fetch_things=fake)
+        assert sorted(enricher.lookup(['3', '1', '2', '3', '9'])) == ['1', '2', '3']
+        assert fake.batches == [['1', '2'], ['3', '9']]
+
+        enricher.lookup(['1', '4'])
+        assert fake.batches[2:] == [['4']]
+
+
+def test_enrich_rows():
+    fake = FakeThings(dict(parse_things(THING_XML_PATH)))
+    enricher = ThingEnricher(fetch_things=fake)
+    rows = [('Catan', '13'), ('Unknown', '42'), ('Catan again', '13')]
+
+    result = list(enricher.enrich(iter(rows), 1, window=2))
+
+    assert fake.batches == [['13', '42'], ['13']]
+    assert [row[:2] for row in result] == rows
+    assert result[0][2 + THING_FIELDS.index('rank')] == '476'
+    assert result[1][2:] == ('',) * len(THING_FIELDS)
+
+
+def test_export_enriched(tmpdir):
+    things = dict(parse_things(THING_XML_PATH))
+    fake = FakeThings({'68448': things['13'], '4098': things['926']})
+    dest = tmpdir.join('export.csv').strpath
+
+    collection_export.write_csv(COLLECTION_XML_PATH, dest,
+                                enricher=ThingEnricher(fetch_things=fake))
+
+    csv_reader = CsvReader(dest)
+    csv_reader.open()
+    rows = list(csv_reader.rows())
+    assert csv_reader.fieldnames == collection_export.export_columns(ThingEnricher())
+    assert [row['objectid'] for row in rows] == ['68448', '4098']
+    assert [row['rank'] for row in rows] == ['476', '']
+    assert rows[0]['collid'] != ''
+    csv_reader.close()
+
+
+def test_enrich_csv_file():
+    fake = FakeThings({'68448': dict(parse_things(THING_XML_PATH))['13']})
+    csv_reader = CsvReader(COLLECTION_CSV_PATH)
+    csv_reader.open()
+
+    columns = enriched_columns(csv_reader.fieldnames)
+    rows = [dict(zip(columns, values))
+            for values in enriched_rows(csv_reader, ThingEnricher(fetch_things=fake))]
+    csv_reader.close()
+
+    assert columns[:len(csv_reader.fieldnames)] == csv_reader.fieldnames
+    assert [row['objectname'] for row in rows] == ['7 Wonders', 'Age of Steam']
+    assert rows[0]['avgweight'] == '2.2891'
+    assert rows[1]['avgweight'] == ''
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+
+from bggcli.util.tracer import NULL_SPAN, Tracer, traced
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_disabled():
+    assert Tracer(enabled=False).span('row') is NULL_SPAN
+    assert not Tracer.from_options({}).enabled
+    assert Tracer.from_options({'trace-summary': 'true'}).enabled
+
+
+def test_nested_spans(tmpdir):
+    clock = Clock()
+    tracer = Tracer(clock=clock)
+    with tracer.span('row', objectid='1'):
+        clock.now += 1
+        with tracer.span('navigate'):
+            clock.now += 2
+    with pytest.raises(ValueError):
+        with tracer.span('row', objectid='2'):
+            clock.now += 0.5
+            raise ValueError()
+
+    trace_path = tmpdir.join('trace.json').strpath
+    tracer.write_chrome_trace(trace_path)
+    with open(trace_path) as trace_file:
+        events = json.load(trace_file)['traceEvents']
+
+    assert events[0]['ph'] == 'M'
+    spans = [(e['name'], e['ts'], e['dur'], e['args']) for e in events if e['ph'] == 'X']
+    assert spans == [('navigate', 1000000, 2000000, {}),
+                     ('row', 0, 3000000, {'objectid': '1'}),
+                     ('row', 3000000, 500000, {'objectid': '2', 'error': 'ValueError'})]
+
+
+def test_summary():
+    clock = Clock()
+    tracer = Tracer(clock=clock)
+    for duration in range(1, 21):
+        tracer.record('fill_rating', 'bggcli', clock.now, clock.now + duration)
+    tracer.record('submit', 'bggcli', 0, 0.25)
+
+    assert Tracer.percentile(range(1, 21), 0.5) == 10
+    assert Tracer.percentile(range(1, 21), 0.95) == 19
+    lines = tracer.summary()
+    assert lines[0].split() == ['span', 'count', 'p50', 'p95', 'total']
+    assert lines[1].split() == ['fill_rating', '20', '10.000s', '19.000s', '210.000s']
+    assert lines[2].split() == ['submit', '1', '0.250s', '0.250s', '0.250s']
+
+
+def test_traced():
+    Tracer.default = Tracer()
+    try:
+        @traced('work')
+        def work(value):
+            return value * 2
+
+        assert work(2) == 4
+        assert [name for name, _ in Tracer.default.durations()] == ['work']
+    finally:
+        Tracer.default = None
@@ -0,0 +1,118 @@
+import threading
+from contextlib import contextmanager
+
+from selenium.common.exceptions import WebDriverException
+
+from bggcli.util.workerpool import WorkerPool
+
+
+class FakeSessions:
+    def __init__(self):
+        self.opened = []
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def open(self, index):
+        with self.lock:
+            self.opened.append(index)
+        yield index
+
+
+def create_rows(count):
+    return [{'objectid': str(i), 'objectname': 'Game %s' % i} for i in range(count)]
+
+
+def test_all_rows_processed_by_workers():
+    sessions = FakeSessions()
+    processed = []
+    report = WorkerPool(4).run(create_rows(50), sessions.open,
+                               lambda session, row: processed.append(row['objectid']) or True)
+
+    assert report.done == 50
+    assert not report.failed
+    assert sorted(processed) == sorted(str(i) for i in range(50))
+    # A worker does not open any session when the queue is already empty
+    assert set(sessions.opened) <= set([0, 1, 2, 3])
+
+
+def test_retry_limit():
+    report = WorkerPool(1, retry_limit=3).run(create_rows(2), FakeSessions().open,
+                                              lambda session, row: row['objectid'] == '0')
+
+    assert report.done == 1
+    assert [row['objectid'] for row in report.failed] == ['1']
+    assert report.requeued == 2
+
+
+def test_session_restarted_on_webdriver_exception():
+    sessions = FakeSessions()
+    failures = ['1']
+
+    def process(session, row):
+        if row['objectid'] in failures:
+            failures.remove(row['objectid'])
+            raise WebDriverException('Browser crashed')
+        return True
+
+    report = WorkerPool(1).run(create_rows(3), sessions.open, process)
+
+    assert report.done == 3
+    assert report.requeued == 1
+    assert sessions.opened == [0, 0]
+
+
+class RecoverableSession:
+    def __init__(self, alive):
+        self.alive = alive
+        self.recovered = 0
+
+    def recover(self):
+        self.recovered += 1
+        return self.alive
+
+
+def test_live_session_recovered():
+    opened = []
+    failures = ['1', '2']
+
+    @contextmanager
+    def open_session(index):
+        session = RecoverableSession(alive=True)
+        opened.append(session)
+        yield session
+
+    def process(session, row):
+        if row['objectid'] in failures:
+            failures.remove(row['objectid'])
+            raise WebDriverException('Page crashed')
+        return True
+
+    report = WorkerPool(1).run(create_rows(4), open_session, process)
+
+    assert report.done == 4
+    assert len(opened) == 1
+    assert opened[0].recovered == 2
+
+
+def test_rows_pulled_lazily():
+    pulled = []
+
+    def rows():
+        for row in create_rows(3):
+            pulled.append(row['objectid'])
+            yield row
+
+    def process(session, row):
+        # Next rows are not read before the current one is processed
+        assert pulled[-1] == row['objectid']
+        return True
+
+    report = WorkerPool(1).run(rows(), FakeSessions().open, process)
+    assert report.done == report.total == 3
+
+
+def test_no_session_without_rows():
+    sessions = FakeSessions()
+    report = WorkerPool(2).run(iter([]), sessions.open, lambda session, row: True)
+    assert report.total == 0
+    assert not sessions.opened
@@ -0,0 +1,85 @@
+import random
+import threading
+try:
+    from BaseHTTPServer import HTTPServer, BaseHTTPRequestHandler
+    from urllib2 import Request
+except ImportError:
+    from http.server import HTTPServer, BaseHTTPRequestHandler
+    from urllib.request import Request
+
+import pytest
+
+from bggcli.util.xmlapi import PollingSchedule, fetch
+
+
+class QueueHandler(BaseHTTPRequestHandler):
+    # Status code and Retry-After header of the next responses
+    responses = []
+    requests = 0
+
+    def do_GET(self):
+        QueueHandler.requests += 1
+        code, retry_after = QueueHandler.responses.pop(0) if QueueHandler.responses \
+            else (200, None)
+        self.send_response(code)
+        if retry_after is not None:
+            self.send_header('Retry-After', retry_after)
+        self.end_headers()
+        if code == 200:
+            self.wfile.write(b'<items/>')
+
+    # noinspection PyShadowingBuiltins
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    QueueHandler.requests = 0
+    server = HTTPServer(('127.0.0.1', 0), QueueHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+def create_request(server):
+    return Request('http://127.0.0.1:%s/xmlapi2/collection' % server.server_port)
+
+
+def test_delays():
+    schedule = PollingSchedule(interval=2, max_interval=10, jitter=0)
+    assert [schedule.delay(attempt) for attempt in range(1, 6)] == [2, 4, 8, 10, 10]
+    assert schedule.delay(5, retry_after=42) == 42
+
+    schedule = PollingSchedule(interval=2, jitter=0.5, rand=random.Random(1))
+    assert all(1 <= schedule.delay(1) <= 3 for _ in range(100))
+
+
+def test_parse_retry_after():
+    assert PollingSchedule.parse_retry_after('120') == 120
+    assert PollingSchedule.parse_retry_after('Wed, 21 Oct 2015 07:28:30 GMT',
+                                             now=1445412480) == 30
+    assert PollingSchedule.parse_retry_after('soon') is None
+    assert PollingSchedule.parse_retry_after(None) is None
+
+
+def test_fetch_queued_export(server):
+    QueueHandler.responses = [(202, None), (429, '0'), (202, '0')]
+    schedule = PollingSchedule(interval=0.01, jitter=0)
+
+    response = fetch(create_request(server), schedule)
+
+    assert response.read() == b'<items/>'
+    assert QueueHandler.requests == 4
+    assert schedule.attempts == 4
+    assert schedule.queue_time >= 0.01
+
+
+def test_fetch_timeout(server):
+    QueueHandler.responses = [(202, None)] * 10
+    with pytest.raises(Exception) as e:
+        fetch(create_request(server), PollingSchedule(interval=0.05, timeout=0.1, jitter=0))
+    assert 'giving up' in str(e.value)
+    assert QueueHandler.requests < 10